@@ -1,7 +1,7 @@
 from pydub import AudioSegment
-import audioop
 from io import BytesIO
 import base64
+from g711 import lin2ulaw
 
 def convert_mp3_bytes_to_g711ulaw_base64(mp3_bytes: bytes) -> str:
     """Converte áudio MP3 em bytes para formato G711 µ-law codificado em base64.
@@ -30,5 +30,5 @@ def convert_mp3_bytes_to_g711ulaw_base64(mp3_bytes: bytes) -> str:
     audio = AudioSegment.from_file(BytesIO(mp3_bytes), format="mp3")
     audio = audio.set_channels(1).set_frame_rate(8000).set_sample_width(2)
     pcm_audio = audio.raw_data
-    ulaw_audio = audioop.lin2ulaw(pcm_audio, 2)
+    ulaw_audio = lin2ulaw(pcm_audio)
     return base64.b64encode(ulaw_audio).decode("utf-8")
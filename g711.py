@@ -0,0 +1,90 @@
+"""
+Codec G.711 μ-law vetorizado com NumPy.
+
+Substitui `audioop.ulaw2lin`/`audioop.lin2ulaw` (removido no Python 3.13) por
+tabelas de consulta: 256 entradas para decodificar e 65536 para codificar.
+Os resultados são idênticos bit a bit aos do audioop.
+
+Todas as funções aceitam bytes, bytearray, memoryview ou arrays NumPy, de
+qualquer formato (um frame ou um lote 2D de frames), e podem escrever em um
+buffer de saída fornecido por quem chama para evitar alocações.
+"""
+import numpy as np
+
+_BIAS = 0x84
+_SEG_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF], dtype=np.int32)
+
+
+def _build_decode_table() -> np.ndarray:
+    """Tabela μ-law -> PCM 16-bit (equivalente a st_ulaw2linear16 do audioop)."""
+    uval = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = (((uval & 0x0F) << 3) + _BIAS) << ((uval & 0x70) >> 4)
+    return np.where(uval & 0x80, _BIAS - t, t - _BIAS).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    """Tabela PCM 16-bit -> μ-law, indexada pela amostra vista como uint16."""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), 32635) + (_BIAS >> 2)
+    seg = np.searchsorted(_SEG_END, magnitude, side='left')
+    uval = (np.minimum(seg, 7) << 4) | ((magnitude >> (np.minimum(seg, 7) + 1)) & 0x0F)
+    uval = np.where(seg >= 8, 0x7F, uval)
+    return (uval ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_decode_table()
+ULAW_ENCODE_TABLE = _build_encode_table()
+
+# μ-law de uma amostra PCM zero; útil para preencher silêncio
+ULAW_SILENCE = int(ULAW_ENCODE_TABLE[0])
+
+
+def _as_ulaw_array(ulaw) -> np.ndarray:
+    if isinstance(ulaw, np.ndarray):
+        return ulaw if ulaw.dtype == np.uint8 else ulaw.view(np.uint8)
+    return np.frombuffer(ulaw, dtype=np.uint8)
+
+
+def _as_pcm_array(pcm) -> np.ndarray:
+    if isinstance(pcm, np.ndarray):
+        return pcm if pcm.dtype == np.int16 else pcm.astype(np.int16)
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+def ulaw_to_pcm(ulaw, out: np.ndarray = None) -> np.ndarray:
+    """
+    Decodifica μ-law para PCM 16-bit.
+
+    Args:
+        ulaw: Amostras μ-law (bytes, memoryview ou array uint8, 1D ou 2D)
+        out: Array int16 opcional, com o mesmo formato, para receber o resultado
+
+    Returns:
+        np.ndarray: Amostras PCM int16
+    """
+    return ULAW_DECODE_TABLE.take(_as_ulaw_array(ulaw), out=out, mode='clip')
+
+
+def pcm_to_ulaw(pcm, out: np.ndarray = None) -> np.ndarray:
+    """
+    Codifica PCM 16-bit para μ-law.
+
+    Args:
+        pcm: Amostras PCM (bytes little-endian, memoryview ou array int16, 1D ou 2D)
+        out: Array uint8 opcional, com o mesmo formato, para receber o resultado
+
+    Returns:
+        np.ndarray: Amostras μ-law uint8
+    """
+    return ULAW_ENCODE_TABLE.take(_as_pcm_array(pcm).view(np.uint16), out=out, mode='clip')
+
+
+def ulaw2lin(fragment) -> bytes:
+    """Substituto direto de `audioop.ulaw2lin(fragment, 2)`."""
+    return ulaw_to_pcm(fragment).tobytes()
+
+
+def lin2ulaw(fragment) -> bytes:
+    """Substituto direto de `audioop.lin2ulaw(fragment, 2)`."""
+    return pcm_to_ulaw(fragment).tobytes()
@@ -10,6 +10,37 @@ class Settings:
     SYSTEM_MESSAGE = PROMPT
     VOICE = 'alloy'
     OPENAI_MODEL = 'gpt-4o-realtime-preview-2024-10-01'
+    # Twilio Media Streams speak G.711 μ-law 8 kHz; when OpenAI uses the same
+    # format, audio deltas are relayed to Twilio without being decoded. pcm16
+    # (24 kHz) is transcoded to/from μ-law 8 kHz on each direction that uses it.
+    TWILIO_AUDIO_FORMAT = 'g711_ulaw'
+    SUPPORTED_AUDIO_FORMATS = ('g711_ulaw', 'pcm16')
+    INPUT_AUDIO_FORMAT = os.getenv('OPENAI_INPUT_AUDIO_FORMAT', 'g711_ulaw')
+    OUTPUT_AUDIO_FORMAT = os.getenv('OPENAI_OUTPUT_AUDIO_FORMAT', 'g711_ulaw')
+    # Queue between the Twilio reader and the OpenAI writer: size (20 ms frames),
+    # policy when full (block, drop_oldest, drop_silence) and max frame age
+    UPLINK_QUEUE_SIZE = int(os.getenv('UPLINK_QUEUE_SIZE', 50))
+    UPLINK_QUEUE_POLICY = os.getenv('UPLINK_QUEUE_POLICY', 'drop_silence')
+    UPLINK_MAX_AGE_MS = int(os.getenv('UPLINK_MAX_AGE_MS', 1000))
+    # Pre-warmed Realtime sockets: min/max ready (max 0 disables the pool) and
+    # how long a socket may sit idle before it is closed
+    REALTIME_POOL_MIN = int(os.getenv('REALTIME_POOL_MIN', 1))
+    REALTIME_POOL_MAX = int(os.getenv('REALTIME_POOL_MAX', 8))
+    REALTIME_POOL_IDLE_S = float(os.getenv('REALTIME_POOL_IDLE_S', 120))
+    # Speculative setup: the Realtime socket is taken when /incoming-call fires,
+    # keyed by CallSid, and adopted on the stream's start event
+    SPECULATIVE_SETUP = os.getenv('SPECULATIVE_SETUP', 'true').lower() == 'true'
+    SPECULATIVE_TTL_S = float(os.getenv('SPECULATIVE_TTL_S', 15))
+    SPECULATIVE_MAX_PENDING = int(os.getenv('SPECULATIVE_MAX_PENDING', 50))
+    # Checks X-Twilio-Signature on /incoming-call. Without it, webhooks are not
+    # authenticated and no speculative session is opened
+    TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
+    # Greetings played on the stream's start event, rendered at startup with the
+    # session's voice ("|"-separated, one picked per call). Empty disables them
+    # and /incoming-call falls back to the TwiML <Say>
+    GREETINGS = [text for text in os.getenv(
+        'GREETINGS', 'Olá! Aqui é o assistente virtual. Como posso te ajudar?'
+    ).split('|') if text.strip()]
     
     LOG_EVENT_TYPES = [
         'error', 'response.content.done', 'rate_limits.updated',
@@ -19,3 +50,8 @@ class Settings:
     ]
 
 settings = Settings()
+
+for _audio_format in (settings.INPUT_AUDIO_FORMAT, settings.OUTPUT_AUDIO_FORMAT):
+    if _audio_format not in Settings.SUPPORTED_AUDIO_FORMATS:
+        raise ValueError(f"Unsupported OpenAI audio format: {_audio_format} "
+                         f"(expected one of {', '.join(Settings.SUPPORTED_AUDIO_FORMATS)})")
@@ -1,13 +1,32 @@
+from contextlib import asynccontextmanager
 from websocket.manager import WebSocketManager
 from fastapi import FastAPI, WebSocket
 from routes import call_routes
 from config import settings
 
-app = FastAPI()
+ws_manager = WebSocketManager()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the Realtime pool and render the greetings on startup; close the sockets on shutdown."""
+    ws_manager.realtime_pool.start()
+    ws_manager.greetings.start()
+    yield
+    await ws_manager.greetings.stop()
+    await ws_manager.speculative.close()
+    await ws_manager.realtime_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
+# /incoming-call starts the speculative session through the manager
+app.state.ws_manager = ws_manager
 
 app.include_router(call_routes.router)
 
-ws_manager = WebSocketManager()
+@app.get("/sessions")
+async def active_sessions():
+    """Return the number of live calls and per-call state."""
+    return {**ws_manager.sessions.snapshot(), "realtime_pool": ws_manager.realtime_pool.snapshot(),
+            "speculative": ws_manager.speculative.snapshot(), "greetings": ws_manager.greetings.snapshot()}
 
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from twilio.twiml.voice_response import VoiceResponse, Connect
+from services.speculative_sessions import call_sid_from_request, is_twilio_request
+from config import settings
 
 router = APIRouter()
 
@@ -11,10 +13,19 @@ async def index_page():
 @router.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(request: Request):
     """Handle incoming call and return TwiML response."""
+    if settings.TWILIO_AUTH_TOKEN and not await is_twilio_request(request, settings.TWILIO_AUTH_TOKEN):
+        return Response(status_code=403)
+    # Start the OpenAI session now, while Twilio plays the TwiML
+    ws_manager = getattr(request.app.state, 'ws_manager', None)
+    if ws_manager:
+        ws_manager.speculative.prepare(await call_sid_from_request(request))
+
     response = VoiceResponse()
-    response.say("Please wait while we connect your call...")
-    response.pause(length=1)
-    response.say("O.K. you can start talking!")
+    # With a greeting ready the agent speaks on the stream's start event; otherwise the TwiML notice
+    if not (ws_manager and ws_manager.greetings.ready):
+        response.say("Please wait while we connect your call...")
+        response.pause(length=1)
+        response.say("O.K. you can start talking!")
     
     host = request.url.hostname
     connect = Connect()
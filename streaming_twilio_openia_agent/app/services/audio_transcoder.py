@@ -0,0 +1,49 @@
+"""
+Conversão entre o áudio do Twilio (G.711 μ-law 8 kHz) e o PCM 16-bit 24 kHz
+da OpenAI, usada quando a sessão não está em g711_ulaw.
+
+Um objeto por chamada e por direção: o reamostrador guarda o histórico do
+filtro entre os frames, e a saída guarda o byte que sobrar de um delta com
+número ímpar de bytes. Os payloads entram e saem em base64, como nas
+mensagens de mídia.
+"""
+import binascii
+import numpy as np
+from services.g711 import pcm_to_ulaw, ulaw_to_pcm
+from services.resampler import PolyphaseResampler
+
+TWILIO_RATE = 8000
+# pcm16 da Realtime API: 24 kHz, mono, little-endian
+PCM16_RATE = 24000
+
+class UplinkTranscoder:
+    """Frames μ-law 8 kHz do Twilio -> PCM16 24 kHz para input_audio_buffer.append."""
+
+    def __init__(self):
+        self._resampler = PolyphaseResampler(TWILIO_RATE, PCM16_RATE)
+
+    def convert(self, payload: str) -> str:
+        pcm = self._resampler.process(ulaw_to_pcm(binascii.a2b_base64(payload)))
+        return binascii.b2a_base64(pcm.astype('<i2', copy=False).tobytes(), newline=False).decode('ascii')
+
+class DownlinkTranscoder:
+    """Deltas PCM16 24 kHz da OpenAI -> μ-law 8 kHz para as mensagens de mídia do Twilio."""
+
+    def __init__(self):
+        self._resampler = PolyphaseResampler(PCM16_RATE, TWILIO_RATE)
+        self._carry = b''
+
+    def convert(self, delta: str) -> str:
+        """
+        Converte um delta.
+
+        Returns:
+            str: μ-law em base64; vazio se o delta ainda não rendeu nenhuma amostra
+        """
+        data = self._carry + binascii.a2b_base64(delta)
+        usable = len(data) & ~1
+        self._carry = data[usable:]
+        if not usable:
+            return ''
+        pcm = self._resampler.process(np.frombuffer(data, dtype='<i2', count=usable // 2))
+        return binascii.b2a_base64(pcm_to_ulaw(pcm), newline=False).decode('ascii')
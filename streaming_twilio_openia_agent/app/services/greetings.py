@@ -0,0 +1,125 @@
+"""
+Saudações pré-renderizadas, tocadas assim que o stream começa.
+
+Quem ligava ouvia o <Say> do TwiML e a voz do agente só vinha depois da
+sessão com a OpenAI e de um turno completo do LLM. As saudações
+configuradas são sintetizadas uma vez, na subida da aplicação, com a mesma
+voz das respostas, e guardadas já como mensagens de mídia de 20 ms. No
+evento `start` o áudio vai ao Twilio na hora, enquanto a sessão com o
+provedor ainda está sendo preparada; depois o texto entra no contexto da
+conversa como fala do assistente e as respostas seguem dali.
+"""
+import asyncio
+import logging
+import random
+import re
+import unicodedata
+from typing import NamedTuple
+from services.packetizer import FRAME_MS, UlawPacketizer
+
+logger = logging.getLogger(__name__)
+
+# Nome da marca enviada depois da saudação: volta do Twilio quando ela termina de tocar
+GREETING_MARK = 'greeting'
+_RENDER_TIMEOUT_S = 30.0
+_MAX_RETRY_S = 60.0
+
+def _words(text: str) -> list:
+    """Palavras do texto sem caixa, acentos e pontuação."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return re.findall(r'\w+', ''.join(char for char in text if not unicodedata.combining(char)))
+
+def spoken_as_written(text: str, transcript: str) -> bool:
+    """
+    Se a transcrição do áudio gerado diz o texto da saudação, palavra por palavra.
+
+    O LLM não garante repetir o texto ao pé da letra; uma saudação que
+    acrescenta, corta ou troca palavras é descartada e renderizada de novo.
+    """
+    return _words(text) == _words(transcript)
+
+class Greeting(NamedTuple):
+    """Uma saudação pronta para envio."""
+    text: str
+    payloads: tuple  # μ-law em base64, uma mensagem de mídia cada
+    duration_ms: int
+
+class GreetingLibrary:
+    """
+    Saudações configuradas, renderizadas em segundo plano na subida.
+
+    Args:
+        texts: Textos das saudações (uma é sorteada por chamada)
+        render: Coroutine que recebe um texto e devolve o μ-law 8 kHz falado
+        enabled: Desligado, nenhuma saudação é renderizada nem tocada
+    """
+
+    def __init__(self, texts: list, render, enabled: bool = True):
+        self.texts = [text.strip() for text in texts if text.strip()]
+        self.render = render
+        self.enabled = enabled and bool(self.texts)
+        self._ready = []
+        self._task = None
+        self.stats = {'rendered': 0, 'failed': 0, 'played': 0, 'unavailable': 0}
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._ready)
+
+    @staticmethod
+    def _greeting(text: str, ulaw: bytes) -> Greeting:
+        packetizer = UlawPacketizer()
+        packets = packetizer.feed(ulaw) + packetizer.flush()
+        return Greeting(text, tuple(packet.payload for packet in packets), packetizer.frames * FRAME_MS)
+
+    async def _prepare(self):
+        pending = list(self.texts)
+        retry_s = 1.0
+        while True:
+            for text in list(pending):
+                try:
+                    ulaw = await asyncio.wait_for(self.render(text), _RENDER_TIMEOUT_S)
+                    if not ulaw:
+                        raise ValueError("áudio vazio")
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logger.error(f"Erro ao renderizar a saudação '{text}': {e}")
+                    continue
+                self._ready.append(self._greeting(text, ulaw))
+                self.stats['rendered'] += 1
+                pending.remove(text)
+            if not pending:
+                break
+            # Falhas (rede, cota) são tentadas de novo; as saudações prontas já tocam
+            await asyncio.sleep(retry_s)
+            retry_s = min(retry_s * 2, _MAX_RETRY_S)
+        logger.info(f"{len(self._ready)} saudações prontas")
+
+    def start(self):
+        """Começa a renderizar as saudações (chamado na subida da aplicação)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._prepare())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def pick(self):
+        """
+        Saudação para uma chamada que está começando.
+
+        Returns:
+            Greeting: Uma das saudações prontas, ou None se nenhuma estiver pronta
+        """
+        if not self.enabled:
+            return None
+        if not self._ready:
+            self.stats['unavailable'] += 1
+            return None
+        self.stats['played'] += 1
+        return random.choice(self._ready)
+
+    def snapshot(self) -> dict:
+        return {'ready': len(self._ready), **self.stats}
@@ -0,0 +1,73 @@
+"""
+Codificação das mensagens JSON trocadas com o Twilio e a OpenAI.
+
+As mensagens de alta frequência (mídia a cada 20 ms, marcas, clear,
+input_audio_buffer.append, truncate) são montadas a partir de trechos
+pré-serializados: só o payload muda, então não há dict nem json.dumps por
+frame. Um payload base64 não precisa de escape em JSON, por isso é
+concatenado direto. O resto passa por `dumps`, que usa orjson quando
+instalado e a biblioteca padrão caso contrário.
+
+As mensagens saem como texto (`send_text` no Starlette, `send(str)` no
+websockets): Twilio e OpenAI só aceitam frames de texto.
+"""
+import json
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+def dumps(message) -> str:
+    """Serializa uma mensagem para JSON compacto."""
+    if orjson is not None:
+        return orjson.dumps(message).decode('utf-8')
+    return _encoder.encode(message)
+
+def _json_string(value) -> str:
+    """Valor já escapado para ser embutido em um template JSON."""
+    return json.dumps(value)
+
+class TwilioMessageEncoder:
+    """Mensagens do Twilio Media Streams pré-montadas para um stream."""
+
+    def __init__(self, stream_sid: str):
+        sid = _json_string(stream_sid)
+        self.stream_sid = stream_sid
+        self._media_prefix = '{"event":"media","streamSid":%s,"media":{"payload":"' % sid
+        self._mark_prefix = '{"event":"mark","streamSid":%s,"mark":{"name":' % sid
+        self._marks = {}
+        self.clear = '{"event":"clear","streamSid":%s}' % sid
+
+    def media(self, payload: str) -> str:
+        """Mensagem de mídia com um payload μ-law já em base64."""
+        return self._media_prefix + payload + '"}}'
+
+    def mark(self, name: str) -> str:
+        """Mensagem de marca (os poucos nomes usados ficam em cache)."""
+        message = self._marks.get(name)
+        if message is None:
+            message = self._marks[name] = self._mark_prefix + _json_string(name) + '}}'
+        return message
+
+@lru_cache(maxsize=1024)
+def twilio_encoder(stream_sid: str) -> TwilioMessageEncoder:
+    """Encoder do stream, criado uma vez e reutilizado durante a chamada."""
+    return TwilioMessageEncoder(stream_sid)
+
+_AUDIO_APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+RESPONSE_CREATE = '{"type":"response.create"}'
+RESPONSE_CANCEL = '{"type":"response.cancel"}'
+
+def audio_append(payload: str) -> str:
+    """input_audio_buffer.append da OpenAI com um payload já em base64."""
+    return _AUDIO_APPEND_PREFIX + payload + '"}'
+
+def truncate(item_id: str, audio_end_ms: int) -> str:
+    """conversation.item.truncate da OpenAI."""
+    return '{"type":"conversation.item.truncate","item_id":%s,"content_index":0,"audio_end_ms":%d}' % (
+        _json_string(item_id), audio_end_ms
+    )
@@ -1,5 +1,9 @@
+import base64
 import json
+import websockets
 from config import settings
+from services import message_encoder
+from services.greetings import spoken_as_written
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -15,21 +19,76 @@ class OpenAIService:
                 "type": "session.update",
                 "session": {
                     "turn_detection": {"type": "server_vad"},
-                    "input_audio_format": "g711_ulaw",
-                    "output_audio_format": "g711_ulaw",
+                    "input_audio_format": settings.INPUT_AUDIO_FORMAT,
+                    "output_audio_format": settings.OUTPUT_AUDIO_FORMAT,
                     "voice": settings.VOICE,
                     "instructions": settings.SYSTEM_MESSAGE,
                     "modalities": ["text", "audio"],
                     "temperature": 0.8,
                 }
             }
-            logger.info(f"Enviando configuração da sessão: {json.dumps(session_update)}")
-            await openai_ws.send(json.dumps(session_update))
+            session_message = message_encoder.dumps(session_update)
+            logger.info(f"Enviando configuração da sessão: {session_message}")
+            await openai_ws.send(session_message)
             logger.info("Sessão OpenAI inicializada com sucesso")
         except Exception as e:
             logger.error(f"Erro ao inicializar sessão OpenAI: {e}")
             raise
 
+    @staticmethod
+    async def send_greeting_item(openai_ws, text: str):
+        """Record the greeting already played to the caller as the assistant's first turn."""
+        greeting_item = {
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}]
+            }
+        }
+        await openai_ws.send(message_encoder.dumps(greeting_item))
+
+    @staticmethod
+    async def render_speech(url: str, headers: dict, text: str) -> bytes:
+        """
+        Speak `text` with the session's voice on a dedicated Realtime socket and return it as μ-law 8 kHz.
+
+        The model is only asked to read the text, so the audio's transcript is
+        checked against it; a rendering that says anything else raises ValueError.
+        """
+        async with websockets.connect(url, extra_headers=headers) as openai_ws:
+            await OpenAIService.initialize_session(openai_ws)
+            # Twilio's format regardless of the live session's, and no VAD: nobody is talking
+            await openai_ws.send(message_encoder.dumps({
+                "type": "session.update",
+                "session": {"output_audio_format": settings.TWILIO_AUDIO_FORMAT, "turn_detection": None}
+            }))
+            await openai_ws.send(message_encoder.dumps({
+                "type": "response.create",
+                "response": {
+                    "modalities": ["text", "audio"],
+                    "instructions": f"Fale exatamente o texto a seguir, sem acrescentar nada: {text}",
+                    # Lowest temperature the Realtime API accepts
+                    "temperature": 0.6
+                }
+            }))
+            audio = bytearray()
+            transcript = []
+            async for message in openai_ws:
+                event = json.loads(message)
+                if event['type'] == 'response.audio.delta':
+                    audio += base64.b64decode(event['delta'])
+                elif event['type'] == 'response.audio_transcript.delta':
+                    transcript.append(event['delta'])
+                elif event['type'] == 'response.done':
+                    spoken = ''.join(transcript)
+                    if not spoken_as_written(text, spoken):
+                        raise ValueError(f"Rendered speech does not match the greeting: {spoken!r}")
+                    return bytes(audio)
+                elif event['type'] == 'error':
+                    raise RuntimeError(f"Realtime API error: {event}")
+        raise ConnectionError("Realtime socket closed before the greeting was rendered")
+
     @staticmethod
     async def send_initial_conversation_item(openai_ws):
         """Send initial conversation item if AI talks first."""
@@ -46,5 +105,5 @@ class OpenAIService:
                 ]
             }
         }
-        await openai_ws.send(json.dumps(initial_conversation_item))
-        await openai_ws.send(json.dumps({"type": "response.create"}))
\ No newline at end of file
+        await openai_ws.send(message_encoder.dumps(initial_conversation_item))
+        await openai_ws.send(message_encoder.RESPONSE_CREATE)
\ No newline at end of file
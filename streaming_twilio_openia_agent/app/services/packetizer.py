@@ -0,0 +1,106 @@
+import binascii
+from typing import NamedTuple
+from services.g711 import ULAW_SILENCE
+
+# Um frame do Twilio Media Streams: 20 ms de μ-law 8 kHz
+FRAME_BYTES = 160
+FRAME_MS = 20
+
+class MediaPacket(NamedTuple):
+    """Uma mensagem de mídia para o Twilio, com a posição dos seus frames no fluxo."""
+    payload: str  # μ-law em base64
+    first_frame: int  # índice do primeiro frame da mensagem no fluxo
+    frame_count: int
+
+    @property
+    def end_frame(self) -> int:
+        return self.first_frame + self.frame_count
+
+    @property
+    def start_ms(self) -> int:
+        return self.first_frame * FRAME_MS
+
+    @property
+    def end_ms(self) -> int:
+        return self.end_frame * FRAME_MS
+
+class UlawPacketizer:
+    """
+    Corta um fluxo μ-law em frames exatos de 160 bytes (20 ms) para o Twilio.
+
+    Os bytes que não completam um frame ficam guardados para o próximo
+    `feed`; `flush` completa o último frame com silêncio. Cada mensagem leva
+    `frames_per_message` frames (menos mensagens no WebSocket em troca de
+    granularidade) e a posição do primeiro frame, para calcular quanto do
+    áudio já foi enviado ou tocado.
+    """
+
+    def __init__(self, frames_per_message: int = 1):
+        self.frames_per_message = max(1, frames_per_message)
+        self.message_bytes = self.frames_per_message * FRAME_BYTES
+        self.frames = 0  # frames já empacotados
+        self._pending = bytearray()
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._pending)
+
+    @property
+    def duration_ms(self) -> int:
+        """Duração do áudio já empacotado, em ms."""
+        return self.frames * FRAME_MS
+
+    def _packet(self, data) -> MediaPacket:
+        frame_count = len(data) // FRAME_BYTES
+        packet = MediaPacket(
+            binascii.b2a_base64(data, newline=False).decode('ascii'),
+            self.frames,
+            frame_count
+        )
+        self.frames += frame_count
+        return packet
+
+    def feed(self, ulaw) -> list:
+        """
+        Adiciona áudio μ-law ao fluxo.
+
+        Args:
+            ulaw: Bytes μ-law (bytes, bytearray, memoryview ou array uint8)
+
+        Returns:
+            list: MediaPackets com `frames_per_message` frames completos cada
+        """
+        data = memoryview(ulaw).cast('B')
+        if self._pending:
+            self._pending += data
+            data = memoryview(self._pending)
+
+        ready = len(data) - len(data) % self.message_bytes
+        packets = [
+            self._packet(data[offset:offset + self.message_bytes])
+            for offset in range(0, ready, self.message_bytes)
+        ]
+
+        leftover = bytes(data[ready:])
+        data.release()
+        self._pending = bytearray(leftover)
+        return packets
+
+    def flush(self) -> list:
+        """
+        Empacota o que sobrou, completando o último frame com silêncio.
+
+        Returns:
+            list: Nenhum ou um MediaPacket com os frames restantes
+        """
+        if not self._pending:
+            return []
+        partial = len(self._pending) % FRAME_BYTES
+        if partial:
+            self._pending += bytes([ULAW_SILENCE]) * (FRAME_BYTES - partial)
+        data, self._pending = bytes(self._pending), bytearray()
+        return [self._packet(data)]
+
+    def reset(self):
+        """Descarta o áudio pendente (ex.: após uma interrupção), mantendo a contagem de frames."""
+        self._pending = bytearray()
@@ -0,0 +1,207 @@
+"""
+Pool de conexões pré-aquecidas com a OpenAI Realtime.
+
+Abrir a conexão na hora da chamada põe o handshake TLS, o upgrade do
+WebSocket e o `session.update` no primeiro segundo do cliente. O pool
+mantém sockets já autenticados e com a sessão configurada (o servidor
+confirmou com `session.updated`); cada chamada leva um pronto e o pool
+repõe em segundo plano.
+
+O tamanho acompanha o ritmo de chegada: com `rate` chamadas/s e `warm_s`
+segundos para aquecer um socket, chegam cerca de `rate * warm_s` chamadas
+enquanto a reposição não fica pronta. Sockets parados há mais de
+`idle_timeout_s` são fechados (e repostos, se ainda fizerem parte do alvo).
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+import websockets
+import logging
+
+logger = logging.getLogger(__name__)
+
+READY_EVENT = 'session.updated'
+_READY_TIMEOUT_S = 10.0
+_MAX_BACKOFF_S = 30.0
+
+class RealtimePool:
+    """
+    Args:
+        url: URL da Realtime API
+        headers: Headers de autenticação
+        initialize: Coroutine que configura a sessão num socket recém-aberto
+        min_size: Sockets prontos mantidos mesmo sem chamadas
+        max_size: Limite de sockets prontos (0 desliga o pool: toda chamada conecta na hora)
+        idle_timeout_s: Tempo máximo de um socket parado no pool
+        window_s: Janela usada para medir o ritmo de chegada das chamadas
+    """
+
+    def __init__(self, url: str, headers: dict, initialize, min_size: int = 1, max_size: int = 8,
+                 idle_timeout_s: float = 120.0, window_s: float = 30.0):
+        self.url = url
+        self.headers = headers
+        self.initialize = initialize
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.idle_timeout_s = idle_timeout_s
+        self.window_s = window_s
+        self._ready = deque()  # (socket, pronto desde)
+        self._warming = 0
+        self._arrivals = deque()
+        self._warm_s = 1.0  # média móvel do tempo de aquecimento
+        self._backoff_s = 1.0  # espera após uma falha, dobra a cada falha seguida
+        self._wake = asyncio.Event()
+        self._task = None
+        self._background = set()
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'failed': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def target(self) -> int:
+        """Sockets prontos desejados para o ritmo de chegada atual."""
+        if not self._arrivals:
+            return self.min_size
+        # Ritmo desde a chegada mais antiga da janela: sobe rápido numa rajada e cai sozinho depois
+        span = max(time.monotonic() - self._arrivals[0], self._warm_s)
+        rate = len(self._arrivals) / span
+        wanted = math.ceil(rate * self._warm_s * 2)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    async def _connect(self):
+        """Abre e configura um socket (caminho frio, sem esperar confirmação)."""
+        openai_ws = await websockets.connect(self.url, extra_headers=self.headers)
+        try:
+            await self.initialize(openai_ws)
+        except Exception:
+            await openai_ws.close()
+            raise
+        return openai_ws
+
+    async def _warm_one(self):
+        started = time.monotonic()
+        try:
+            openai_ws = await self._connect()
+            try:
+                # Só entra no pool depois que o servidor aplicou a sessão
+                await asyncio.wait_for(self._wait_ready(openai_ws), _READY_TIMEOUT_S)
+            except BaseException:
+                await openai_ws.close()
+                raise
+            self._warm_s = 0.8 * self._warm_s + 0.2 * (time.monotonic() - started)
+            self._ready.append((openai_ws, time.monotonic()))
+            self._backoff_s = 1.0
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"Erro ao aquecer conexão OpenAI: {e}")
+            await asyncio.sleep(self._backoff_s)
+            self._backoff_s = min(self._backoff_s * 2, _MAX_BACKOFF_S)
+        finally:
+            self._warming -= 1
+            self._wake.set()
+
+    @staticmethod
+    async def _wait_ready(openai_ws):
+        async for message in openai_ws:
+            event = json.loads(message)
+            if event.get('type') == READY_EVENT:
+                return
+            if event.get('type') == 'error':
+                raise RuntimeError(f"Sessão recusada: {event}")
+        raise ConnectionError("Conexão fechada antes da sessão ficar pronta")
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _evict(self) -> int:
+        """
+        Fecha sockets mortos, além do alvo ou parados demais.
+
+        Um socket vencido continua servindo até a reposição ficar pronta.
+
+        Returns:
+            int: Sockets prontos dentro do prazo
+        """
+        now = time.monotonic()
+        while self._arrivals and now - self._arrivals[0] > self.window_s:
+            self._arrivals.popleft()
+
+        target = self.target
+        fresh = sum(1 for openai_ws, since in self._ready
+                    if openai_ws.open and now - since <= self.idle_timeout_s)
+        kept = deque()
+        kept_fresh = 0
+        for openai_ws, since in self._ready:
+            expired = now - since > self.idle_timeout_s
+            if not openai_ws.open or (expired and fresh >= target) or (not expired and kept_fresh >= target):
+                self.stats['evicted'] += 1
+                self._spawn(openai_ws.close())
+                continue
+            kept_fresh += not expired
+            kept.append((openai_ws, since))
+        self._ready = kept
+        return min(fresh, target)
+
+    async def _maintain(self):
+        while True:
+            fresh = self._evict()
+            missing = self.target - fresh - self._warming
+            for _ in range(max(0, missing)):
+                self._warming += 1
+                self._spawn(self._warm_one())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.idle_timeout_s, 5.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Começa a manter o pool (chamado na subida da aplicação)."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+            logger.info(f"Pool Realtime iniciado (mín. {self.min_size}, máx. {self.max_size})")
+
+    async def acquire(self):
+        """
+        Entrega um socket com a sessão já configurada.
+
+        Se o pool estiver vazio (ou desligado) conecta na hora, como antes.
+        """
+        if self.enabled:
+            self._arrivals.append(time.monotonic())
+        while self._ready:
+            openai_ws, _ = self._ready.popleft()
+            if openai_ws.open:
+                self.stats['hits'] += 1
+                self._wake.set()
+                return openai_ws
+            self.stats['evicted'] += 1
+        self.stats['misses'] += 1
+        self._wake.set()
+        return await self._connect()
+
+    async def stop(self):
+        """Para a reposição e fecha os sockets prontos."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._background):
+            task.cancel()
+        while self._ready:
+            openai_ws, _ = self._ready.popleft()
+            await openai_ws.close()
+
+    def snapshot(self) -> dict:
+        return {
+            'ready': len(self._ready),
+            'warming': self._warming,
+            'target': self.target,
+            'warm_ms': round(self._warm_s * 1000),
+            **self.stats,
+        }
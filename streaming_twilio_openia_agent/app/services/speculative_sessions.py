@@ -0,0 +1,153 @@
+"""
+Sessões com o provedor abertas de forma especulativa no webhook da chamada.
+
+O webhook `/incoming-call` chega cerca de um segundo antes do Twilio abrir o
+`/media-stream`. Nesse intervalo a sessão com o provedor (OpenAI Realtime ou
+ElevenLabs) já pode ir sendo preparada, guardada pelo `CallSid`; quando o
+evento `start` chega com o mesmo `callSid`, o handler adota a sessão pronta
+(ou ainda em preparo) em vez de começar do zero. Sessões que ninguém adota
+dentro de `ttl_s` são descartadas.
+
+Cada sessão preparada ocupa um socket com o provedor, então só webhooks com
+assinatura do Twilio válida (`is_twilio_request`) devem chegar a `prepare`,
+e no máximo `max_pending` sessões ficam à espera ao mesmo tempo.
+"""
+import asyncio
+import time
+from urllib.parse import parse_qsl
+from starlette.datastructures import ImmutableMultiDict
+from twilio.request_validator import RequestValidator
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def webhook_params(request) -> ImmutableMultiDict:
+    """Parâmetros do corpo do webhook (formulário no POST; no GET eles vêm na URL)."""
+    if request.method != 'POST':
+        return ImmutableMultiDict()
+    if 'application/x-www-form-urlencoded' not in request.headers.get('content-type', ''):
+        return ImmutableMultiDict()
+    body = (await request.body()).decode('utf-8', 'replace')
+    # Parâmetros vazios também entram na assinatura do Twilio
+    return ImmutableMultiDict(parse_qsl(body, keep_blank_values=True))
+
+async def call_sid_from_request(request) -> str:
+    """CallSid do webhook do Twilio (query string no GET, formulário no POST)."""
+    call_sid = request.query_params.get('CallSid')
+    if call_sid or request.method != 'POST':
+        return call_sid
+    return (await webhook_params(request)).get('CallSid')
+
+def webhook_url(request) -> str:
+    """URL que o Twilio chamou; atrás de um proxy (ngrok) o esquema original vem em X-Forwarded-Proto."""
+    proto = request.headers.get('x-forwarded-proto')
+    if proto:
+        return str(request.url.replace(scheme=proto.split(',')[0].strip()))
+    return str(request.url)
+
+async def is_twilio_request(request, auth_token: str) -> bool:
+    """Confere o X-Twilio-Signature do webhook com o auth token da conta."""
+    signature = request.headers.get('x-twilio-signature')
+    if not signature or not auth_token:
+        return False
+    return RequestValidator(auth_token).validate(webhook_url(request), await webhook_params(request), signature)
+
+class SpeculativeSessionStore:
+    """
+    Sessões preparadas por CallSid, à espera do evento `start`.
+
+    Args:
+        prepare: Coroutine sem argumentos que abre uma sessão
+        discard: Coroutine que fecha uma sessão não adotada
+        ttl_s: Tempo até uma sessão não adotada ser descartada
+        max_pending: Sessões à espera ao mesmo tempo; além disso, `prepare` recusa
+        enabled: Desligado, `prepare` não faz nada e `adopt` sempre devolve None
+    """
+
+    def __init__(self, prepare, discard, ttl_s: float = 15.0,
+                 max_pending: int = 50, enabled: bool = True):
+        self.prepare_session = prepare
+        self.discard_session = discard
+        self.ttl_s = ttl_s
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._pending = {}  # call_sid -> (task, timer, criada em)
+        self._discards = set()
+        self.stats = {'prepared': 0, 'adopted': 0, 'expired': 0, 'failed': 0,
+                      'refused': 0, 'head_start_ms': 0}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def prepare(self, call_sid: str):
+        """Começa a preparar a sessão da chamada, sem esperar."""
+        if not self.enabled or not call_sid or call_sid in self._pending:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.stats['refused'] += 1
+            logger.warning(f"Sessão especulativa de {call_sid} recusada: {self.max_pending} já à espera")
+            return
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(self.prepare_session())
+        timer = loop.call_later(self.ttl_s, self._expire, call_sid)
+        self._pending[call_sid] = (task, timer, time.monotonic())
+        self.stats['prepared'] += 1
+        logger.info(f"Sessão especulativa iniciada para {call_sid}")
+
+    async def adopt(self, call_sid: str):
+        """
+        Entrega a sessão preparada para a chamada.
+
+        Returns:
+            A sessão, ou None se não houver uma (ou se o preparo falhou)
+        """
+        entry = self._pending.pop(call_sid, None) if call_sid else None
+        if entry is None:
+            return None
+        task, timer, created = entry
+        timer.cancel()
+        try:
+            session = await task
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"Sessão especulativa de {call_sid} falhou: {e}")
+            return None
+        self.stats['adopted'] += 1
+        # Vantagem acumulada: quanto antes do start o preparo começou
+        self.stats['head_start_ms'] += round((time.monotonic() - created) * 1000)
+        logger.info(f"Sessão especulativa adotada para {call_sid}")
+        return session
+
+    def _expire(self, call_sid: str):
+        entry = self._pending.pop(call_sid, None)
+        if entry is None:
+            return
+        task, _, _ = entry
+        self.stats['expired'] += 1
+        logger.info(f"Sessão especulativa de {call_sid} descartada (não adotada)")
+        if not task.done():
+            task.cancel()
+        discard = asyncio.get_running_loop().create_task(self._discard(task))
+        self._discards.add(discard)
+        discard.add_done_callback(self._discards.discard)
+
+    async def _discard(self, task):
+        try:
+            session = await task
+        except BaseException:
+            return
+        try:
+            await self.discard_session(session)
+        except Exception as e:
+            logger.error(f"Erro ao descartar sessão especulativa: {e}")
+
+    async def close(self):
+        """Descarta todas as sessões pendentes (parada da aplicação)."""
+        for call_sid in list(self._pending):
+            self._pending[call_sid][1].cancel()
+            self._expire(call_sid)
+        if self._discards:
+            await asyncio.gather(*self._discards, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {'pending': len(self._pending), **self.stats}
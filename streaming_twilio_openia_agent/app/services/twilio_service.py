@@ -1,22 +1,15 @@
 from fastapi import WebSocket
+from services.message_encoder import twilio_encoder
 
 class TwilioService:
     @staticmethod
-    async def send_mark(connection: WebSocket, stream_sid: str, mark_queue: list):
+    async def send_mark(connection: WebSocket, stream_sid: str, mark_queue: list, name: str = 'responsePart'):
         """Send mark event for synchronization."""
         if stream_sid:
-            mark_event = {
-                "event": "mark",
-                "streamSid": stream_sid,
-                "mark": {"name": "responsePart"}
-            }
-            await connection.send_json(mark_event)
-            mark_queue.append('responsePart')
+            await connection.send_text(twilio_encoder(stream_sid).mark(name))
+            mark_queue.append(name)
 
     @staticmethod
     async def send_clear_event(websocket: WebSocket, stream_sid: str):
         """Send clear event to Twilio."""
-        await websocket.send_json({
-            "event": "clear",
-            "streamSid": stream_sid
-        })
\ No newline at end of file
+        await websocket.send_text(twilio_encoder(stream_sid).clear)
\ No newline at end of file
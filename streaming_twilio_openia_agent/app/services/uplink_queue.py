@@ -0,0 +1,155 @@
+"""
+Fila limitada entre a leitura do Twilio e o envio dos frames à OpenAI.
+
+Quem lê o WebSocket do Twilio só enfileira; uma task separada envia. Se a
+OpenAI fica lenta, a fila enche e a política decide o que acontece:
+
+- `block`: a leitura espera vaga (o atraso fica nos buffers do socket);
+- `drop_oldest`: descarta o frame mais antigo da fila;
+- `drop_silence`: descarta primeiro o frame de silêncio mais antigo e, se
+  não houver nenhum, o mais antigo.
+
+Na saída, frames mais velhos que `max_age_ms` são descartados: áudio de
+segundos atrás não serve mais para a conversa. A idade vem do timestamp do
+Twilio comparado com o relógio local, então inclui o tempo parado nos
+buffers do socket.
+"""
+import asyncio
+import binascii
+import time
+from collections import deque
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_SILENCE = 'drop_silence'
+POLICIES = frozenset((BLOCK, DROP_OLDEST, DROP_SILENCE))
+
+# Amostra μ-law "audível": código de magnitude a partir de 0x20 (pico acima de ~-40 dBFS)
+_SILENCE_MAX_MAGNITUDE = 0x1F
+_LOUD = bytes(1 if ((~b) & 0x7F) > _SILENCE_MAX_MAGNITUDE else 0 for b in range(256))
+
+def is_silent(payload: str) -> bool:
+    """Verdadeiro se nenhuma amostra do frame (μ-law em base64) passa do limiar de silêncio."""
+    try:
+        return b'\x01' not in binascii.a2b_base64(payload).translate(_LOUD)
+    except ValueError:
+        # binascii.Error (base64 inválido) ou texto não ASCII
+        return False
+
+class UplinkFrameQueue:
+    """
+    Fila de frames de uma chamada, do Twilio para o upstream.
+
+    Args:
+        maxsize: Frames na fila (50 = 1 s de áudio)
+        policy: `block`, `drop_oldest` ou `drop_silence`
+        max_age_ms: Idade máxima de um frame ao sair da fila (0 desliga o corte)
+    """
+
+    def __init__(self, maxsize: int = 50, policy: str = DROP_SILENCE, max_age_ms: int = 1000):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de fila inválida: {policy}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.max_age_ms = max_age_ms
+        self._frames = deque()  # (payload, timestamp, silencioso)
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+        # Menor (chegada - timestamp) visto: o caminho mais rápido serve de referência de idade
+        self._origin_ms = None
+        self.stats = {
+            'policy': policy,
+            'depth': 0,
+            'max_depth': 0,
+            'enqueued': 0,
+            'sent': 0,
+            'dropped_oldest': 0,
+            'dropped_silence': 0,
+            'dropped_stale': 0,
+            'max_frame_age_ms': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def _update_depth(self):
+        depth = len(self._frames)
+        self.stats['depth'] = depth
+        if depth > self.stats['max_depth']:
+            self.stats['max_depth'] = depth
+        if depth >= self.maxsize:
+            self._not_full.clear()
+        else:
+            self._not_full.set()
+
+    def _make_room(self):
+        """Abre uma vaga conforme a política (fila cheia, política de descarte)."""
+        if self.policy == DROP_SILENCE:
+            for index, frame in enumerate(self._frames):
+                if frame[2]:
+                    del self._frames[index]
+                    self.stats['dropped_silence'] += 1
+                    return
+        self._frames.popleft()
+        self.stats['dropped_oldest'] += 1
+
+    async def put(self, payload: str, timestamp: int):
+        """Enfileira um frame do Twilio (base64 e timestamp em ms)."""
+        if self._closed:
+            return
+        now_ms = time.monotonic() * 1000
+        offset = now_ms - timestamp
+        if self._origin_ms is None or offset < self._origin_ms:
+            self._origin_ms = offset
+
+        if len(self._frames) >= self.maxsize:
+            if self.policy == BLOCK:
+                while len(self._frames) >= self.maxsize and not self._closed:
+                    await self._not_full.wait()
+                if self._closed:
+                    return
+            else:
+                self._make_room()
+
+        silent = self.policy == DROP_SILENCE and is_silent(payload)
+        self._frames.append((payload, timestamp, silent))
+        self.stats['enqueued'] += 1
+        self._update_depth()
+        self._not_empty.set()
+
+    def age_ms(self, timestamp: int) -> float:
+        """Atraso de um frame em relação ao frame que chegou mais rápido."""
+        return time.monotonic() * 1000 - timestamp - self._origin_ms
+
+    async def get(self):
+        """
+        Próximo frame ainda fresco.
+
+        Returns:
+            tuple: (payload, timestamp), ou None quando a fila foi fechada e esvaziada
+        """
+        while True:
+            while not self._frames:
+                if self._closed:
+                    return None
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            payload, timestamp, _ = self._frames.popleft()
+            self._update_depth()
+            age = self.age_ms(timestamp)
+            if self.max_age_ms and age > self.max_age_ms:
+                self.stats['dropped_stale'] += 1
+                continue
+            if age > self.stats['max_frame_age_ms']:
+                self.stats['max_frame_age_ms'] = round(age)
+            self.stats['sent'] += 1
+            return payload, timestamp
+
+    def close(self):
+        """Fecha a fila: `put` passa a ignorar frames e `get` devolve None ao esvaziar."""
+        self._closed = True
+        self._not_empty.set()
+        self._not_full.set()
@@ -1,9 +1,14 @@
 import json
-import base64
+import time
 import asyncio
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect
+from services.audio_transcoder import DownlinkTranscoder, UplinkTranscoder
 from services.twilio_service import TwilioService
+from services import message_encoder
+from services.greetings import GREETING_MARK, Greeting
+from services.twilio_events import MEDIA, parse_event
+from services.uplink_queue import UplinkFrameQueue
 from config import settings
 import logging
 
@@ -17,32 +22,115 @@ class WebSocketHandler:
         self.last_assistant_item = None
         self.mark_queue = []
         self.response_start_timestamp_twilio = None
+        self.metrics = {}
+        self.audio_passthrough = (
+            settings.INPUT_AUDIO_FORMAT == settings.TWILIO_AUDIO_FORMAT
+            and settings.OUTPUT_AUDIO_FORMAT == settings.TWILIO_AUDIO_FORMAT
+        )
+        self.metrics['audio_path'] = 'passthrough' if self.audio_passthrough else 'transcode'
+        # pcm16 on either side: μ-law 8 kHz <-> PCM16 24 kHz, one stateful transcoder per direction
+        self.uplink_transcoder = (
+            UplinkTranscoder() if settings.INPUT_AUDIO_FORMAT != settings.TWILIO_AUDIO_FORMAT else None
+        )
+        self.downlink_transcoder = (
+            DownlinkTranscoder() if settings.OUTPUT_AUDIO_FORMAT != settings.TWILIO_AUDIO_FORMAT else None
+        )
+        # Twilio frames on their way to OpenAI: the reader only enqueues, a separate task sends
+        self.uplink = UplinkFrameQueue(
+            settings.UPLINK_QUEUE_SIZE, settings.UPLINK_QUEUE_POLICY, settings.UPLINK_MAX_AGE_MS
+        )
+        self.metrics['uplink'] = self.uplink.stats
+        self._messages = None
+        self.greeting_playing = False
+        self.stream_started_at = None
+        # Rare Twilio events; media frames are handled inline in the receive loop
+        self._event_handlers = {
+            'start': self.handle_start_event,
+            'mark': self.handle_mark_event,
+        }
 
     async def receive_from_twilio(self, websocket: WebSocket, openai_ws):
         """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
         try:
             async for message in websocket.iter_text():
-                data = json.loads(message)
-                if data['event'] == 'media' and openai_ws.open:
-                    self.latest_media_timestamp = int(data['media']['timestamp'])
-                    audio_append = {
-                        "type": "input_audio_buffer.append",
-                        "audio": data['media']['payload']
-                    }
-                    await openai_ws.send(json.dumps(audio_append))
-                elif data['event'] == 'start':
-                    self.stream_sid = data['start']['streamSid']
-                    print(f"Incoming stream has started {self.stream_sid}")
-                    self.response_start_timestamp_twilio = None
-                    self.latest_media_timestamp = 0
-                    self.last_assistant_item = None
-                elif data['event'] == 'mark':
-                    if self.mark_queue:
-                        self.mark_queue.pop(0)
+                event_type, data = parse_event(message)
+                if event_type == MEDIA:
+                    self.latest_media_timestamp = data.timestamp
+                    await self.uplink.put(data.payload, data.timestamp)
+                    continue
+
+                handler = self._event_handlers.get(event_type)
+                if handler:
+                    handler(data)
         except WebSocketDisconnect:
             print("Client disconnected.")
             if openai_ws.open:
                 await openai_ws.close()
+        finally:
+            self.uplink.close()
+
+    async def forward_to_openai(self, openai_ws):
+        """Send queued Twilio frames to the OpenAI Realtime API, skipping stale ones."""
+        try:
+            while True:
+                frame = await self.uplink.get()
+                if frame is None:
+                    break
+                if openai_ws.open:
+                    payload = frame[0]
+                    if self.uplink_transcoder:
+                        payload = self.uplink_transcoder.convert(payload)
+                    await openai_ws.send(message_encoder.audio_append(payload))
+        except Exception as e:
+            print(f"Error in forward_to_openai: {e}")
+        finally:
+            self.uplink.close()
+
+    async def wait_for_start(self, websocket: WebSocket) -> str:
+        """Read Twilio events until the stream starts; return the call's CallSid."""
+        try:
+            async for message in websocket.iter_text():
+                event_type, data = parse_event(message)
+                if event_type == 'start':
+                    self.handle_start_event(data)
+                    return data['start'].get('callSid')
+        except WebSocketDisconnect:
+            print("Client disconnected before the stream started.")
+        return None
+
+    def handle_start_event(self, data: dict):
+        """Reset per-stream state when Twilio starts the media stream."""
+        self.stream_sid = data['start']['streamSid']
+        self._messages = message_encoder.twilio_encoder(self.stream_sid)
+        print(f"Incoming stream has started {self.stream_sid}")
+        self.stream_started_at = time.monotonic()
+        self.response_start_timestamp_twilio = None
+        self.latest_media_timestamp = 0
+        self.last_assistant_item = None
+
+    def handle_mark_event(self, data: dict):
+        """Twilio finished playing audio up to one of our marks."""
+        if self.mark_queue:
+            if self.mark_queue.pop(0) == GREETING_MARK:
+                self.greeting_playing = False
+
+    async def play_greeting(self, websocket: WebSocket, greeting: Greeting):
+        """Send a pre-rendered greeting to Twilio right away, followed by its mark."""
+        self.metrics['greeting'] = {
+            'duration_ms': greeting.duration_ms,
+            'start_to_audio_ms': round((time.monotonic() - self.stream_started_at) * 1000),
+            'interrupted': False,
+        }
+        self.greeting_playing = True
+        for payload in greeting.payloads:
+            await websocket.send_text(self._messages.media(payload))
+        await TwilioService.send_mark(websocket, self.stream_sid, self.mark_queue, GREETING_MARK)
+
+    async def interrupt_greeting(self, websocket: WebSocket):
+        """The caller spoke over the greeting: drop what Twilio still has buffered."""
+        self.greeting_playing = False
+        self.metrics['greeting']['interrupted'] = True
+        await TwilioService.send_clear_event(websocket, self.stream_sid)
 
     async def send_to_twilio(self, websocket: WebSocket, openai_ws):
         """Receive events from the OpenAI Realtime API, send audio back to Twilio."""
@@ -53,15 +141,7 @@ class WebSocketHandler:
                     print(f"Received event: {response['type']}", response)
 
                 if response.get('type') == 'response.audio.delta' and 'delta' in response:
-                    audio_payload = base64.b64encode(base64.b64decode(response['delta'])).decode('utf-8')
-                    audio_delta = {
-                        "event": "media",
-                        "streamSid": self.stream_sid,
-                        "media": {
-                            "payload": audio_payload
-                        }
-                    }
-                    await websocket.send_json(audio_delta)
+                    await self.send_audio_delta(websocket, response['delta'])
 
                     if self.response_start_timestamp_twilio is None:
                         self.response_start_timestamp_twilio = self.latest_media_timestamp
@@ -73,25 +153,32 @@ class WebSocketHandler:
 
                 if response.get('type') == 'input_audio_buffer.speech_started':
                     print("Speech started detected.")
+                    if self.greeting_playing:
+                        print("Interrupting greeting")
+                        await self.interrupt_greeting(websocket)
                     if self.last_assistant_item:
                         print(f"Interrupting response with id: {self.last_assistant_item}")
                         await self.handle_speech_started_event(websocket, openai_ws)
         except Exception as e:
             print(f"Error in send_to_twilio: {e}")
 
+    async def send_audio_delta(self, websocket: WebSocket, delta: str):
+        """Forward one OpenAI audio delta (base64) to Twilio as a media message."""
+        messages = self._messages or message_encoder.twilio_encoder(self.stream_sid)
+        if self.downlink_transcoder:
+            delta = self.downlink_transcoder.convert(delta)
+            if not delta:
+                return
+        # μ-law base64 either way: spliced into the media message as is
+        await websocket.send_text(messages.media(delta))
+
     async def handle_speech_started_event(self, websocket: WebSocket, openai_ws):
         """Handle interruption when the caller's speech starts."""
         if self.mark_queue and self.response_start_timestamp_twilio is not None:
             elapsed_time = self.latest_media_timestamp - self.response_start_timestamp_twilio
 
             if self.last_assistant_item:
-                truncate_event = {
-                    "type": "conversation.item.truncate",
-                    "item_id": self.last_assistant_item,
-                    "content_index": 0,
-                    "audio_end_ms": elapsed_time
-                }
-                await openai_ws.send(json.dumps(truncate_event))
+                await openai_ws.send(message_encoder.truncate(self.last_assistant_item, elapsed_time))
 
             await TwilioService.send_clear_event(websocket, self.stream_sid)
             self.mark_queue.clear()
@@ -105,6 +192,9 @@ class WebSocketHandler:
             receive_task = asyncio.create_task(
                 self.receive_from_twilio(websocket, openai_ws)
             )
+            forward_task = asyncio.create_task(
+                self.forward_to_openai(openai_ws)
+            )
             send_task = asyncio.create_task(
                 self.send_to_twilio(websocket, openai_ws)
             )
@@ -112,7 +202,7 @@ class WebSocketHandler:
             logger.info("Tarefas de envio e recebimento iniciadas")
             
             try:
-                await asyncio.gather(receive_task, send_task)
+                await asyncio.gather(receive_task, forward_task, send_task)
             except asyncio.CancelledError:
                 logger.info("Tarefas canceladas")
             except Exception as e:
@@ -1,36 +1,82 @@
-import websockets
 from fastapi import WebSocket
 from config import settings
 from services.openai_service import OpenAIService
+from services.greetings import GreetingLibrary
+from services.realtime_pool import RealtimePool
+from services.speculative_sessions import SpeculativeSessionStore
 from websocket.handlers import WebSocketHandler
+from websocket.sessions import SessionRegistry
 import logging
 
 logger = logging.getLogger(__name__)
 
 class WebSocketManager:
     def __init__(self):
-        self.handler = WebSocketHandler()
+        self.sessions = SessionRegistry()
+        self.realtime_pool = RealtimePool(
+            f'wss://api.openai.com/v1/realtime?model={settings.OPENAI_MODEL}',
+            {
+                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+                "OpenAI-Beta": "realtime=v1"
+            },
+            OpenAIService.initialize_session,
+            min_size=settings.REALTIME_POOL_MIN,
+            max_size=settings.REALTIME_POOL_MAX,
+            idle_timeout_s=settings.REALTIME_POOL_IDLE_S,
+        )
+        # Sockets taken at /incoming-call, waiting for the stream's start event
+        self.speculative = SpeculativeSessionStore(
+            self.realtime_pool.acquire,
+            self._close_socket,
+            ttl_s=settings.SPECULATIVE_TTL_S,
+            max_pending=settings.SPECULATIVE_MAX_PENDING,
+            # Only signed webhooks may open a socket ahead of the stream
+            enabled=settings.SPECULATIVE_SETUP and bool(settings.TWILIO_AUTH_TOKEN)
+        )
+        if settings.SPECULATIVE_SETUP and not settings.TWILIO_AUTH_TOKEN:
+            logger.warning("TWILIO_AUTH_TOKEN not set: speculative sessions disabled")
+        # Greetings in the session's voice, played on start while the socket is adopted
+        self.greetings = GreetingLibrary(settings.GREETINGS, self._render_greeting)
+
+    @staticmethod
+    async def _close_socket(openai_ws):
+        await openai_ws.close()
+
+    async def _render_greeting(self, text: str) -> bytes:
+        return await OpenAIService.render_speech(self.realtime_pool.url, self.realtime_pool.headers, text)
+
+    async def _openai_socket(self, call_sid: str):
+        """Socket adotado da sessão especulativa da chamada ou, sem ela, do pool."""
+        openai_ws = await self.speculative.adopt(call_sid)
+        if openai_ws is not None and openai_ws.open:
+            return openai_ws, True
+        return await self.realtime_pool.acquire(), False
 
     async def handle_connection(self, websocket: WebSocket):
         """Handle main WebSocket connection."""
         logger.info("Nova conexão WebSocket recebida")
-        
-        # Conectando com OpenAI exatamente como no original
-        openai_ws = await websockets.connect(
-            'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01',
-            extra_headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "OpenAI-Beta": "realtime=v1"
-            }
-        )
+        handler = WebSocketHandler()
+        session_id = self.sessions.register(handler)
 
+        openai_ws = None
         try:
-            logger.info("Iniciando sessão OpenAI...")
-            await OpenAIService.initialize_session(openai_ws)
-            logger.info("Sessão OpenAI inicializada")
-            await self.handler.handle_connection(websocket, openai_ws)
+            # O socket é escolhido no start, quando o CallSid da chamada é conhecido
+            call_sid = await handler.wait_for_start(websocket)
+            if handler.stream_sid is None:
+                return
+            greeting = self.greetings.pick()
+            if greeting:
+                await handler.play_greeting(websocket, greeting)
+            openai_ws, handler.metrics['speculative_session'] = await self._openai_socket(call_sid)
+            logger.info("Sessão OpenAI pronta")
+            if greeting:
+                # The model carries on knowing it has already greeted the caller
+                await OpenAIService.send_greeting_item(openai_ws, greeting.text)
+            await handler.handle_connection(websocket, openai_ws)
         except Exception as e:
             logger.error(f"Erro na conexão WebSocket: {e}")
-            if openai_ws.open:
+            raise
+        finally:
+            if openai_ws is not None and openai_ws.open:
                 await openai_ws.close()
-            raise
\ No newline at end of file
+            self.sessions.unregister(session_id)
\ No newline at end of file
@@ -0,0 +1,11 @@
+"""
+Os testes importam os módulos como o app faz (`from config import settings`),
+a partir da pasta `app/`. Rode o pytest a partir da pasta deste projeto.
+"""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'app'))
@@ -0,0 +1,112 @@
+"""Relay com a OpenAI em pcm16: o áudio é convertido de verdade nas duas direções, e o custo por delta."""
+import asyncio
+import base64
+import time
+
+import numpy as np
+
+from config import settings
+from services.audio_transcoder import PCM16_RATE, TWILIO_RATE, DownlinkTranscoder, UplinkTranscoder
+from services.g711 import pcm_to_ulaw, ulaw_to_pcm
+from websocket.handlers import WebSocketHandler
+
+TONE_HZ = 440
+
+def tone(rate: int, seconds: float, amplitude: float = 8000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return np.rint(amplitude * np.sin(2 * np.pi * TONE_HZ * t)).astype(np.int16)
+
+def dominant_hz(pcm: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(pcm.astype(np.float64) * np.hanning(len(pcm))))
+    return np.fft.rfftfreq(len(pcm), 1 / rate)[np.argmax(spectrum)]
+
+def rms(pcm: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(pcm.astype(np.float64) ** 2)))
+
+class FakeTwilioSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+def media_payloads(messages: list) -> bytes:
+    prefix = '"payload":"'
+    return b''.join(
+        base64.b64decode(message[message.index(prefix) + len(prefix):].split('"', 1)[0])
+        for message in messages
+    )
+
+def test_uplink_converts_ulaw_frames_to_pcm16_24k():
+    ulaw = pcm_to_ulaw(tone(TWILIO_RATE, 1.0)).tobytes()
+    transcoder = UplinkTranscoder()
+    pcm = np.frombuffer(b''.join(
+        base64.b64decode(transcoder.convert(base64.b64encode(ulaw[offset:offset + 160]).decode()))
+        for offset in range(0, len(ulaw), 160)
+    ), dtype='<i2')
+
+    assert abs(len(pcm) - 3 * len(ulaw)) <= 3
+    steady = pcm[PCM16_RATE // 10:]
+    assert abs(dominant_hz(steady, PCM16_RATE) - TONE_HZ) < 5
+    assert abs(rms(steady) - rms(ulaw_to_pcm(ulaw))) / rms(ulaw_to_pcm(ulaw)) < 0.05
+
+def test_handler_transcodes_pcm16_deltas_for_twilio(monkeypatch):
+    monkeypatch.setattr(settings, 'OUTPUT_AUDIO_FORMAT', 'pcm16')
+    handler = WebSocketHandler()
+    handler.handle_start_event({'start': {'streamSid': 'MZ1'}})
+    assert handler.metrics['audio_path'] == 'transcode'
+
+    source = tone(PCM16_RATE, 1.0)
+    raw = source.astype('<i2').tobytes()
+    # Deltas de tamanho ímpar: o byte que sobra vai para o delta seguinte
+    cuts = [0, 1, 4801, 9601, 20001, len(raw) - 1, len(raw)]
+    socket = FakeTwilioSocket()
+
+    async def relay():
+        for start, end in zip(cuts, cuts[1:]):
+            await handler.send_audio_delta(socket, base64.b64encode(raw[start:end]).decode())
+
+    asyncio.run(relay())
+    assert all('"event":"media"' in message and '"streamSid":"MZ1"' in message for message in socket.sent)
+    ulaw = media_payloads(socket.sent)
+    assert abs(len(ulaw) - len(source) // 3) <= 2
+
+    pcm = ulaw_to_pcm(ulaw)
+    steady = pcm[TWILIO_RATE // 10:]
+    assert abs(dominant_hz(steady, TWILIO_RATE) - TONE_HZ) < 5
+    assert abs(rms(steady) - rms(source)) / rms(source) < 0.05
+
+def test_passthrough_splices_deltas_unchanged():
+    handler = WebSocketHandler()
+    handler.handle_start_event({'start': {'streamSid': 'MZ1'}})
+    assert handler.metrics['audio_path'] == 'passthrough'
+    delta = base64.b64encode(bytes(range(256)) * 10).decode()
+    socket = FakeTwilioSocket()
+    asyncio.run(handler.send_audio_delta(socket, delta))
+    assert socket.sent == ['{"event":"media","streamSid":"MZ1","media":{"payload":"%s"}}' % delta]
+
+def test_relay_throughput(monkeypatch):
+    """Deltas de 300 ms por segundo em um núcleo, passthrough e pcm16 (rode com -s para ver)."""
+    ulaw_delta = base64.b64encode(pcm_to_ulaw(tone(TWILIO_RATE, 0.3)).tobytes()).decode()
+    pcm_delta = base64.b64encode(tone(PCM16_RATE, 0.3).astype('<i2').tobytes()).decode()
+    rates = {}
+    for audio_format, delta in (('g711_ulaw', ulaw_delta), ('pcm16', pcm_delta)):
+        monkeypatch.setattr(settings, 'OUTPUT_AUDIO_FORMAT', audio_format)
+        handler = WebSocketHandler()
+        handler.handle_start_event({'start': {'streamSid': 'MZ1'}})
+        socket = FakeTwilioSocket()
+        deltas = 2000
+
+        async def relay():
+            for _ in range(deltas):
+                await handler.send_audio_delta(socket, delta)
+                socket.sent.clear()
+
+        started = time.process_time()
+        asyncio.run(relay())
+        rates[audio_format] = deltas / max(time.process_time() - started, 1e-9)
+
+    print(f"\nrelay: passthrough {rates['g711_ulaw']:,.0f} deltas/s, pcm16 {rates['pcm16']:,.0f} deltas/s")
+    # pcm16 tem de acompanhar com folga dezenas de chamadas em tempo real (~3,3 deltas/s cada)
+    assert rates['pcm16'] > 1000
+    assert rates['g711_ulaw'] > rates['pcm16']
@@ -0,0 +1,164 @@
+"""
+Saudações pré-renderizadas: frames de 20 ms, conferência da transcrição e tempo do start até o primeiro áudio.
+
+Um servidor local faz o papel da Realtime API: segura o handshake por
+HANDSHAKE_S e começa a responder FIRST_AUDIO_S depois do `response.create`,
+com áudio e transcrição do que "falou".
+"""
+import asyncio
+import base64
+import json
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+import websockets
+
+from services.greetings import GREETING_MARK, GreetingLibrary, spoken_as_written
+from services.openai_service import OpenAIService
+from services.packetizer import FRAME_BYTES
+from services.realtime_pool import READY_EVENT, RealtimePool
+from websocket.handlers import WebSocketHandler
+
+HANDSHAKE_S = 0.3
+FIRST_AUDIO_S = 0.4
+GREETING = 'Olá! Aqui é o assistente virtual. Como posso te ajudar?'
+READ_ALOUD = 'sem acrescentar nada: '
+STREAM_SID = 'MZ18ad3ab5a668481ce02b83e7395059f0'
+
+def stand_in_openai(say=lambda text: text):
+    """Servidor que fala `say(texto pedido)`: 10 ms de μ-law por caractere, em deltas de 100 ms."""
+    async def handle(ws):
+        await ws.send(json.dumps({"type": "session.created"}))
+        async for message in ws:
+            event = json.loads(message)
+            if event['type'] == 'session.update':
+                await ws.send(json.dumps({"type": READY_EVENT}))
+            elif event['type'] == 'response.create':
+                instructions = event.get('response', {}).get('instructions', '')
+                spoken = say(instructions.split(READ_ALOUD, 1)[1]) if READ_ALOUD in instructions else 'Oi, tudo bem?'
+                await asyncio.sleep(FIRST_AUDIO_S)
+                audio = b'\x7f' * (80 * len(spoken))
+                for offset in range(0, len(audio), 800):
+                    await ws.send(json.dumps({"type": "response.audio.delta",
+                                              "delta": base64.b64encode(audio[offset:offset + 800]).decode()}))
+                for word in spoken.split(' '):
+                    await ws.send(json.dumps({"type": "response.audio_transcript.delta", "delta": word + ' '}))
+                await ws.send(json.dumps({"type": "response.done"}))
+    return handle
+
+async def slow_handshake(path, headers):
+    await asyncio.sleep(HANDSHAKE_S)
+
+@asynccontextmanager
+async def stand_in_server(say=lambda text: text):
+    async with websockets.serve(stand_in_openai(say), "127.0.0.1", 0, process_request=slow_handshake) as server:
+        yield f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+class TwilioSocket:
+    def __init__(self):
+        self.first_media_at = None
+        self.events = []
+
+    async def send_text(self, message: str):
+        event = json.loads(message)
+        self.events.append(event)
+        if event['event'] == 'media' and self.first_media_at is None:
+            self.first_media_at = time.monotonic()
+
+    async def send_json(self, message: dict):
+        self.events.append(message)
+
+def test_transcript_comparison_ignores_case_accents_and_punctuation():
+    assert spoken_as_written(GREETING, 'ola aqui e o assistente virtual, como posso te ajudar')
+    assert not spoken_as_written(GREETING, 'Olá! Aqui é o seu assistente virtual. Como posso te ajudar?')
+    assert not spoken_as_written(GREETING, 'Olá! Aqui é o assistente virtual.')
+
+def test_greeting_is_cut_into_padded_20_ms_frames():
+    greeting = GreetingLibrary._greeting(GREETING, b'\x7f' * 1000)
+    frames = [base64.b64decode(payload) for payload in greeting.payloads]
+    assert [len(frame) for frame in frames] == [FRAME_BYTES] * 7
+    assert frames[-1] == b'\x7f' * 40 + b'\xff' * 120
+    assert greeting.duration_ms == 140
+
+def test_render_speech_returns_the_audio_when_the_transcript_matches():
+    async def scenario():
+        async with stand_in_server() as url:
+            return await OpenAIService.render_speech(url, {}, GREETING)
+
+    assert asyncio.run(scenario()) == b'\x7f' * (80 * len(GREETING))
+
+def test_a_paraphrased_rendering_is_rejected_and_rendered_again():
+    attempts = []
+
+    def paraphrase_twice(text):
+        attempts.append(text)
+        return text.replace('Como posso', 'Em que posso') if len(attempts) <= 2 else text
+
+    async def scenario():
+        async with stand_in_server(paraphrase_twice) as url:
+            with pytest.raises(ValueError):
+                await OpenAIService.render_speech(url, {}, GREETING)
+            library = GreetingLibrary([GREETING], lambda text: OpenAIService.render_speech(url, {}, text))
+            library.start()
+            await asyncio.wait_for(library._task, 10)
+            return library
+
+    library = asyncio.run(scenario())
+    # A segunda renderização também parafraseou: a biblioteca tentou de novo
+    assert library.ready and library.stats == {'rendered': 1, 'failed': 1, 'played': 0, 'unavailable': 0}
+    assert len(attempts) == 3
+
+async def llm_greeting_ms(pool: RealtimePool) -> float:
+    """O que havia antes: socket da chamada, turno do LLM e o primeiro delta de áudio."""
+    started = time.monotonic()
+    openai_ws = await pool.acquire()
+    try:
+        await OpenAIService.send_initial_conversation_item(openai_ws)
+        async for message in openai_ws:
+            if json.loads(message)['type'] == 'response.audio.delta':
+                return (time.monotonic() - started) * 1000
+    finally:
+        await openai_ws.close()
+
+async def prerendered_greeting_ms(library: GreetingLibrary) -> float:
+    twilio = TwilioSocket()
+    handler = WebSocketHandler()
+    handler.handle_start_event({'start': {'streamSid': STREAM_SID}})
+    await handler.play_greeting(twilio, library.pick())
+    assert twilio.events[-1]['mark']['name'] == GREETING_MARK
+    return (twilio.first_media_at - handler.stream_started_at) * 1000
+
+def test_start_to_first_audio():
+    """Do evento start ao primeiro frame do agente no Twilio, 4 chamadas por caso (rode com -s para ver)."""
+    calls = 4
+
+    async def scenario():
+        async with stand_in_server() as url:
+            results = {}
+            for label, max_size in (('LLM, socket frio', 0), ('LLM, socket do pool', 4)):
+                pool = RealtimePool(url, {}, OpenAIService.initialize_session, min_size=1, max_size=max_size)
+                pool.start()
+                try:
+                    await asyncio.sleep(HANDSHAKE_S + 0.2)
+                    timings = []
+                    for _ in range(calls):
+                        timings.append(await llm_greeting_ms(pool))
+                        await asyncio.sleep(HANDSHAKE_S + 0.2)
+                    results[label] = timings
+                finally:
+                    await pool.stop()
+
+            library = GreetingLibrary([GREETING], lambda text: OpenAIService.render_speech(url, {}, text))
+            library.start()
+            await asyncio.wait_for(library._task, 10)
+            results['pré-renderizada'] = [await prerendered_greeting_ms(library) for _ in range(calls)]
+            return results
+
+    results = asyncio.run(scenario())
+    print()
+    for label, timings in results.items():
+        timings = sorted(timings)
+        print(f"{label:>20}: p50 {timings[len(timings) // 2]:6.1f} ms, máx {timings[-1]:6.1f} ms")
+    assert min(results['LLM, socket frio']) >= (HANDSHAKE_S + FIRST_AUDIO_S) * 1000
+    assert max(results['pré-renderizada']) < 50
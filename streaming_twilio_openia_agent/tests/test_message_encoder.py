@@ -0,0 +1,93 @@
+"""Mensagens pré-serializadas: mesmo JSON de antes, custo por mensagem e CPU por frame de ponta a ponta."""
+import asyncio
+import base64
+import json
+import time
+
+from services import message_encoder
+from websocket.handlers import WebSocketHandler
+
+STREAM_SID = 'MZ18ad3ab5a668481ce02b83e7395059f0'
+PAYLOAD = base64.b64encode(bytes(range(160))).decode()
+
+def send_json(message: dict) -> str:
+    """Como o `send_json` do Starlette serializava cada mensagem antes."""
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+def legacy_media(stream_sid: str, payload: str) -> str:
+    return send_json({"event": "media", "streamSid": stream_sid, "media": {"payload": payload}})
+
+def legacy_mark(stream_sid: str, name: str) -> str:
+    return send_json({"event": "mark", "streamSid": stream_sid, "mark": {"name": name}})
+
+def legacy_append(payload: str) -> str:
+    return json.dumps({"type": "input_audio_buffer.append", "audio": payload})
+
+def legacy_truncate(item_id: str, audio_end_ms: int) -> str:
+    return json.dumps({"type": "conversation.item.truncate", "item_id": item_id,
+                       "content_index": 0, "audio_end_ms": audio_end_ms})
+
+def test_messages_parse_to_the_same_json():
+    encoder = message_encoder.twilio_encoder(STREAM_SID)
+    assert json.loads(encoder.media(PAYLOAD)) == json.loads(legacy_media(STREAM_SID, PAYLOAD))
+    assert json.loads(encoder.mark('responsePart')) == json.loads(legacy_mark(STREAM_SID, 'responsePart'))
+    assert json.loads(encoder.clear) == {"event": "clear", "streamSid": STREAM_SID}
+    assert json.loads(message_encoder.audio_append(PAYLOAD)) == json.loads(legacy_append(PAYLOAD))
+    assert json.loads(message_encoder.truncate('item_"1"', 1234)) == json.loads(legacy_truncate('item_"1"', 1234))
+    assert json.loads(message_encoder.dumps({"a": "ç", "b": [1, 2]})) == {"a": "ç", "b": [1, 2]}
+
+def best_us(func, repeat: int = 20000) -> float:
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / repeat * 1e6
+
+def test_serialization_micro_benchmark():
+    """µs por mensagem, antes e agora (rode com -s para ver)."""
+    encoder = message_encoder.twilio_encoder(STREAM_SID)
+    cases = {
+        'media': (lambda: legacy_media(STREAM_SID, PAYLOAD), lambda: encoder.media(PAYLOAD)),
+        'mark': (lambda: legacy_mark(STREAM_SID, 'responsePart'), lambda: encoder.mark('responsePart')),
+        'append': (lambda: legacy_append(PAYLOAD), lambda: message_encoder.audio_append(PAYLOAD)),
+        'truncate': (lambda: legacy_truncate('item_1', 1234), lambda: message_encoder.truncate('item_1', 1234)),
+    }
+    print()
+    for name, (legacy, encoded) in cases.items():
+        legacy_us, encoded_us = best_us(legacy), best_us(encoded)
+        print(f"{name:>8}: {legacy_us:5.2f} µs -> {encoded_us:5.2f} µs")
+        assert encoded_us < legacy_us
+
+class NullSocket:
+    async def send_text(self, message: str):
+        pass
+
+    async def send(self, message: str):
+        pass
+
+def test_per_frame_cpu_end_to_end():
+    """Um append de entrada e uma mídia de saída por frame de 20 ms, passando pelo handler."""
+    handler = WebSocketHandler()
+    handler.handle_start_event({'start': {'streamSid': STREAM_SID}})
+    socket = NullSocket()
+    frames = 20000
+
+    async def legacy():
+        for _ in range(frames):
+            await socket.send(legacy_append(PAYLOAD))
+            await socket.send_text(legacy_media(STREAM_SID, base64.b64encode(base64.b64decode(PAYLOAD)).decode('utf-8')))
+
+    async def encoded():
+        for _ in range(frames):
+            await socket.send(message_encoder.audio_append(PAYLOAD))
+            await handler.send_audio_delta(socket, PAYLOAD)
+
+    results = {}
+    for name, run in (('antes', legacy), ('agora', encoded)):
+        started = time.process_time()
+        asyncio.run(run())
+        results[name] = (time.process_time() - started) / frames * 1e6
+    print(f"\nCPU por frame: antes {results['antes']:.2f} µs, agora {results['agora']:.2f} µs")
+    assert results['agora'] < results['antes']
@@ -0,0 +1,124 @@
+"""
+Pool Realtime: sockets entregues já configurados, reposição dos vencidos e tempo até a primeira resposta.
+
+Um servidor local faz o papel da OpenAI: segura o handshake por HANDSHAKE_S
+(TLS e upgrade), confirma o `session.update` depois de SESSION_S e manda o
+primeiro delta de áudio FIRST_DELTA_S depois do `response.create`.
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import websockets
+
+from services import message_encoder
+from services.openai_service import OpenAIService
+from services.realtime_pool import READY_EVENT, RealtimePool
+
+HANDSHAKE_S = 0.3
+SESSION_S = 0.15
+FIRST_DELTA_S = 0.05
+
+async def stand_in_openai(ws):
+    await ws.send(json.dumps({"type": "session.created"}))
+    async for message in ws:
+        event_type = json.loads(message)['type']
+        if event_type == 'session.update':
+            await asyncio.sleep(SESSION_S)
+            await ws.send(json.dumps({"type": READY_EVENT}))
+        elif event_type == 'response.create':
+            await asyncio.sleep(FIRST_DELTA_S)
+            await ws.send(json.dumps({"type": "response.audio.delta", "delta": "AAAA"}))
+
+async def slow_handshake(path, headers):
+    await asyncio.sleep(HANDSHAKE_S)
+
+@asynccontextmanager
+async def stand_in_server():
+    async with websockets.serve(stand_in_openai, "127.0.0.1", 0, process_request=slow_handshake) as server:
+        yield f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+def new_pool(url: str, **kwargs) -> RealtimePool:
+    return RealtimePool(url, {}, OpenAIService.initialize_session, **kwargs)
+
+async def first_response_ms(pool: RealtimePool) -> float:
+    """Da chegada da chamada ao primeiro delta de áudio da resposta."""
+    started = time.monotonic()
+    openai_ws = await pool.acquire()
+    try:
+        await openai_ws.send(message_encoder.RESPONSE_CREATE)
+        async for message in openai_ws:
+            if json.loads(message)['type'] == 'response.audio.delta':
+                return (time.monotonic() - started) * 1000
+    finally:
+        await openai_ws.close()
+
+def test_pooled_socket_is_ready_and_replaced():
+    async def scenario():
+        async with stand_in_server() as url:
+            pool = new_pool(url, min_size=1, max_size=4)
+            pool.start()
+            try:
+                await asyncio.sleep(HANDSHAKE_S + SESSION_S + 0.3)
+                assert pool.snapshot()['ready'] == 1
+                openai_ws = await pool.acquire()
+                assert openai_ws.open
+                await openai_ws.close()
+                # A reposição começa logo depois da entrega
+                await asyncio.sleep(HANDSHAKE_S + SESSION_S + 0.3)
+                return pool.snapshot()
+            finally:
+                await pool.stop()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot['hits'] == 1 and snapshot['misses'] == 0
+    assert snapshot['ready'] >= 1
+
+def test_idle_sockets_are_evicted_after_their_replacement_is_ready():
+    async def scenario():
+        async with stand_in_server() as url:
+            pool = new_pool(url, min_size=1, max_size=2, idle_timeout_s=0.6)
+            pool.start()
+            try:
+                ready_counts = []
+                for _ in range(20):
+                    await asyncio.sleep(0.1)
+                    ready_counts.append(pool.snapshot()['ready'])
+                return ready_counts, pool.snapshot()
+            finally:
+                await pool.stop()
+
+    ready_counts, snapshot = asyncio.run(scenario())
+    assert snapshot['evicted'] >= 1
+    # Depois do primeiro socket ficar pronto, o pool nunca fica vazio durante a troca
+    assert 0 not in ready_counts[ready_counts.index(1):]
+
+def test_time_to_first_response_cold_vs_pool():
+    """TTFR com o pool desligado (conecta na hora) e ligado, em ritmo lento e numa rajada (rode com -s para ver)."""
+    async def run(max_size: int, gap_s: float, calls: int) -> tuple:
+        async with stand_in_server() as url:
+            pool = new_pool(url, min_size=1, max_size=max_size)
+            pool.start()
+            try:
+                await asyncio.sleep(1.0)
+                tasks = []
+                for _ in range(calls):
+                    tasks.append(asyncio.create_task(first_response_ms(pool)))
+                    await asyncio.sleep(gap_s)
+                timings = sorted(await asyncio.gather(*tasks))
+                return timings[len(timings) // 2], pool.snapshot()
+            finally:
+                await pool.stop()
+
+    print()
+    results = {}
+    for label, gap_s, calls in (('1 chamada a cada 1 s', 1.0, 4), ('rajada de 4 chamadas/s', 0.25, 8)):
+        cold_p50, _ = asyncio.run(run(0, gap_s, calls))
+        pooled_p50, snapshot = asyncio.run(run(8, gap_s, calls))
+        results[label] = (cold_p50, pooled_p50)
+        print(f"{label}: sem pool p50 {cold_p50:.0f} ms, com pool p50 {pooled_p50:.0f} ms "
+              f"({snapshot['hits']}/{calls} do pool)")
+    for cold_p50, pooled_p50 in results.values():
+        assert cold_p50 >= (HANDSHAKE_S + FIRST_DELTA_S) * 1000
+        assert pooled_p50 < cold_p50 / 2
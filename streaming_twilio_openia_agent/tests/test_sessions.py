@@ -0,0 +1,123 @@
+"""
+Carga: centenas de chamadas simultâneas em um só worker.
+
+Cada chamada tem um Twilio e uma OpenAI falsos: a OpenAI devolve como
+`response.audio.delta` cada frame que recebe, e o teste confere que todo
+áudio que volta para um Twilio é da própria chamada, na ordem, e que o
+registro de sessões conta as chamadas ao vivo e fica vazio no fim.
+"""
+import asyncio
+import base64
+import json
+import struct
+import time
+
+from fastapi.websockets import WebSocketDisconnect
+from websocket.manager import WebSocketManager
+
+CALLS = 300
+FRAMES = 25
+FRAME_MS = 20
+
+def frame_payload(call: int, index: int) -> str:
+    """Frame μ-law de 20 ms que diz de qual chamada (e qual frame) ele é."""
+    return base64.b64encode(struct.pack('>HH', call, index) + bytes(156)).decode()
+
+def frame_origin(payload: str) -> tuple:
+    return struct.unpack('>HH', base64.b64decode(payload)[:4])
+
+class FakeTwilioSocket:
+    """Twilio de uma chamada: start, frames a cada 20 ms e desconexão depois do eco completo."""
+
+    def __init__(self, call: int):
+        self.call = call
+        self.stream_sid = f'MZ{call:032d}'
+        self.sent = []
+        self.media_received = 0
+        self.echoed = asyncio.Event()
+
+    async def iter_text(self):
+        yield json.dumps({
+            'event': 'start',
+            'start': {'streamSid': self.stream_sid, 'callSid': f'CA{self.call:032d}'},
+        })
+        for index in range(FRAMES):
+            await asyncio.sleep(FRAME_MS / 1000)
+            yield json.dumps({
+                'event': 'media',
+                'streamSid': self.stream_sid,
+                'media': {'timestamp': str(index * FRAME_MS), 'payload': frame_payload(self.call, index)},
+            }, separators=(',', ':'))
+        await asyncio.wait_for(self.echoed.wait(), 30)
+        raise WebSocketDisconnect()
+
+    async def send_text(self, message: str):
+        event = json.loads(message)
+        self.sent.append(event)
+        if event['event'] == 'media':
+            self.media_received += 1
+            if self.media_received == FRAMES:
+                self.echoed.set()
+
+class FakeRealtimeSocket:
+    """OpenAI Realtime que devolve cada frame recebido como áudio da resposta."""
+
+    def __init__(self):
+        self.open = True
+        self._events = asyncio.Queue()
+
+    async def send(self, message: str):
+        event = json.loads(message)
+        if event['type'] == 'input_audio_buffer.append':
+            self._events.put_nowait(json.dumps({
+                'type': 'response.audio.delta', 'item_id': 'item', 'delta': event['audio'],
+            }))
+
+    async def close(self):
+        self.open = False
+        self._events.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        message = await self._events.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+def test_concurrent_calls_do_not_cross_audio():
+    async def scenario():
+        manager = WebSocketManager()
+
+        async def acquire():
+            return FakeRealtimeSocket()
+        manager.realtime_pool.acquire = acquire
+
+        sockets = [FakeTwilioSocket(call) for call in range(CALLS)]
+        peak = 0
+
+        async def watch_registry():
+            nonlocal peak
+            while True:
+                peak = max(peak, len(manager.sessions))
+                await asyncio.sleep(FRAME_MS / 1000)
+
+        watcher = asyncio.create_task(watch_registry())
+        started = time.monotonic()
+        await asyncio.gather(*(manager.handle_connection(socket) for socket in sockets))
+        elapsed = time.monotonic() - started
+        watcher.cancel()
+        return manager, sockets, peak, elapsed
+
+    manager, sockets, peak, elapsed = asyncio.run(scenario())
+    print(f"\n{CALLS} chamadas x {FRAMES} frames em {elapsed:.2f}s (áudio de cada uma: {FRAMES * FRAME_MS / 1000:.2f}s)")
+
+    assert peak == CALLS
+    assert len(manager.sessions) == 0
+    for socket in sockets:
+        media = [event for event in socket.sent if event['event'] == 'media']
+        assert [frame_origin(event['media']['payload']) for event in media] == [
+            (socket.call, index) for index in range(FRAMES)
+        ]
+        assert {event['streamSid'] for event in socket.sent} == {socket.stream_sid}
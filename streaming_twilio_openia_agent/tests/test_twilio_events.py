@@ -0,0 +1,93 @@
+"""Leitura dos eventos do Twilio: mesmo resultado do json.loads e frames por segundo por núcleo."""
+import base64
+import json
+import time
+
+from services.twilio_events import MEDIA, MediaFrame, parse_event
+
+STREAM_SID = 'MZ18ad3ab5a668481ce02b83e7395059f0'
+
+def recorded_stream(frames: int = 3000) -> list:
+    """Um stream como o Twilio grava: connected, start, mídia a cada 20 ms e marcas de vez em quando."""
+    messages = [
+        json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}),
+        json.dumps({"event": "start", "sequenceNumber": "1", "start": {
+            "accountSid": "AC0", "streamSid": STREAM_SID, "callSid": "CA0", "tracks": ["inbound"],
+            "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+        }, "streamSid": STREAM_SID}),
+    ]
+    for index in range(frames):
+        payload = base64.b64encode(bytes((index + offset) % 256 for offset in range(160))).decode()
+        messages.append(json.dumps({
+            "event": "media", "sequenceNumber": str(index + 2),
+            "media": {"track": "inbound", "chunk": str(index + 1), "timestamp": str(index * 20), "payload": payload},
+            "streamSid": STREAM_SID,
+        }, separators=(',', ':')))
+        if index % 100 == 99:
+            messages.append(json.dumps({"event": "mark", "sequenceNumber": str(index + 2),
+                                        "streamSid": STREAM_SID, "mark": {"name": "responsePart"}}))
+    return messages
+
+def test_matches_json_loads_for_every_message():
+    for message in recorded_stream(500):
+        event, data = parse_event(message)
+        expected = json.loads(message)
+        assert event == expected['event']
+        if event == MEDIA:
+            assert data == MediaFrame(expected['media']['payload'], int(expected['media']['timestamp']))
+        else:
+            assert data == expected
+
+def test_unexpected_shapes_fall_back_to_json_loads():
+    reordered = '{"event":"media","media":{"payload":"AAAA","timestamp":"40"},"streamSid":"MZ1"}'
+    assert parse_event(reordered) == (MEDIA, MediaFrame('AAAA', 40))
+    escaped = '{"event":"media","media":{"timestamp":"60","payload":"AA\\/A"}}'
+    assert parse_event(escaped) == (MEDIA, MediaFrame('AA/A', 60))
+    spaced = '{"event": "media", "media": {"timestamp": "80", "payload": "BBBB"}}'
+    assert parse_event(spaced) == (MEDIA, MediaFrame('BBBB', 80))
+    assert parse_event('[1, 2]') == (None, [1, 2])
+
+def legacy_loop(messages: list) -> int:
+    """O loop anterior: json.loads em tudo e uma cadeia de if/elif por mensagem."""
+    frames = 0
+    for message in messages:
+        data = json.loads(message)
+        if data['event'] == 'media':
+            payload, timestamp = data['media']['payload'], int(data['media']['timestamp'])
+            frames += 1
+        elif data['event'] == 'start':
+            data['start']['streamSid']
+        elif data['event'] == 'mark':
+            data.get('mark')
+        elif data['event'] == 'stop':
+            break
+    return frames
+
+def dispatch_loop(messages: list) -> int:
+    """O loop atual: mídia tratada inline, o resto por tabela."""
+    handlers = {'start': lambda data: data['start']['streamSid'], 'mark': lambda data: data.get('mark')}
+    frames = 0
+    for message in messages:
+        event_type, data = parse_event(message)
+        if event_type == MEDIA:
+            payload, timestamp = data
+            frames += 1
+            continue
+        handler = handlers.get(event_type)
+        if handler:
+            handler(data)
+    return frames
+
+def test_frames_per_second_per_core():
+    """Frames de mídia por segundo em um núcleo, antes e agora (rode com -s para ver)."""
+    messages = recorded_stream()
+    rates = {}
+    for name, loop in (('json.loads', legacy_loop), ('parse_event', dispatch_loop)):
+        best = float('inf')
+        for _ in range(5):
+            started = time.process_time()
+            frames = loop(messages)
+            best = min(best, time.process_time() - started)
+        rates[name] = frames / best
+    print(f"\n{rates['json.loads']:,.0f} frames/s com json.loads, {rates['parse_event']:,.0f} com parse_event")
+    assert rates['parse_event'] > rates['json.loads']
@@ -0,0 +1,161 @@
+"""Fila do Twilio para a OpenAI: políticas de descarte, corte por idade e upstream lento."""
+import asyncio
+import base64
+import json
+import struct
+import time
+
+import pytest
+
+from services.uplink_queue import BLOCK, DROP_OLDEST, DROP_SILENCE, UplinkFrameQueue, is_silent
+from websocket.handlers import WebSocketHandler
+
+SILENT = base64.b64encode(b'\xff' * 160).decode()
+
+def loud(index: int) -> str:
+    """Frame audível que carrega o próprio número."""
+    return base64.b64encode(struct.pack('>H', index) + b'\x00' * 158).decode()
+
+def loud_index(payload: str) -> int:
+    return struct.unpack('>H', base64.b64decode(payload)[:2])[0]
+
+async def drain(queue: UplinkFrameQueue) -> list:
+    queue.close()
+    payloads = []
+    while (frame := await queue.get()) is not None:
+        payloads.append(frame[0])
+    return payloads
+
+def test_is_silent():
+    assert is_silent(SILENT)
+    assert not is_silent(loud(1))
+    assert not is_silent('não é base64!')
+
+def test_drop_oldest_keeps_the_newest_frames():
+    async def scenario():
+        queue = UplinkFrameQueue(3, DROP_OLDEST, 0)
+        for index in range(5):
+            await queue.put(loud(index), index * 20)
+        return queue, await drain(queue)
+
+    queue, payloads = asyncio.run(scenario())
+    assert [loud_index(payload) for payload in payloads] == [2, 3, 4]
+    assert queue.stats['dropped_oldest'] == 2
+    assert queue.stats['max_depth'] == 3
+
+def test_drop_silence_drops_silent_frames_first():
+    async def scenario():
+        queue = UplinkFrameQueue(3, DROP_SILENCE, 0)
+        await queue.put(loud(0), 0)
+        await queue.put(SILENT, 20)
+        await queue.put(loud(2), 40)
+        await queue.put(loud(3), 60)  # cheia: sai o silêncio
+        await queue.put(loud(4), 80)  # cheia e sem silêncio: sai o mais antigo
+        return queue, await drain(queue)
+
+    queue, payloads = asyncio.run(scenario())
+    assert [loud_index(payload) for payload in payloads] == [2, 3, 4]
+    assert queue.stats['dropped_silence'] == 1
+    assert queue.stats['dropped_oldest'] == 1
+
+def test_block_waits_for_room():
+    async def scenario():
+        queue = UplinkFrameQueue(1, BLOCK, 0)
+        await queue.put(loud(0), 0)
+        blocked = asyncio.create_task(queue.put(loud(1), 20))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert loud_index((await queue.get())[0]) == 0
+        await asyncio.wait_for(blocked, 1)
+        return await drain(queue)
+
+    assert [loud_index(payload) for payload in asyncio.run(scenario())] == [1]
+
+def test_stale_frames_are_discarded():
+    async def scenario():
+        queue = UplinkFrameQueue(10, DROP_OLDEST, 50)
+        await queue.put(loud(0), 0)
+        await asyncio.sleep(0.08)
+        # Chega na hora: serve de referência e sai; o primeiro ficou velho na fila
+        await queue.put(loud(1), 80)
+        return queue, await drain(queue)
+
+    queue, payloads = asyncio.run(scenario())
+    assert [loud_index(payload) for payload in payloads] == [1]
+    assert queue.stats['dropped_stale'] == 1
+
+def test_closed_queue_ignores_new_frames():
+    async def scenario():
+        queue = UplinkFrameQueue(3, DROP_OLDEST, 0)
+        queue.close()
+        await queue.put(loud(0), 0)
+        return await queue.get()
+
+    assert asyncio.run(scenario()) is None
+
+FRAMES = 100
+FRAME_MS = 20
+SEND_MS = 40  # upstream duas vezes mais lento que o tempo real
+MAX_AGE_MS = 300
+
+class PacedTwilioSocket:
+    """Twilio que manda um frame audível a cada 20 ms e anota quando mandou cada um."""
+
+    def __init__(self):
+        self.arrivals = {}
+
+    async def iter_text(self):
+        started = time.monotonic()
+        for index in range(FRAMES):
+            # Hora em que o Twilio mandou o frame, lido ou não
+            self.arrivals[index] = started + index * FRAME_MS / 1000
+            await asyncio.sleep(max(0, self.arrivals[index] - time.monotonic()))
+            yield json.dumps({
+                'event': 'media',
+                'media': {'timestamp': str(index * FRAME_MS), 'payload': loud(index)},
+            }, separators=(',', ':'))
+
+class SlowUpstream:
+    """OpenAI lenta: cada envio leva SEND_MS; anota quando cada frame foi entregue."""
+
+    def __init__(self):
+        self.open = True
+        self.delivered = {}
+
+    async def send(self, message: str):
+        await asyncio.sleep(SEND_MS / 1000)
+        self.delivered[loud_index(json.loads(message)['audio'])] = time.monotonic()
+
+    async def close(self):
+        self.open = False
+
+def latencies_ms(twilio: PacedTwilioSocket, upstream: SlowUpstream) -> list:
+    return [(delivered - twilio.arrivals[index]) * 1000 for index, delivered in upstream.delivered.items()]
+
+def test_slow_upstream_latency_stays_bounded():
+    async def queued():
+        handler = WebSocketHandler()
+        handler.uplink = UplinkFrameQueue(10, DROP_SILENCE, MAX_AGE_MS)
+        twilio, upstream = PacedTwilioSocket(), SlowUpstream()
+        await asyncio.gather(handler.receive_from_twilio(twilio, upstream), handler.forward_to_openai(upstream))
+        return twilio, upstream, handler.uplink.stats
+
+    async def inline():
+        # Como era antes da fila: a leitura espera cada envio
+        twilio, upstream = PacedTwilioSocket(), SlowUpstream()
+        async for message in twilio.iter_text():
+            await upstream.send(json.dumps({'audio': json.loads(message)['media']['payload']}))
+        return twilio, upstream
+
+    twilio, upstream, stats = asyncio.run(queued())
+    worst = max(latencies_ms(twilio, upstream))
+    inline_worst = max(latencies_ms(*asyncio.run(inline())))
+    print(f"\natraso máximo até o upstream: {worst:.0f} ms com a fila, {inline_worst:.0f} ms sem ela; "
+          f"{len(upstream.delivered)}/{FRAMES} frames entregues, stats {stats}")
+
+    # Um frame entregue nunca é mais velho que o corte, mais o envio dele
+    assert worst < MAX_AGE_MS + SEND_MS + 50
+    assert inline_worst > 2 * MAX_AGE_MS
+    # O upstream acompanha o presente: o último frame entregue é de no máximo MAX_AGE_MS atrás
+    assert max(upstream.delivered) >= FRAMES - 1 - MAX_AGE_MS // FRAME_MS
+    assert stats['dropped_oldest'] + stats['dropped_stale'] > 0
@@ -17,6 +17,16 @@ AGENT_ID = os.getenv("ELEVENLABS_AGENT_ID")
 if not AGENT_ID:
     raise ValueError("ELEVENLABS_AGENT_ID não configurado no .env")
 
+# Cliente da conversa com o agente: "async" roda no loop do servidor (sem
+# threads por chamada); "sdk" usa o Conversation do SDK, com threads próprias
+CONVAI_CLIENT = os.getenv("ELEVENLABS_CONVAI_CLIENT", "async").lower()
+
+# Sessão especulativa: a conversa com o agente começa no webhook /incoming-call,
+# antes do Twilio abrir o /media-stream (só com o cliente "async")
+SPECULATIVE_SETUP = os.getenv("SPECULATIVE_SETUP", "true").lower() == "true"
+SPECULATIVE_TTL_S = float(os.getenv("SPECULATIVE_TTL_S", 15))
+SPECULATIVE_MAX_PENDING = int(os.getenv("SPECULATIVE_MAX_PENDING", 50))
+
 # Twilio Configuration
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -35,12 +45,25 @@ NGROK_URL = os.getenv("NGROK_URL")
 # Configurações de áudio
 AUDIO_CONFIG = {
     'chunk_duration': 20,  # ms por chunk
+    # Frames de 20 ms por mensagem de mídia enviada ao Twilio (1 = um frame por mensagem)
+    'frames_per_message': int(os.getenv('TWILIO_FRAMES_PER_MESSAGE', 1)),
     'max_buffer_size': 16384,  # 16KB
     'sample_rate': 8000,  # 8kHz
     'channels': 1,  # mono
     'sample_width': 2,  # 16-bit
-    'speech_threshold': -30,  # threshold para detecção de voz
-    'speech_timeout': 0.5,  # timeout para detecção de fim de fala
+    'speech_threshold': -35,  # limiar de energia (dBFS) para detecção de voz
+    'speech_timeout': 0.5,  # silêncio (s) até considerar o fim da fala
+    # Formatos de áudio configurados no agente ElevenLabs. Com ulaw_8000 o áudio
+    # passa direto entre Twilio e ElevenLabs, sem transcodificação; o servidor
+    # confirma os formatos reais no início de cada conversa.
+    'agent_output_format': os.getenv('ELEVENLABS_AGENT_OUTPUT_FORMAT', 'pcm_16000'),
+    'agent_input_format': os.getenv('ELEVENLABS_AGENT_INPUT_FORMAT', 'pcm_16000'),
+    # Ruído de conforto somado ao áudio do agente (desligado por padrão)
+    'comfort_noise': os.getenv('COMFORT_NOISE', 'false').lower() == 'true',
+    'comfort_noise_level': float(os.getenv('COMFORT_NOISE_LEVEL', -50)),  # dBFS
+    # Pool de processos para a transcodificação PCM -> μ-law (0 = tudo na thread da chamada)
+    'transcode_workers': int(os.getenv('TRANSCODE_WORKERS', 0)),
+    'transcode_inline_calls': int(os.getenv('TRANSCODE_INLINE_CALLS', 4)),  # chamadas ativas ainda inline
 }
 
 # Configurações de WebSocket
@@ -63,6 +86,10 @@ class Settings:
     # ElevenLabs
     ELEVENLABS_API_KEY = ELEVENLABS_API_KEY
     AGENT_ID = AGENT_ID
+    CONVAI_CLIENT = CONVAI_CLIENT
+    SPECULATIVE_SETUP = SPECULATIVE_SETUP
+    SPECULATIVE_TTL_S = SPECULATIVE_TTL_S
+    SPECULATIVE_MAX_PENDING = SPECULATIVE_MAX_PENDING
     
     # Twilio
     TWILIO_ACCOUNT_SID = TWILIO_ACCOUNT_SID
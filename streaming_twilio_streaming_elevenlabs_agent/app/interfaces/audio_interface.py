@@ -1,22 +1,35 @@
 import asyncio
-import time
 from elevenlabs.conversational_ai.conversation import AudioInterface
 from fastapi import WebSocket
-from utils.audio_utils import convert_ulaw_to_pcm, convert_elevenlabs_to_ulaw
+from config import AUDIO_CONFIG
+from utils.message_encoder import twilio_encoder
+from utils.audio_formats import TELEPHONY_FORMAT, parse_audio_format, describe_audio_path
+from utils.comfort_noise import ComfortNoiseMixer, NOISE_BANK_SAMPLES
+from utils.frame_pipeline import InboundFramePipeline
+from utils.g711 import ulaw_to_pcm, pcm_to_ulaw
+from utils.packetizer import UlawPacketizer
+from utils.resampler import PolyphaseResampler
+from utils.transcoder import TranscoderPool
+from utils.vad import VoiceActivityDetector, SPEECH_STARTED, SPEECH_STOPPED
 from utils.logger import log_info, log_error
 
+# Transcodificação de saída compartilhada por todas as chamadas do processo
+transcoder_pool = TranscoderPool(
+    workers=AUDIO_CONFIG['transcode_workers'],
+    inline_calls=AUDIO_CONFIG['transcode_inline_calls']
+)
+
 class TwilioAudioInterface(AudioInterface):
-    def __init__(self, websocket: WebSocket, stream_sid: str):
+    def __init__(self, websocket: WebSocket, stream_sid: str, metrics: dict = None):
         super().__init__()
         self.websocket = websocket
         self.stream_sid = stream_sid
+        self._messages = twilio_encoder(stream_sid)
         self.audio_queue = asyncio.Queue()
         self.should_stop = False
         self.conversation = None
         self.is_speaking = False
         self.agent_is_speaking = False
-        self.last_vad_update = 0
-        self.speech_timeout = 0.5
         self.input_callback = None
         self._running = False
         self._loop = asyncio.get_event_loop()
@@ -26,13 +39,98 @@ class TwilioAudioInterface(AudioInterface):
         self._buffer_size = 0
         self._max_buffer_size = 16384  # 16KB
         self._chunk_duration = 20  # ms por chunk
+        # Fila de saída da chamada: a thread do SDK só enfileira, o envio e o ritmo ficam no loop
+        self._outbound = asyncio.Queue()
+        self._sender_task = None
+        self._packetizer = UlawPacketizer(AUDIO_CONFIG['frames_per_message'])
+        self.frames_sent = 0  # posição (em frames de 20 ms) do áudio já enviado ao Twilio
+        self._inbound = InboundFramePipeline()
+        self._vad = VoiceActivityDetector(
+            threshold_dbfs=AUDIO_CONFIG['speech_threshold'],
+            hangover_s=AUDIO_CONFIG['speech_timeout'],
+            frame_ms=self._chunk_duration
+        )
+        self.metrics = metrics if metrics is not None else {}
+        # Ruído de conforto: só existe quando habilitado, então desligado não custa nada
+        self._noise_mixer = None
+        self._noise_level = AUDIO_CONFIG['comfort_noise_level'] if AUDIO_CONFIG['comfort_noise'] else None
+        self._noise_offset = hash(stream_sid) % NOISE_BANK_SAMPLES
+        if self._noise_level is not None:
+            self._noise_mixer = ComfortNoiseMixer(level_dbfs=self._noise_level, offset=self._noise_offset)
+        # Transcodificação de saída (inline ou no pool), aberta fora do loop quando os formatos são confirmados
+        self._output_transcoder = None
+        self._output_transcoder_rate = None
+        # PCM do agente entregue no loop (cliente asyncio): transcodificado em ordem por uma task
+        self._encode_queue = asyncio.Queue()
+        self._encoder_task = None
+        self._resume_on_output = False
+        self.set_audio_formats(AUDIO_CONFIG['agent_output_format'], AUDIO_CONFIG['agent_input_format'], confirmed=False)
+
+    def set_audio_formats(self, output_format: str, input_format: str, confirmed: bool = True):
+        """
+        Define os formatos de áudio negociados com o agente.
+
+        Quando o agente fala μ-law 8 kHz o áudio passa direto entre Twilio e
+        ElevenLabs; os demais formatos caem na transcodificação.
+
+        Args:
+            confirmed: Formatos confirmados pelo servidor; só então a
+                transcodificação de saída é aberta (uma vez por chamada)
+        """
+        self.output_format = output_format
+        self.input_format = input_format
+        self._output_encoding, self._output_rate = parse_audio_format(output_format)
+        self._input_encoding, self._input_rate = parse_audio_format(input_format)
+        if self._output_encoding != 'pcm':
+            self._close_output_transcoder()
+        elif confirmed:
+            self._open_output_transcoder()
+        self._input_resampler = None
+        if self._input_encoding == 'pcm' and self._input_rate != 8000:
+            self._input_resampler = PolyphaseResampler(8000, self._input_rate)
+        self.metrics['output_audio_path'] = describe_audio_path(output_format)
+        self.metrics['input_audio_path'] = describe_audio_path(input_format)
+        log_info("🎛️", f"Formatos de áudio: saída {output_format}, entrada {input_format}")
+
+    def _open_output_transcoder(self):
+        """
+        Sessão de transcodificação para a taxa de saída atual, aberta uma vez numa thread auxiliar.
+
+        Returns:
+            concurrent.futures.Future: resolve com a sessão
+        """
+        if self._output_transcoder is not None and self._output_transcoder_rate == self._output_rate:
+            return self._output_transcoder
+        self._close_output_transcoder()
+        self._output_transcoder_rate = self._output_rate
+        self._output_transcoder = transcoder_pool.open_session_async(
+            self._output_rate, self._noise_level, self._noise_offset
+        )
+        self._output_transcoder.add_done_callback(self._output_transcoder_opened)
+        return self._output_transcoder
+
+    def _output_transcoder_opened(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.metrics['output_transcoder'] = 'inline' if future.result().inline else 'pool'
+
+    @staticmethod
+    def _close_session(future):
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+    def _close_output_transcoder(self):
+        future, self._output_transcoder = self._output_transcoder, None
+        self._output_transcoder_rate = None
+        if future is not None:
+            # Uma sessão ainda abrindo é fechada assim que ficar pronta
+            future.add_done_callback(self._close_session)
 
     def start(self, input_callback):
         """Inicia a interface de áudio"""
         self.input_callback = input_callback
         self._running = True
         self._is_interrupted = False
-        self._session_ended.clear()
+        self._call_in_loop(self._start_sender)
         log_info("🎙️", "Interface de áudio iniciada")
         return True
 
@@ -40,11 +138,16 @@ class TwilioAudioInterface(AudioInterface):
         """Para a interface de áudio"""
         self._running = False
         self.should_stop = True
-        self._session_ended.set()
+        if self._loop.is_closed():
+            self._close_output_transcoder()
+        self._call_in_loop(self._stop_sender)
         log_info("🛑", "Interface de áudio parada")
 
     def wait_for_session_end(self):
         """Aguarda o fim da sessão"""
+        if self._in_loop_thread():
+            # Bloquear aqui travaria o próprio loop que encerra a sessão
+            return self._session_ended.is_set()
         if self._loop.is_running():
             future = asyncio.run_coroutine_threadsafe(self._session_ended.wait(), self._loop)
             return future.result()
@@ -52,66 +155,160 @@ class TwilioAudioInterface(AudioInterface):
             return self._loop.run_until_complete(self._session_ended.wait())
 
     def interrupt(self):
+        """Interrupção confirmada pelo agente (evento `interruption`)."""
+        # O cliente descarta o áudio com event_id até a interrupção: o próximo que chegar já é de outra resposta
+        self._resume_on_output = True
+        self._stop_playback()
+
+    def _stop_playback(self):
         """Interrompe a reprodução de áudio atual"""
         self._is_interrupted = True
         self.agent_is_speaking = False
-        self._run_coroutine(self._send_clear_event())
+        self._call_in_loop(self._clear_outbound)
         log_info("⏹️", "Áudio interrompido")
 
-    def _run_coroutine(self, coroutine):
-        """Executa uma corotina no loop de eventos"""
-        if self._loop.is_running():
-            return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
-        else:
-            return self._loop.run_until_complete(coroutine)
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _call_in_loop(self, callback, *args):
+        """Executa um callback no loop da chamada sem bloquear quem chamou."""
+        if self._in_loop_thread():
+            callback(*args)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _start_sender(self):
+        self._session_ended.clear()
+        if self._sender_task is None or self._sender_task.done():
+            self._sender_task = self._loop.create_task(self._send_outbound())
+
+    def _stop_sender(self):
+        self._drain_outbound()
+        self._drain_encode_queue()
+        if self._sender_task:
+            self._sender_task.cancel()
+            self._sender_task = None
+        if self._encoder_task:
+            self._encoder_task.cancel()
+            self._encoder_task = None
+        self._close_output_transcoder()
+        self._session_ended.set()
+
+    def _drain_outbound(self) -> int:
+        dropped = 0
+        while not self._outbound.empty():
+            self._outbound.get_nowait()
+            dropped += 1
+        return dropped
+
+    def _drain_encode_queue(self):
+        while not self._encode_queue.empty():
+            self._encode_queue.get_nowait()
+
+    def _clear_outbound(self):
+        """Descarta o áudio ainda não enviado e manda o Twilio limpar o que já recebeu."""
+        # O chunk que já está no transcodificador termina e é descartado em _enqueue_output
+        self._drain_encode_queue()
+        dropped = self._drain_outbound()
+        self._packetizer.reset()
+        self.metrics['outbound_frames_dropped'] = self.metrics.get('outbound_frames_dropped', 0) + dropped
+        self._loop.create_task(self._send_clear_event())
+
+    def _enqueue_output(self, ulaw_audio):
+        if self._is_interrupted or not self._running:
+            return
+        # O resto que não completa um frame fica no packetizer para o próximo chunk
+        for packet in self._packetizer.feed(ulaw_audio):
+            self._outbound.put_nowait(packet)
+        # None marca o fim de um chunk do agente: o sender envia a marca ao chegar nele
+        self._outbound.put_nowait(None)
+
+    async def _send_outbound(self):
+        """Envia a fila de saída para o Twilio no ritmo do áudio (20 ms por frame)."""
+        frame_interval = self._chunk_duration / 1000
+        deadline = None
+        try:
+            while True:
+                if self._outbound.empty():
+                    deadline = None
+                packet = await self._outbound.get()
+
+                if packet is None:
+                    if self._outbound.empty():
+                        # Fila vazia: completa e envia o último frame antes da marca
+                        tail = self._packetizer.flush()
+                        if tail:
+                            for tail_packet in tail:
+                                self._outbound.put_nowait(tail_packet)
+                            self._outbound.put_nowait(None)
+                            continue
+                    await self.send_mark()
+                    if self._outbound.empty():
+                        self.agent_is_speaking = False
+                    continue
+
+                # Ritmo por prazo absoluto: atrasos de um envio não se acumulam nos seguintes
+                now = self._loop.time()
+                deadline = now if deadline is None else max(deadline, now)
+                await self.websocket.send_text(self._messages.media(packet.payload))
+                self.frames_sent = packet.end_frame
+                deadline += packet.frame_count * frame_interval
+                await asyncio.sleep(deadline - self._loop.time())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log_error("❌", f"Erro ao enviar áudio para o Twilio: {e}")
+            self.agent_is_speaking = False
 
     async def process_input(self, audio_data: str):
         """Processa áudio recebido do Twilio"""
         if self._running:
             try:
-                pcm_audio = convert_ulaw_to_pcm(audio_data)
-                if pcm_audio:
-                    current_time = asyncio.get_event_loop().time()
-                    rms = pcm_audio.rms
-                    is_speech = rms > -30  # Ajuste este valor conforme necessário
-                    
-                    if is_speech and not self.is_speaking:
-                        self.is_speaking = True
-                        self.last_vad_update = current_time
-                        await self.handle_speech_started()
-                    elif is_speech:
-                        self.last_vad_update = current_time
-                    elif self.is_speaking and (current_time - self.last_vad_update) > self.speech_timeout:
-                        self.is_speaking = False
-                        await self.handle_speech_stopped()
-                    
-                    if self.input_callback:
-                        self.input_callback(pcm_audio.raw_data)
+                samples = self._inbound.process(audio_data)
+                vad_event = self._vad.process(samples)
+                
+                if vad_event == SPEECH_STARTED:
+                    self.is_speaking = True
+                    await self.handle_speech_started()
+                elif vad_event == SPEECH_STOPPED:
+                    self.is_speaking = False
+                    await self.handle_speech_stopped()
+                
+                if self.input_callback:
+                    self.input_callback(self._encode_input())
                     
             except Exception as e:
                 log_error("❌", f"Erro no processamento de áudio de entrada: {e}")
 
     def output(self, audio_data: bytes):
-        """Interface síncrona para saída de áudio"""
+        """
+        Interface síncrona para saída de áudio.
+
+        Chamada na thread do SDK: só converte o áudio e o entrega à fila da
+        chamada, sem esperar o envio nem a reprodução. O corte em frames de
+        20 ms é feito no loop. Chamada no loop (cliente asyncio), o PCM vai
+        para a task de transcodificação, que espera o pool sem travar o loop.
+        """
+        if self._is_interrupted and self._resume_on_output:
+            # Áudio depois de uma interrupção do agente: é a próxima resposta
+            self._is_interrupted = False
+            self._resume_on_output = False
         if not self._is_interrupted:
             try:
                 self.agent_is_speaking = True
-                audio_payload = convert_elevenlabs_to_ulaw(audio_data)
+                if self._output_encoding == 'pcm' and self._in_loop_thread():
+                    self._encode_queue.put_nowait(audio_data)
+                    if self._encoder_task is None or self._encoder_task.done():
+                        self._encoder_task = self._loop.create_task(self._encode_pcm_output())
+                    return
+                ulaw_audio = self._encode_output(audio_data)
                 
-                if audio_payload:
-                    chunk_size = int(8000 * 2 * self._chunk_duration / 1000)
-                    chunks = [audio_payload[i:i+chunk_size] for i in range(0, len(audio_payload), chunk_size)]
-                    
-                    for chunk in chunks:
-                        self._run_coroutine(self.websocket.send_json({
-                            "event": "media",
-                            "streamSid": self.stream_sid,
-                            "media": {"payload": chunk}
-                        }))
-                        time.sleep(self._chunk_duration / 1000)
-                    
-                    self._run_coroutine(self.send_mark())
-                    log_info("📤", "Áudio enviado para Twilio")
+                if ulaw_audio is not None and len(ulaw_audio):
+                    self._call_in_loop(self._enqueue_output, ulaw_audio)
+                    log_info("📤", "Áudio enfileirado para Twilio")
                 else:
                     log_error("❌", "Falha na conversão do áudio")
                     
@@ -119,35 +316,75 @@ class TwilioAudioInterface(AudioInterface):
                 log_error("❌", f"Erro ao processar áudio de saída: {e}")
                 self.agent_is_speaking = False
 
+    async def _encode_pcm_output(self):
+        """Transcodifica, em ordem, o PCM do agente entregue no loop e o põe na fila de saída."""
+        try:
+            while True:
+                audio_data = await self._encode_queue.get()
+                try:
+                    opening = self._open_output_transcoder()
+                    transcoder = opening.result() if opening.done() else await asyncio.wrap_future(opening)
+                    ulaw_audio = await transcoder.transcode_async(audio_data)
+                except Exception as e:
+                    log_error("❌", f"Erro na conversão para ulaw: {e}")
+                    continue
+                if len(ulaw_audio):
+                    self._enqueue_output(ulaw_audio)
+        except asyncio.CancelledError:
+            pass
+
+    def _encode_input(self) -> memoryview:
+        """
+        Prepara o último frame do Twilio no formato de entrada do agente.
+
+        Retorna uma visão sem cópia dos buffers da chamada, válida até o próximo
+        frame; o callback do agente a codifica em base64 imediatamente.
+        """
+        if self.input_format == TELEPHONY_FORMAT:
+            return self._inbound.ulaw_view()
+        if self._input_resampler:
+            return memoryview(self._input_resampler.process(self._inbound.pcm)).cast('B')
+        return self._inbound.pcm_view()
+
+    def _encode_output(self, audio_data: bytes):
+        """Converte o áudio do agente em μ-law 8 kHz (bytes ou array uint8) para o Twilio."""
+        if self.output_format == TELEPHONY_FORMAT:
+            if self._noise_mixer:
+                return pcm_to_ulaw(self._noise_mixer.mix(ulaw_to_pcm(audio_data)))
+            return audio_data
+        if self._output_encoding == 'pcm':
+            try:
+                # Thread do SDK: pode esperar a abertura e o processo do pool
+                return self._open_output_transcoder().result().transcode(audio_data)
+            except Exception as e:
+                log_error("❌", f"Erro na conversão para ulaw: {e}")
+                return None
+        log_error("❌", f"Formato de saída não suportado: {self.output_format}")
+        return None
+
     async def handle_speech_started(self):
         """Manipula o início da fala do usuário"""
         log_info("🗣️", "Usuário começou a falar")
         if self.agent_is_speaking:
-            self.interrupt()
+            self._stop_playback()
             log_info("🛑", "Fala do agente interrompida")
 
     async def handle_speech_stopped(self):
         """Manipula o fim da fala do usuário"""
         self._is_interrupted = False
+        self._resume_on_output = False
         log_info("🤫", "Usuário parou de falar")
 
     async def send_mark(self):
         """Envia marca para controle de fluxo"""
         try:
-            await self.websocket.send_json({
-                "event": "mark",
-                "streamSid": self.stream_sid,
-                "mark": {"name": "audio_streaming"}
-            })
+            await self.websocket.send_text(self._messages.mark("audio_streaming"))
         except Exception as e:
             log_error("❌", f"Erro ao enviar marca: {e}")
 
     async def _send_clear_event(self):
         """Envia evento de limpeza para o Twilio"""
         try:
-            await self.websocket.send_json({
-                "event": "clear",
-                "streamSid": self.stream_sid
-            })
+            await self.websocket.send_text(self._messages.clear)
         except Exception as e:
             log_error("❌", f"Erro ao enviar evento clear: {e}")
\ No newline at end of file
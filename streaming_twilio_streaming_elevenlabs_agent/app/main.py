@@ -2,20 +2,34 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from routes import router
 from websocket import WebSocketManager
 from config import settings, twilio_client  # Importar o cliente aqui
 from utils.logger import log_info, log_error
 
+# Inicializa o WebSocket manager
+ws_manager = WebSocketManager()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Libera os recursos do manager (conversas especulativas) na parada."""
+    yield
+    await ws_manager.cleanup()
+
 # Inicializa a aplicação FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# O webhook /incoming-call prepara a conversa pelo manager
+app.state.ws_manager = ws_manager
 
 # Adiciona as rotas
 app.include_router(router)
 
-# Inicializa o WebSocket manager
-ws_manager = WebSocketManager()
+@app.get("/sessions")
+async def active_sessions():
+    """Retorna o número de chamadas ativas e o estado de cada uma."""
+    return {**ws_manager.sessions.snapshot(), "speculative": ws_manager.speculative.snapshot()}
 
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
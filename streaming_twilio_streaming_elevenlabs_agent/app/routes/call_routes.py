@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from twilio.twiml.voice_response import VoiceResponse, Connect
 from services.twilio_service import TwilioService
+from utils.speculative_sessions import call_sid_from_request, is_twilio_request
 from utils.logger import log_info, log_error
-from config import CALL_TO_PHONE, TWILIO_PHONE_NUMBER
+from config import CALL_TO_PHONE, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
 
 router = APIRouter()
 
@@ -14,6 +15,15 @@ async def index_page():
 
 @router.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(request: Request):
+    # Só o Twilio, com a assinatura da conta, pode abrir uma conversa com o agente
+    if not await is_twilio_request(request, TWILIO_AUTH_TOKEN):
+        log_error("🚫", "Webhook /incoming-call com assinatura do Twilio inválida")
+        return Response(status_code=403)
+    # A conversa com o agente começa já, enquanto o Twilio processa o TwiML
+    ws_manager = getattr(request.app.state, 'ws_manager', None)
+    if ws_manager:
+        ws_manager.speculative.prepare(await call_sid_from_request(request))
+
     response = VoiceResponse()
     host = request.url.hostname
     connect = Connect()
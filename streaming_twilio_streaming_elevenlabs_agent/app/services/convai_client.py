@@ -0,0 +1,264 @@
+"""
+Cliente asyncio do protocolo WebSocket do Conversational AI do ElevenLabs.
+
+O `Conversation` do SDK abre, por chamada, uma thread de recepção e uma
+thread com loop próprio para as client tools, e chama a interface de áudio
+a partir delas. Aqui a conversa roda inteira no loop do servidor: uma task
+recebe e despacha as mensagens, outra envia o que a chamada produz (áudio
+do usuário, pongs). Nenhuma thread por chamada.
+
+Os callbacks e a interface de áudio são os mesmos do SDK
+(`agent_response`, `user_transcript`, correções, interrupções); como rodam
+no loop, não podem bloquear.
+"""
+import asyncio
+import base64
+import json
+import websockets
+from elevenlabs import AsyncElevenLabs
+from elevenlabs.conversational_ai.conversation import ConversationInitiationData
+from utils.message_encoder import dumps
+from utils.logger import log_info, log_error
+from config import WEBSOCKET_CONFIG
+
+# Mesmo limite de mensagem do SDK: chunks de áudio do agente podem ser grandes
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+_USER_AUDIO_PREFIX = '{"user_audio_chunk":"'
+
+def user_audio_chunk(audio) -> str:
+    """Mensagem de áudio do usuário (bytes ou memoryview), sem dict nem json.dumps."""
+    return _USER_AUDIO_PREFIX + base64.b64encode(audio).decode('ascii') + '"}'
+
+class AsyncConversation:
+    """
+    Sessão de conversação com um agente, no loop de eventos de quem a cria.
+
+    Args:
+        client: Cliente AsyncElevenLabs (usado para obter a URL assinada)
+        agent_id: ID do agente
+        audio_interface: Interface de áudio (mesmo contrato do AudioInterface do SDK)
+        requires_auth: Se a conexão usa URL assinada
+        config: Dados de iniciação da conversa
+        client_tools: Ferramentas do cliente, {nome: função async(parameters)}
+    """
+
+    def __init__(self, client: AsyncElevenLabs, agent_id: str, *, audio_interface,
+                 requires_auth: bool = True, config: ConversationInitiationData = None,
+                 client_tools: dict = None, callback_agent_response=None,
+                 callback_agent_response_correction=None, callback_user_transcript=None,
+                 callback_latency_measurement=None):
+        self.client = client
+        self.agent_id = agent_id
+        self.audio_interface = audio_interface
+        self.requires_auth = requires_auth
+        self.config = config or ConversationInitiationData()
+        self.client_tools = client_tools or {}
+        self.callback_agent_response = callback_agent_response
+        self.callback_agent_response_correction = callback_agent_response_correction
+        self.callback_user_transcript = callback_user_transcript
+        self.callback_latency_measurement = callback_latency_measurement
+
+        self._ws = None
+        self._outgoing = asyncio.Queue()
+        self._receiver_task = None
+        self._sender_task = None
+        self._tool_tasks = set()
+        self._conversation_id = None
+        self._last_interrupt_id = 0
+        self._ended = False
+        self._message_handlers = {
+            'conversation_initiation_metadata': self._handle_initiation_metadata,
+            'audio': self._handle_audio,
+            'agent_response': self._handle_agent_response,
+            'agent_response_correction': self._handle_agent_response_correction,
+            'user_transcript': self._handle_user_transcript,
+            'interruption': self._handle_interruption,
+            'ping': self._handle_ping,
+            'client_tool_call': self._handle_client_tool_call,
+        }
+
+    @property
+    def conversation_id(self) -> str:
+        return self._conversation_id
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and self._ws.open and not self._ended
+
+    async def _get_ws_url(self) -> str:
+        if self.requires_auth:
+            response = await self.client.conversational_ai.conversations.get_signed_url(agent_id=self.agent_id)
+            return response.signed_url
+        base_ws_url = self.client._client_wrapper.get_environment().wss
+        return f"{base_ws_url}/v1/convai/conversation?agent_id={self.agent_id}"
+
+    async def connect(self):
+        """
+        Conecta ao agente e envia os dados de iniciação, sem começar a trocar áudio.
+
+        Pode ser chamado antes de a interface de áudio existir (sessão
+        especulativa): o que o agente mandar nesse meio tempo, como a
+        saudação, fica no buffer da conexão até `start_session`.
+        """
+        ws_url = await self._get_ws_url()
+        self._ws = await websockets.connect(
+            ws_url,
+            max_size=MAX_MESSAGE_SIZE,
+            ping_interval=WEBSOCKET_CONFIG['ping_interval'],
+            ping_timeout=WEBSOCKET_CONFIG['ping_timeout'],
+            close_timeout=WEBSOCKET_CONFIG['close_timeout'],
+        )
+        await self._ws.send(dumps({
+            "type": "conversation_initiation_client_data",
+            "custom_llm_extra_body": self.config.extra_body,
+            "conversation_config_override": self.config.conversation_config_override,
+            "dynamic_variables": self.config.dynamic_variables,
+        }))
+
+    async def start_session(self):
+        """Conecta ao agente (se ainda não conectou) e começa a trocar áudio."""
+        if self._ws is None:
+            await self.connect()
+        # A interface começa antes da recepção: o áudio já no buffer (saudação) tem para onde ir
+        self.audio_interface.start(self._input_callback)
+        self._sender_task = asyncio.create_task(self._send_outgoing())
+        self._receiver_task = asyncio.create_task(self._receive())
+
+    def _input_callback(self, audio):
+        """Chamado pela interface a cada frame do usuário; só codifica e enfileira."""
+        if not self._ended:
+            self._outgoing.put_nowait(user_audio_chunk(audio))
+
+    def _send(self, message):
+        if not self._ended:
+            self._outgoing.put_nowait(message if isinstance(message, str) else dumps(message))
+
+    def send_user_message(self, text: str):
+        """Envia uma mensagem de texto do usuário ao agente."""
+        self._send({"type": "user_message", "text": text})
+
+    def send_contextual_update(self, text: str):
+        """Envia contexto ao agente sem interromper a conversa."""
+        self._send({"type": "contextual_update", "text": text})
+
+    def register_user_activity(self):
+        """Avisa o agente de atividade do usuário (evita o timeout da sessão)."""
+        self._send('{"type":"user_activity"}')
+
+    async def _send_outgoing(self):
+        try:
+            while True:
+                await self._ws.send(await self._outgoing.get())
+        except asyncio.CancelledError:
+            pass
+        except websockets.ConnectionClosed:
+            await self.end_session()
+        except Exception as e:
+            log_error("❌", f"Erro ao enviar para o agente: {e}")
+            await self.end_session()
+
+    async def _receive(self):
+        try:
+            async for message in self._ws:
+                message = json.loads(message)
+                handler = self._message_handlers.get(message.get('type'))
+                if handler is not None:
+                    handler(message)
+        except asyncio.CancelledError:
+            pass
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            log_error("❌", f"Erro ao receber do agente: {e}")
+        finally:
+            # O agente encerrou (ou a conexão caiu): a sessão acaba para os dois lados
+            if not self._ended:
+                await self.end_session()
+
+    def _handle_initiation_metadata(self, message: dict):
+        event = message["conversation_initiation_metadata_event"]
+        self._conversation_id = event["conversation_id"]
+        # Formatos confirmados pelo servidor
+        set_audio_formats = getattr(self.audio_interface, 'set_audio_formats', None)
+        if set_audio_formats:
+            set_audio_formats(
+                event.get("agent_output_audio_format", self.audio_interface.output_format),
+                event.get("user_input_audio_format", self.audio_interface.input_format),
+            )
+
+    def _handle_audio(self, message: dict):
+        event = message["audio_event"]
+        if int(event["event_id"]) <= self._last_interrupt_id:
+            return
+        self.audio_interface.output(base64.b64decode(event["audio_base_64"]))
+
+    def _handle_agent_response(self, message: dict):
+        if self.callback_agent_response:
+            self.callback_agent_response(message["agent_response_event"]["agent_response"].strip())
+
+    def _handle_agent_response_correction(self, message: dict):
+        if self.callback_agent_response_correction:
+            event = message["agent_response_correction_event"]
+            self.callback_agent_response_correction(
+                event["original_agent_response"].strip(), event["corrected_agent_response"].strip()
+            )
+
+    def _handle_user_transcript(self, message: dict):
+        if self.callback_user_transcript:
+            self.callback_user_transcript(message["user_transcription_event"]["user_transcript"].strip())
+
+    def _handle_interruption(self, message: dict):
+        self._last_interrupt_id = int(message["interruption_event"]["event_id"])
+        self.audio_interface.interrupt()
+
+    def _handle_ping(self, message: dict):
+        event = message["ping_event"]
+        self._send('{"type":"pong","event_id":%d}' % int(event["event_id"]))
+        if self.callback_latency_measurement and event.get("ping_ms"):
+            self.callback_latency_measurement(int(event["ping_ms"]))
+
+    def _handle_client_tool_call(self, message: dict):
+        tool_call = message.get("client_tool_call", {})
+        task = asyncio.create_task(self._run_client_tool(tool_call))
+        self._tool_tasks.add(task)
+        task.add_done_callback(self._tool_tasks.discard)
+
+    async def _run_client_tool(self, tool_call: dict):
+        tool_name = tool_call.get("tool_name")
+        parameters = {"tool_call_id": tool_call.get("tool_call_id"), **tool_call.get("parameters", {})}
+        try:
+            tool = self.client_tools.get(tool_name)
+            if tool is None:
+                raise ValueError(f"Tool '{tool_name}' is not registered")
+            result = await tool(parameters)
+            response = {"result": result or f"Client tool: {tool_name} called successfully.", "is_error": False}
+        except Exception as e:
+            response = {"result": str(e), "is_error": True}
+        self._send({"type": "client_tool_result", "tool_call_id": parameters["tool_call_id"], **response})
+
+    async def end_session(self):
+        """Encerra a sessão: para a interface de áudio, as tasks e a conexão."""
+        if self._ended:
+            return
+        self._ended = True
+        if self.audio_interface:
+            self.audio_interface.stop()
+        current = asyncio.current_task()
+        for task in (self._sender_task, self._receiver_task, *self._tool_tasks):
+            if task is not None and task is not current:
+                task.cancel()
+        if self._ws is not None:
+            try:
+                await self._ws.close()
+            except Exception as e:
+                log_error("❌", f"Erro ao fechar conexão com o agente: {e}")
+        log_info("🔚", f"Conversa {self._conversation_id} encerrada")
+
+    async def wait_for_session_end(self) -> str:
+        """Aguarda a task de recepção terminar e retorna o ID da conversa."""
+        if self._receiver_task is None:
+            raise RuntimeError("Session not started.")
+        if self._receiver_task is not asyncio.current_task():
+            await asyncio.gather(self._receiver_task, return_exceptions=True)
+        return self._conversation_id
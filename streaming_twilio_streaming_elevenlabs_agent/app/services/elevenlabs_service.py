@@ -1,35 +1,83 @@
 import os
-from elevenlabs import ElevenLabs
+from elevenlabs import ElevenLabs, AsyncElevenLabs
 from elevenlabs.conversational_ai.conversation import ConversationInitiationData, Conversation
 from interfaces.audio_interface import TwilioAudioInterface
+from services.convai_client import AsyncConversation
 from utils.logger import log_info, log_error
-from config import ELEVENLABS_API_KEY, AGENT_ID
+from config import ELEVENLABS_API_KEY, AGENT_ID, CONVAI_CLIENT
+
+class NegotiatingConversation(Conversation):
+    """Conversation que aplica na interface de áudio os formatos confirmados pelo servidor."""
+
+    def _handle_message(self, message, ws):
+        if message.get("type") == "conversation_initiation_metadata":
+            event = message["conversation_initiation_metadata_event"]
+            self.audio_interface.set_audio_formats(
+                event.get("agent_output_audio_format", self.audio_interface.output_format),
+                event.get("user_input_audio_format", self.audio_interface.input_format),
+            )
+        super()._handle_message(message, ws)
 
 class ElevenLabsService:
-    def __init__(self):
-        self.client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+    def __init__(self, convai_client: str = CONVAI_CLIENT):
+        self.convai_client = convai_client
+        if convai_client == 'sdk':
+            self.client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+        else:
+            self.client = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY)
+
+    def _new_conversation(self, audio_interface) -> AsyncConversation | Conversation:
+        """Monta a conversação com o agente (ainda sem conectar)."""
+        config = ConversationInitiationData()
+        conversation_class = NegotiatingConversation if self.convai_client == 'sdk' else AsyncConversation
+        return conversation_class(
+            client=self.client,
+            agent_id=AGENT_ID,
+            requires_auth=True,
+            audio_interface=audio_interface,
+            config=config,
+            callback_agent_response=lambda response: log_info("🤖", f"Agente: {response}"),
+            callback_user_transcript=lambda transcript: log_info("👤", f"Usuário: {transcript}"),
+            callback_agent_response_correction=lambda original, correction: log_info("📝", f"Correção: {original} -> {correction}")
+        )
 
-    async def create_conversation(self, websocket, stream_sid) -> tuple[Conversation, TwilioAudioInterface]:
+    async def prepare_conversation(self) -> AsyncConversation:
+        """
+        Conecta ao agente antes de a chamada ter stream (sessão especulativa).
+
+        A interface de áudio é ligada depois, em `create_conversation`.
+        """
+        conversation = self._new_conversation(audio_interface=None)
+        await conversation.connect()
+        return conversation
+
+    @staticmethod
+    async def discard_conversation(conversation: AsyncConversation):
+        """Fecha uma conversa especulativa que nenhuma chamada adotou."""
+        await conversation.end_session()
+
+    async def create_conversation(self, websocket, stream_sid, metrics: dict = None,
+                                  conversation: AsyncConversation = None) -> tuple[AsyncConversation | Conversation, TwilioAudioInterface]:
         """
         Cria e configura uma nova conversação com o agente ElevenLabs.
         Retorna a conversação e a interface de áudio configurada.
+
+        Se `conversation` vier de `prepare_conversation`, ela é adotada em vez
+        de criar uma nova.
         """
         try:
             # Inicializa a interface de áudio do Twilio
-            twilio_interface = TwilioAudioInterface(websocket, stream_sid)
+            twilio_interface = TwilioAudioInterface(websocket, stream_sid, metrics)
             
             # Configura e inicia a conversação do Elevenlabs
-            config = ConversationInitiationData()
-            conversation = Conversation(
-                client=self.client,
-                agent_id=AGENT_ID,
-                requires_auth=True,
-                audio_interface=twilio_interface,
-                config=config,
-                callback_agent_response=lambda response: log_info("🤖", f"Agente: {response}"),
-                callback_user_transcript=lambda transcript: log_info("👤", f"Usuário: {transcript}"),
-                callback_agent_response_correction=lambda original, correction: log_info("📝", f"Correção: {original} -> {correction}")
-            )
+            if conversation is not None and not conversation.is_connected:
+                # A conexão especulativa caiu enquanto esperava o start: começa do zero
+                await self.discard_conversation(conversation)
+                conversation = None
+            if conversation is not None:
+                conversation.audio_interface = twilio_interface
+            else:
+                conversation = self._new_conversation(twilio_interface)
             
             return conversation, twilio_interface
 
@@ -38,11 +86,14 @@ class ElevenLabsService:
             raise
 
     @staticmethod
-    async def start_conversation(conversation: Conversation, twilio_interface: TwilioAudioInterface):
+    async def start_conversation(conversation: AsyncConversation | Conversation, twilio_interface: TwilioAudioInterface):
         """Inicia uma sessão de conversação."""
         try:
             # Inicia a sessão
-            conversation.start_session()  # Método síncrono
+            if isinstance(conversation, AsyncConversation):
+                await conversation.start_session()
+            else:
+                conversation.start_session()  # Método síncrono (abre as threads do SDK)
             twilio_interface.conversation = conversation
             log_info("✅", "Sessão iniciada com sucesso")
             
@@ -53,13 +104,17 @@ class ElevenLabsService:
             raise
 
     @staticmethod
-    async def end_conversation(conversation: Conversation, twilio_interface: TwilioAudioInterface):
+    async def end_conversation(conversation: AsyncConversation | Conversation, twilio_interface: TwilioAudioInterface):
         """Finaliza uma sessão de conversação de forma segura."""
         try:
             if twilio_interface:
                 twilio_interface.stop()
             
-            if conversation:
+            if isinstance(conversation, AsyncConversation):
+                await conversation.end_session()
+                await conversation.wait_for_session_end()
+                log_info("👋", "Sessão finalizada com sucesso")
+            elif conversation:
                 conversation.end_session()  # Método síncrono
                 twilio_interface.wait_for_session_end()  # Método síncrono
                 log_info("👋", "Sessão finalizada com sucesso")
@@ -1,5 +1,7 @@
 import os
 from twilio.rest import Client
+from utils.message_encoder import twilio_encoder
+from utils.twilio_events import TWILIO_EVENTS
 from utils.logger import log_info, log_error
 from config import (
     TWILIO_ACCOUNT_SID,
@@ -51,13 +53,7 @@ class TwilioService:
             payload: Payload de áudio
         """
         try:
-            await websocket.send_json({
-                "event": "media",
-                "streamSid": stream_sid,
-                "media": {
-                    "payload": payload
-                }
-            })
+            await websocket.send_text(twilio_encoder(stream_sid).media(payload))
         except Exception as e:
             log_error("❌", f"Erro ao enviar evento de mídia: {e}")
             raise
@@ -72,13 +68,7 @@ class TwilioService:
             stream_sid: ID da stream
         """
         try:
-            await websocket.send_json({
-                "event": "mark",
-                "streamSid": stream_sid,
-                "mark": {
-                    "name": "audio_streaming"
-                }
-            })
+            await websocket.send_text(twilio_encoder(stream_sid).mark("audio_streaming"))
         except Exception as e:
             log_error("❌", f"Erro ao enviar marca: {e}")
             raise
@@ -93,10 +83,7 @@ class TwilioService:
             stream_sid: ID da stream
         """
         try:
-            await websocket.send_json({
-                "event": "clear",
-                "streamSid": stream_sid
-            })
+            await websocket.send_text(twilio_encoder(stream_sid).clear)
         except Exception as e:
             log_error("❌", f"Erro ao enviar evento clear: {e}")
             raise
@@ -111,11 +98,7 @@ class TwilioService:
         Returns:
             bool: True se o evento é válido
         """
-        return (
-            isinstance(data, dict) and
-            'event' in data and
-            data['event'] in ['media', 'start', 'stop', 'mark']
-        )
+        return isinstance(data, dict) and data.get('event') in TWILIO_EVENTS
 
     @staticmethod
     def get_event_type(data: dict) -> str:
@@ -0,0 +1,21 @@
+# Formato nativo do Twilio Media Streams: μ-law 8 kHz mono
+TELEPHONY_FORMAT = 'ulaw_8000'
+
+def parse_audio_format(audio_format: str) -> tuple:
+    """
+    Separa um formato de áudio do ElevenLabs em codificação e taxa de amostragem.
+
+    Args:
+        audio_format: Formato no padrão do ElevenLabs (ex.: 'pcm_16000', 'ulaw_8000')
+
+    Returns:
+        tuple: (codificação, taxa de amostragem em Hz)
+    """
+    encoding, _, sample_rate = audio_format.partition('_')
+    return encoding, int(sample_rate)
+
+def describe_audio_path(audio_format: str) -> str:
+    """Descreve o caminho de áudio usado para um formato: passthrough ou transcodificação."""
+    if audio_format == TELEPHONY_FORMAT:
+        return 'passthrough'
+    return f'transcode:{audio_format}'
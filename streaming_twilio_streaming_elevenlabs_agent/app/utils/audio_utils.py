@@ -1,8 +1,10 @@
 import base64
-import audioop
 import numpy as np
 from io import BytesIO
 from pydub import AudioSegment
+from utils.g711 import ulaw2lin, pcm_to_ulaw
+from utils.resampler import PolyphaseResampler
+from utils.comfort_noise import ComfortNoiseMixer, NOISE_BANK_SAMPLES
 from utils.logger import log_info, log_error
 
 def convert_ulaw_to_pcm(ulaw_audio_base64: str) -> AudioSegment:
@@ -20,7 +22,7 @@ def convert_ulaw_to_pcm(ulaw_audio_base64: str) -> AudioSegment:
         ulaw_audio = base64.b64decode(ulaw_audio_base64)
         
         # Converte de μ-law para PCM linear 16-bit
-        pcm_audio = audioop.ulaw2lin(ulaw_audio, 2)  # 2 bytes por amostra (16-bit)
+        pcm_audio = ulaw2lin(ulaw_audio)  # 2 bytes por amostra (16-bit)
         
         # Cria um AudioSegment do PCM
         audio = AudioSegment(
@@ -36,44 +38,51 @@ def convert_ulaw_to_pcm(ulaw_audio_base64: str) -> AudioSegment:
         log_error("❌", f"Erro na conversão ulaw->pcm: {e}")
         return None
 
-def convert_elevenlabs_to_ulaw(audio_data: bytes) -> str:
+def elevenlabs_pcm_to_ulaw(audio_data: bytes, sample_rate: int = 16000,
+                           resampler: PolyphaseResampler = None,
+                           noise_mixer: ComfortNoiseMixer = None) -> np.ndarray:
+    """
+    Converte áudio PCM do Elevenlabs para G711 μ-law 8 kHz.
+    
+    Args:
+        audio_data: Bytes do áudio PCM 16-bit do ElevenLabs
+        sample_rate: Taxa de amostragem do áudio recebido
+        resampler: Reamostrador da chamada para sample_rate -> 8 kHz. Sem ele,
+            cada chunk é reamostrado isoladamente, sem continuidade entre chunks.
+        noise_mixer: Ruído de conforto da chamada, somado já em 8 kHz (opcional)
+    
+    Returns:
+        np.ndarray: Amostras μ-law uint8 (array novo, pode ser guardado)
+    """
+    # Converte para 8kHz (taxa do Twilio)
+    pcm_data = audio_data
+    if sample_rate != 8000:
+        resampler = resampler or PolyphaseResampler(sample_rate, 8000)
+        pcm_data = resampler.process(audio_data)
+    
+    if noise_mixer:
+        pcm_data = noise_mixer.mix(pcm_data)
+    
+    # Converte para μ-law
+    return pcm_to_ulaw(pcm_data)
+
+def convert_elevenlabs_to_ulaw(audio_data: bytes, sample_rate: int = 16000,
+                               resampler: PolyphaseResampler = None,
+                               noise_mixer: ComfortNoiseMixer = None) -> str:
     """
     Converte áudio do Elevenlabs para G711 μ-law.
     
     Args:
-        audio_data: Bytes do áudio do ElevenLabs
+        audio_data: Bytes do áudio PCM 16-bit do ElevenLabs
+        sample_rate: Taxa de amostragem do áudio recebido
+        resampler: Reamostrador da chamada para sample_rate -> 8 kHz
+        noise_mixer: Ruído de conforto da chamada (opcional)
     
     Returns:
         str: String base64 contendo áudio μ-law
     """
     try:
-        # Carrega o áudio como PCM
-        audio = AudioSegment(
-            data=audio_data,
-            sample_width=2,
-            frame_rate=16000,
-            channels=1
-        )
-        
-        # Gera ruído do mesmo tamanho do áudio
-        noise_base64 = generate_ambient_noise(len(audio))
-        noise_bytes = base64.b64decode(noise_base64)
-        noise_pcm = audioop.ulaw2lin(noise_bytes, 2)
-        
-        # Cria AudioSegment do ruído
-        noise_audio = AudioSegment(
-            data=noise_pcm,
-            sample_width=2,
-            frame_rate=8000,
-            channels=1
-        ).set_frame_rate(16000)  # Converte para mesma taxa do áudio
-        
-        # Converte para 8kHz (taxa do Twilio)
-        audio = audio.set_frame_rate(8000)
-        
-        # Converte para μ-law
-        pcm_data = audio.raw_data
-        ulaw_data = audioop.lin2ulaw(pcm_data, 2)
+        ulaw_data = elevenlabs_pcm_to_ulaw(audio_data, sample_rate, resampler, noise_mixer)
         
         # Codifica em base64
         return base64.b64encode(ulaw_data).decode('utf-8')
@@ -93,16 +102,14 @@ def generate_ambient_noise(duration_ms: int) -> str:
         str: String base64 contendo o ruído em formato μ-law
     """
     try:
-        # Gera ruído branco
+        # Ruído branco a -20 dBFS, lido do banco pré-calculado a partir de um ponto aleatório
         sample_rate = 8000
         samples = int((duration_ms / 1000.0) * sample_rate)
-        noise = np.random.normal(0, 0.1, samples)
-        
-        # Converte para bytes
-        noise_bytes = (noise * 32767).astype(np.int16).tobytes()
+        mixer = ComfortNoiseMixer(level_dbfs=-20.0, offset=np.random.randint(NOISE_BANK_SAMPLES))
+        noise = mixer.mix(np.zeros(samples, dtype=np.int16))
         
-        # Converte para μ-law
-        ulaw_data = audioop.lin2ulaw(noise_bytes, 2)
+        # Converte para μ-law direto do array, sem passar por bytes
+        ulaw_data = pcm_to_ulaw(noise).tobytes()
         
         # Retorna em base64
         return base64.b64encode(ulaw_data).decode('utf-8')
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Banco de ruído compartilhado por todas as chamadas: 2 s de ruído branco a 8 kHz, gerado uma vez
+NOISE_BANK_SAMPLES = 2 * 8000
+_noise_bank = None
+
+def get_noise_bank() -> np.ndarray:
+    """
+    Retorna o banco de ruído pré-calculado (float32, desvio padrão 1).
+
+    O banco é gerado na primeira chamada, com semente fixa, e reutilizado
+    por todos os mixers; nenhuma chamada sorteia ruído no caminho de saída.
+    """
+    global _noise_bank
+    if _noise_bank is None:
+        rng = np.random.default_rng(0)
+        _noise_bank = rng.standard_normal(NOISE_BANK_SAMPLES).astype(np.float32)
+    return _noise_bank
+
+class ComfortNoiseMixer:
+    """
+    Estágio opcional de ruído de conforto para o áudio PCM 16-bit de saída.
+
+    Um objeto por chamada: o cursor no banco avança a cada chunk, então o
+    ruído é contínuo entre chunks e chamadas diferentes começam em pontos
+    diferentes do banco. A soma é feita em int32 e saturada em int16, em
+    buffers reutilizados.
+    """
+
+    def __init__(self, level_dbfs: float = -50.0, offset: int = 0):
+        """
+        Args:
+            level_dbfs: Nível RMS do ruído em dBFS
+            offset: Posição inicial no banco de ruído
+        """
+        self.level_dbfs = level_dbfs
+        self._bank = np.rint(get_noise_bank() * 32768.0 * 10 ** (level_dbfs / 20)).astype(np.int32)
+        self._cursor = offset % len(self._bank)
+        self._acc = np.empty(0, dtype=np.int32)
+        self._noise = np.empty(0, dtype=np.int32)
+        self._output = np.empty(0, dtype=np.int16)
+
+    def _reserve(self, samples: int):
+        if len(self._acc) < samples:
+            self._acc = np.empty(samples, dtype=np.int32)
+            self._noise = np.empty(samples, dtype=np.int32)
+            self._output = np.empty(samples, dtype=np.int16)
+
+    def _take_noise(self, count: int) -> np.ndarray:
+        """Copia os próximos `count` valores do banco, dando a volta no fim."""
+        noise = self._noise[:count]
+        bank_size = len(self._bank)
+        filled = 0
+        while filled < count:
+            step = min(count - filled, bank_size - self._cursor)
+            noise[filled:filled + step] = self._bank[self._cursor:self._cursor + step]
+            filled += step
+            self._cursor = (self._cursor + step) % bank_size
+        return noise
+
+    def mix(self, pcm) -> np.ndarray:
+        """
+        Soma o ruído a um chunk de áudio.
+
+        Args:
+            pcm: Amostras PCM 16-bit (bytes, memoryview ou array int16)
+
+        Returns:
+            np.ndarray: Amostras int16 com ruído. O array é uma visão de um
+            buffer interno reutilizado na próxima chamada; copie se for guardar.
+        """
+        samples = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16)
+        count = len(samples)
+        self._reserve(count)
+
+        acc = self._acc[:count]
+        np.add(samples, self._take_noise(count), out=acc)
+        np.clip(acc, -32768, 32767, out=acc)
+        output = self._output[:count]
+        np.copyto(output, acc, casting='unsafe')
+        return output
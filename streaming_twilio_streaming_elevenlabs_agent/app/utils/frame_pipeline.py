@@ -0,0 +1,74 @@
+import binascii
+import numpy as np
+from utils.g711 import ULAW_DECODE_TABLE
+
+class InboundFramePipeline:
+    """
+    Caminho dos frames de entrada do Twilio (μ-law base64, 20 ms) com buffers por chamada.
+
+    Os códigos μ-law ficam disponíveis sem cópia (o detector de voz lê direto
+    deles) e o PCM 16-bit só é decodificado quando alguém pede (o passthrough
+    μ-law não pede), em um array pré-alocado e reutilizado a cada frame; nada
+    de AudioSegment. O único objeto novo por frame são os bytes devolvidos pelo
+    decodificador base64 da biblioteca padrão, que não decodifica em um buffer
+    existente.
+
+    As visões devolvidas (`pcm`, `pcm_view()`) apontam para os buffers internos
+    e só valem até o próximo frame.
+    """
+
+    def __init__(self, frame_size: int = 160):
+        self.ulaw = b''
+        self.frames = 0
+        self._samples = np.empty(0, dtype=np.uint8)
+        self._pcm_ready = False
+        self._pcm = np.empty(0, dtype=np.int16)
+        self._pcm_bytes = memoryview(b'')
+        self._reserve(frame_size)
+
+    def _reserve(self, samples: int):
+        if len(self._pcm) < samples:
+            self._pcm = np.empty(samples, dtype=np.int16)
+            self._pcm_bytes = memoryview(self._pcm).cast('B')
+
+    def process(self, payload: str) -> np.ndarray:
+        """
+        Decodifica um frame de mídia do Twilio.
+
+        Args:
+            payload: Áudio μ-law codificado em base64
+
+        Returns:
+            np.ndarray: Códigos μ-law do frame (uint8, sem cópia)
+        """
+        ulaw = binascii.a2b_base64(payload)
+        self._reserve(len(ulaw))
+
+        self.ulaw = ulaw
+        self._samples = np.frombuffer(ulaw, dtype=np.uint8)
+        self._pcm_ready = False
+        self.frames += 1
+        return self._samples
+
+    @property
+    def samples(self) -> np.ndarray:
+        """Códigos μ-law do último frame como array uint8 (sem cópia)."""
+        return self._samples
+
+    @property
+    def pcm(self) -> np.ndarray:
+        """Amostras PCM int16 do último frame (visão do buffer interno)."""
+        count = len(self._samples)
+        if not self._pcm_ready:
+            ULAW_DECODE_TABLE.take(self._samples, out=self._pcm[:count], mode='clip')
+            self._pcm_ready = True
+        return self._pcm[:count]
+
+    def ulaw_view(self) -> memoryview:
+        """Bytes μ-law do último frame, sem cópia."""
+        return memoryview(self.ulaw)
+
+    def pcm_view(self) -> memoryview:
+        """Bytes PCM 16-bit do último frame, sem cópia."""
+        count = len(self.pcm)
+        return self._pcm_bytes[:2 * count]
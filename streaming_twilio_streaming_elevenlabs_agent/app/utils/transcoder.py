@@ -0,0 +1,347 @@
+"""
+Transcodificação PCM -> μ-law 8 kHz do agente em um pool de processos.
+
+Cada chamada fica presa a um processo do pool (o reamostrador tem estado e
+precisa ver os chunks em ordem) e ganha um bloco de memória compartilhada:
+o áudio entra e sai por ele, e pela fila do processo só passam tuplas
+pequenas com a posição e o tamanho. Quem chama espera o próprio resultado
+antes de mandar o próximo chunk, então a ordem por chamada é garantida.
+No loop a espera é `transcode_async` (o loop segue atendendo as outras
+chamadas); `transcode` bloqueia e é para threads, como a do SDK.
+
+O processo atende em lote tudo o que estiver pendente na fila e responde
+com uma única mensagem, então o custo de IPC por chunk cai quando a carga
+sobe. Com poucas chamadas ativas a sessão é aberta inline, na thread de
+quem chama, sem IPC nenhum. Abrir uma sessão no pool pode iniciar os
+processos e faz uma ida e volta: `open_session_async` faz isso numa thread
+auxiliar.
+"""
+import asyncio
+import atexit
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from utils.comfort_noise import ComfortNoiseMixer
+from utils.g711 import pcm_to_ulaw
+from utils.resampler import PolyphaseResampler
+from utils.logger import log_info, log_error
+
+# Tamanho máximo de um chunk de entrada por ida ao processo (1 s de PCM 48 kHz)
+DEFAULT_SLOT_BYTES = 96000
+_RESULT_TIMEOUT_S = 5.0
+
+def _output_capacity(slot_bytes: int, input_rate: int) -> int:
+    """Bytes μ-law 8 kHz gerados, no máximo, por `slot_bytes` de PCM 16-bit."""
+    return (slot_bytes // 2) * 8000 // input_rate + 64
+
+class _CallState:
+    """Estado de uma chamada, do lado de quem transcodifica (processo ou inline)."""
+
+    def __init__(self, input_rate: int, noise_level: float = None, noise_offset: int = 0):
+        self.resampler = PolyphaseResampler(input_rate, 8000) if input_rate != 8000 else None
+        self.noise_mixer = None
+        if noise_level is not None:
+            self.noise_mixer = ComfortNoiseMixer(level_dbfs=noise_level, offset=noise_offset)
+
+    def transcode(self, pcm) -> np.ndarray:
+        if self.resampler:
+            pcm = self.resampler.process(pcm)
+        if self.noise_mixer:
+            pcm = self.noise_mixer.mix(pcm)
+        return pcm_to_ulaw(pcm)
+
+def _worker_main(requests, responses):
+    """Laço de um processo do pool."""
+    calls = {}
+    while True:
+        batch = [requests.get()]
+        # Lote adaptativo: junta tudo o que já estiver esperando na fila
+        while True:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+
+        replies = []
+        for request in batch:
+            if request is None:
+                for shm, _, _ in calls.values():
+                    shm.close()
+                return
+            op, call_id, request_id, *args = request
+            try:
+                if op == 'open':
+                    shm_name, input_rate, noise_level, noise_offset = args
+                    shm = shared_memory.SharedMemory(name=shm_name)
+                    calls[call_id] = (shm, _CallState(input_rate, noise_level, noise_offset), input_rate)
+                    replies.append((request_id, 0))
+                elif op == 'process':
+                    nbytes, output_offset = args
+                    shm, state, _ = calls[call_id]
+                    pcm = np.frombuffer(shm.buf, dtype=np.int16, count=nbytes // 2)
+                    ulaw = state.transcode(pcm)
+                    del pcm
+                    shm.buf[output_offset:output_offset + len(ulaw)] = ulaw.tobytes()
+                    replies.append((request_id, len(ulaw)))
+                elif op == 'close':
+                    shm, _, _ = calls.pop(call_id)
+                    shm.close()
+                    if request_id is not None:
+                        replies.append((request_id, 0))
+            except Exception as e:
+                replies.append((request_id, RuntimeError(f"{op} falhou: {e}")))
+        if replies:
+            responses.put(replies)
+
+class InlineTranscodeSession:
+    """Sessão transcodificada na própria thread de quem chama (carga baixa ou pool desligado)."""
+
+    inline = True
+
+    def __init__(self, input_rate: int, noise_level: float = None, noise_offset: int = 0):
+        self._state = _CallState(input_rate, noise_level, noise_offset)
+
+    def transcode(self, pcm) -> np.ndarray:
+        """Converte PCM 16-bit na taxa da sessão em μ-law 8 kHz."""
+        return self._state.transcode(pcm)
+
+    async def transcode_async(self, pcm) -> np.ndarray:
+        return self._state.transcode(pcm)
+
+    def close(self):
+        self._state = None
+
+class PooledTranscodeSession:
+    """Sessão presa a um processo do pool, com um bloco de memória compartilhada próprio."""
+
+    inline = False
+
+    def __init__(self, pool: 'TranscoderPool', worker: int, input_rate: int,
+                 noise_level: float = None, noise_offset: int = 0):
+        self._pool = pool
+        self._worker = worker
+        self._call_id = next(pool._ids)
+        self._input_bytes = pool.slot_bytes
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self._input_bytes + _output_capacity(self._input_bytes, input_rate)
+        )
+        self._closed = False
+        try:
+            pool._call(worker, 'open', self._call_id, self._shm.name, input_rate, noise_level, noise_offset)
+        except BaseException:
+            # Timeout ou erro: o processo pode ter aberto o bloco mesmo assim, então pede o close
+            try:
+                pool._send(worker, ('close', self._call_id, None))
+            except Exception:
+                pass
+            self._shm.close()
+            self._shm.unlink()
+            raise
+
+    def _pieces(self, pcm):
+        data = memoryview(pcm).cast('B')
+        for offset in range(0, len(data), self._input_bytes):
+            yield data[offset:offset + self._input_bytes]
+
+    def _write_input(self, piece) -> int:
+        self._shm.buf[:len(piece)] = piece
+        return len(piece)
+
+    def _read_output(self, produced: int) -> np.ndarray:
+        return np.frombuffer(self._shm.buf, dtype=np.uint8, count=produced, offset=self._input_bytes).copy()
+
+    @staticmethod
+    def _join(outputs: list) -> np.ndarray:
+        if len(outputs) == 1:
+            return outputs[0]
+        return np.concatenate(outputs) if outputs else np.empty(0, dtype=np.uint8)
+
+    def transcode(self, pcm) -> np.ndarray:
+        """Converte PCM 16-bit na taxa da sessão em μ-law 8 kHz (bloqueia até o processo responder)."""
+        outputs = []
+        for piece in self._pieces(pcm):
+            nbytes = self._write_input(piece)
+            produced = self._pool._call(self._worker, 'process', self._call_id, nbytes, self._input_bytes)
+            outputs.append(self._read_output(produced))
+        return self._join(outputs)
+
+    async def transcode_async(self, pcm) -> np.ndarray:
+        """Como `transcode`, mas espera o processo sem travar o loop (um chunk por vez por sessão)."""
+        outputs = []
+        for piece in self._pieces(pcm):
+            nbytes = self._write_input(piece)
+            produced = await self._pool._call_async(self._worker, 'process', self._call_id, nbytes, self._input_bytes)
+            outputs.append(self._read_output(produced))
+        return self._join(outputs)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._worker)
+        try:
+            self._pool._send(self._worker, ('close', self._call_id, None))
+        finally:
+            self._shm.close()
+            self._shm.unlink()
+
+class TranscoderPool:
+    """
+    Pool de processos para a transcodificação de saída do agente.
+
+    Args:
+        workers: Número de processos (0 desliga o pool: tudo inline)
+        inline_calls: Até quantas chamadas ativas novas sessões ficam inline
+        slot_bytes: Tamanho do bloco de entrada por chamada na memória compartilhada
+    """
+
+    def __init__(self, workers: int = 0, inline_calls: int = 2, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.workers = workers
+        self.inline_calls = inline_calls
+        self.slot_bytes = slot_bytes
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._started = False
+        self._processes = []
+        self._requests = []
+        self._responses = []
+        self._pending = {}
+        self._load = [0] * workers
+        self._opener = ThreadPoolExecutor(max_workers=2, thread_name_prefix='transcoder-open')
+        self.active_calls = 0
+
+    def _start(self):
+        context = multiprocessing.get_context('spawn')
+        for index in range(self.workers):
+            requests, responses = context.Queue(), context.Queue()
+            process = context.Process(target=_worker_main, args=(requests, responses),
+                                      name=f'transcoder-{index}', daemon=True)
+            process.start()
+            self._processes.append(process)
+            self._requests.append(requests)
+            self._responses.append(responses)
+            threading.Thread(target=self._collect, args=(responses,), daemon=True,
+                             name=f'transcoder-results-{index}').start()
+        self._started = True
+        atexit.register(self.shutdown)
+        log_info("🏭", f"Pool de transcodificação iniciado com {self.workers} processos")
+
+    def _collect(self, responses):
+        """Entrega as respostas de um processo a quem está esperando por elas."""
+        while True:
+            replies = responses.get()
+            if replies is None:
+                return
+            for request_id, result in replies:
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                try:
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+                except InvalidStateError:
+                    pass  # quem esperava desistiu (timeout ou cancelamento)
+
+    def _send(self, worker: int, request: tuple):
+        self._requests[worker].put(request)
+
+    def _submit(self, worker: int, op: str, call_id: int, *args):
+        request_id = next(self._ids)
+        future = Future()
+        self._pending[request_id] = future
+        self._send(worker, (op, call_id, request_id, *args))
+        return request_id, future
+
+    def _call(self, worker: int, op: str, call_id: int, *args):
+        request_id, future = self._submit(worker, op, call_id, *args)
+        try:
+            return future.result(timeout=_RESULT_TIMEOUT_S)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _call_async(self, worker: int, op: str, call_id: int, *args):
+        request_id, future = self._submit(worker, op, call_id, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), _RESULT_TIMEOUT_S)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _release(self, worker: int):
+        with self._lock:
+            self._load[worker] -= 1
+
+    def open_session(self, input_rate: int, noise_level: float = None, noise_offset: int = 0):
+        """
+        Abre a transcodificação de uma chamada.
+
+        Returns:
+            InlineTranscodeSession | PooledTranscodeSession: objeto com `transcode(pcm)` e `close()`
+        """
+        with self._lock:
+            self.active_calls += 1
+            use_pool = self.workers > 0 and self.active_calls > self.inline_calls
+            if use_pool:
+                if not self._started:
+                    self._start()
+                # Afinidade: a chamada fica no processo menos ocupado até o fim
+                worker = min(range(self.workers), key=self._load.__getitem__)
+                self._load[worker] += 1
+
+        if use_pool:
+            try:
+                return _CountedSession(self, PooledTranscodeSession(self, worker, input_rate, noise_level, noise_offset))
+            except Exception as e:
+                self._release(worker)
+                log_error("❌", f"Pool de transcodificação indisponível, usando inline: {e}")
+        return _CountedSession(self, InlineTranscodeSession(input_rate, noise_level, noise_offset))
+
+    def open_session_async(self, input_rate: int, noise_level: float = None, noise_offset: int = 0) -> Future:
+        """
+        Abre a transcodificação de uma chamada numa thread auxiliar.
+
+        Returns:
+            Future: resolve com a sessão (`result()` numa thread, `asyncio.wrap_future` no loop)
+        """
+        return self._opener.submit(self.open_session, input_rate, noise_level, noise_offset)
+
+    def _session_closed(self):
+        with self._lock:
+            self.active_calls -= 1
+
+    def shutdown(self):
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=1)
+        for responses in self._responses:
+            responses.put(None)
+        self._processes, self._requests, self._responses = [], [], []
+        self._started = False
+
+class _CountedSession:
+    """Mantém a contagem de chamadas ativas do pool em dia."""
+
+    def __init__(self, pool: TranscoderPool, session):
+        self._pool = pool
+        self._session = session
+        self.inline = session.inline
+
+    def transcode(self, pcm) -> np.ndarray:
+        return self._session.transcode(pcm)
+
+    async def transcode_async(self, pcm) -> np.ndarray:
+        return await self._session.transcode_async(pcm)
+
+    def close(self):
+        if self._session is not None:
+            session, self._session = self._session, None
+            try:
+                session.close()
+            finally:
+                self._pool._session_closed()
@@ -0,0 +1,74 @@
+"""
+Leitura rápida dos eventos recebidos do Twilio Media Streams.
+
+Quase todas as mensagens são `media`, e o Twilio as envia sempre com a mesma
+forma (`{"event":"media",...,"media":{...,"timestamp":"...","payload":"..."}}`).
+Nesse caso o payload e o timestamp são recortados direto do texto, sem montar
+o objeto inteiro; qualquer coisa fora desse padrão cai no `json.loads`.
+"""
+import json
+from typing import NamedTuple
+
+MEDIA = 'media'
+TWILIO_EVENTS = frozenset(('connected', 'start', 'media', 'mark', 'stop', 'dtmf'))
+
+_MEDIA_PREFIX = '{"event":"media"'
+_PAYLOAD_KEY = '"payload":"'
+_TIMESTAMP_KEY = '"timestamp":"'
+_MEDIA_PREFIX_LEN = len(_MEDIA_PREFIX)
+
+class MediaFrame(NamedTuple):
+    """Frame de áudio recebido: μ-law em base64 e timestamp (ms) no stream."""
+    payload: str
+    timestamp: int
+
+# Construtor de tupla direto, sem passar pelo __new__ gerado do NamedTuple
+_new_frame = tuple.__new__
+
+def _scan_media(message: str) -> MediaFrame:
+    # O Twilio manda o timestamp antes do payload; se não, procura desde o início
+    start = message.find(_TIMESTAMP_KEY, _MEDIA_PREFIX_LEN)
+    if start < 0:
+        return None
+    start += len(_TIMESTAMP_KEY)
+    end = message.find('"', start)
+    if end < 0:
+        return None
+    timestamp = message[start:end]
+
+    start = message.find(_PAYLOAD_KEY, end)
+    if start < 0:
+        start = message.find(_PAYLOAD_KEY, _MEDIA_PREFIX_LEN)
+        if start < 0:
+            return None
+    start += len(_PAYLOAD_KEY)
+    end = message.find('"', start)
+    # Valores com escape (ex.: "\/") ficam para o parser completo
+    if end < 0 or message.find('\\', start, end) >= 0 or not timestamp.isdigit():
+        return None
+    return _new_frame(MediaFrame, (message[start:end], int(timestamp)))
+
+def parse_event(message: str) -> tuple:
+    """
+    Identifica um evento do Twilio.
+
+    Args:
+        message: Texto JSON recebido no WebSocket
+
+    Returns:
+        tuple: (tipo do evento, dados). Para `media` os dados são um
+        MediaFrame; para os demais, o dict completo da mensagem.
+    """
+    if message.startswith(_MEDIA_PREFIX):
+        frame = _scan_media(message)
+        if frame is not None:
+            return MEDIA, frame
+
+    data = json.loads(message)
+    if not isinstance(data, dict):
+        return None, data
+    event = data.get('event')
+    if event == MEDIA:
+        media = data.get('media') or {}
+        return MEDIA, MediaFrame(media.get('payload', ''), int(media.get('timestamp', 0)))
+    return event, data
@@ -0,0 +1,130 @@
+import math
+import numpy as np
+from utils.g711 import ULAW_DECODE_TABLE
+
+SPEECH_STARTED = 'speech_started'
+SPEECH_STOPPED = 'speech_stopped'
+
+# Nível linear de cada código μ-law e fundo de escala do PCM 16-bit
+ULAW_LEVEL_TABLE = ULAW_DECODE_TABLE.astype(np.float32)
+_FULL_SCALE_ENERGY = 32768.0 ** 2
+
+def frame_features(ulaw_frames) -> tuple:
+    """
+    Calcula energia (dBFS) e taxa de cruzamentos por zero de um lote de frames μ-law.
+
+    Args:
+        ulaw_frames: Array uint8 com um frame (1D) ou um lote de frames (2D, um por linha)
+
+    Returns:
+        tuple: (energia em dBFS, taxa de cruzamentos por zero), arrays float com um valor por frame
+    """
+    frames = np.atleast_2d(ulaw_frames)
+    levels = ULAW_LEVEL_TABLE.take(frames, mode='clip')
+    energy = np.einsum('ij,ij->i', levels, levels) / frames.shape[1]
+    dbfs = 10 * np.log10(energy / _FULL_SCALE_ENERGY + 1e-12)
+    # O bit mais alto do código μ-law é o sinal da amostra
+    signs = frames >> 7
+    crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1)
+    zcr = crossings / max(frames.shape[1] - 1, 1)
+    return dbfs, zcr
+
+class VoiceActivityDetector:
+    """
+    Detector de voz em tempo real para o áudio μ-law do Twilio.
+
+    Um frame conta como fala quando a energia passa do limiar em dBFS e a taxa
+    de cruzamentos por zero não indica ruído (chiado tem energia espalhada e
+    muitos cruzamentos); acima do limiar + `loud_margin_db` a energia sozinha
+    basta. A fala começa após `onset_frames` frames de fala seguidos e só
+    termina depois de `hangover_s` sem fala, o que evita cortes entre sílabas.
+    """
+
+    def __init__(self, threshold_dbfs: float = -35.0, hangover_s: float = 0.5,
+                 frame_ms: int = 20, onset_frames: int = 2, max_zcr: float = 0.45,
+                 loud_margin_db: float = 10.0):
+        self.threshold_dbfs = threshold_dbfs
+        self.max_zcr = max_zcr
+        self.loud_margin_db = loud_margin_db
+        self.onset_frames = onset_frames
+        self.hangover_frames = max(1, round(hangover_s * 1000 / frame_ms))
+        self.is_speaking = False
+        self.last_dbfs = -120.0
+        self._speech_run = 0
+        self._silence_run = 0
+        self._levels = np.empty(0, dtype=np.float32)
+        self._signs = np.empty(0, dtype=np.uint8)
+        self._changes = np.empty(0, dtype=bool)
+
+    def _reserve(self, samples: int):
+        if len(self._levels) < samples:
+            self._levels = np.empty(samples, dtype=np.float32)
+            self._signs = np.empty(samples, dtype=np.uint8)
+            self._changes = np.empty(samples, dtype=bool)
+
+    def classify(self, dbfs, zcr):
+        """Decide, frame a frame, se há fala (aceita escalares ou arrays)."""
+        loud = dbfs > self.threshold_dbfs + self.loud_margin_db
+        return (dbfs > self.threshold_dbfs) & ((zcr < self.max_zcr) | loud)
+
+    def reset(self):
+        self.is_speaking = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def _advance(self, speech: bool):
+        self._speech_run = self._speech_run + 1 if speech else 0
+        # Um frame de fala isolado (ex.: chiado) não renova o hangover; só fala confirmada
+        if self._speech_run >= self.onset_frames:
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        if not self.is_speaking and self._speech_run >= self.onset_frames:
+            self.is_speaking = True
+            return SPEECH_STARTED
+        if self.is_speaking and self._silence_run >= self.hangover_frames:
+            self.is_speaking = False
+            return SPEECH_STOPPED
+        return None
+
+    def process(self, ulaw_frame):
+        """
+        Processa um frame μ-law.
+
+        Args:
+            ulaw_frame: Códigos μ-law do frame (array uint8, bytes ou memoryview)
+
+        Returns:
+            str | None: SPEECH_STARTED, SPEECH_STOPPED ou None
+        """
+        samples = ulaw_frame if isinstance(ulaw_frame, np.ndarray) else np.frombuffer(ulaw_frame, dtype=np.uint8)
+        count = len(samples)
+        if count < 2:
+            return self._advance(False)
+        self._reserve(count)
+
+        # Mesmas features de frame_features, em buffers reutilizados (caminho de 1 frame por vez)
+        levels = ULAW_LEVEL_TABLE.take(samples, out=self._levels[:count], mode='clip')
+        dbfs = 10 * math.log10(float(levels.dot(levels)) / count / _FULL_SCALE_ENERGY + 1e-12)
+        signs = np.right_shift(samples, 7, out=self._signs[:count])
+        changes = np.not_equal(signs[1:], signs[:-1], out=self._changes[:count - 1])
+        zcr = np.count_nonzero(changes) / (count - 1)
+
+        self.last_dbfs = dbfs
+        return self._advance(bool(self.classify(dbfs, zcr)))
+
+    def process_batch(self, ulaw_frames) -> list:
+        """
+        Processa um lote de frames de mesmo tamanho de uma vez.
+
+        Args:
+            ulaw_frames: Array uint8 2D, um frame por linha
+
+        Returns:
+            list: Um evento (ou None) por frame, na ordem
+        """
+        dbfs, zcr = frame_features(ulaw_frames)
+        if len(dbfs):
+            self.last_dbfs = float(dbfs[-1])
+        return [self._advance(bool(speech)) for speech in self.classify(dbfs, zcr)]
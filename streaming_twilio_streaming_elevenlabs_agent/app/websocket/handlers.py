@@ -1,17 +1,27 @@
-import json
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect
 from services.elevenlabs_service import ElevenLabsService
 from services.twilio_service import TwilioService
+from utils.speculative_sessions import SpeculativeSessionStore
+from utils.twilio_events import MEDIA, TWILIO_EVENTS, MediaFrame, parse_event
 from utils.logger import log_info, log_error
 
 class WebSocketHandler:
-    def __init__(self):
-        self.elevenlabs_service = ElevenLabsService()
-        self.twilio_service = TwilioService()
+    def __init__(self, elevenlabs_service: ElevenLabsService = None, twilio_service: TwilioService = None,
+                 speculative: SpeculativeSessionStore = None):
+        self.elevenlabs_service = elevenlabs_service or ElevenLabsService()
+        self.twilio_service = twilio_service or TwilioService()
+        self.speculative = speculative
         self.stream_sid = None
         self.twilio_interface = None
         self.conversation = None
+        self.metrics = {}
+        # Eventos raros do Twilio; `media` é tratado direto no loop de recepção
+        self._event_handlers = {
+            'start': self.handle_start_event,
+            'stop': self.handle_stop_event,
+            'mark': self.handle_mark_event,
+        }
 
     async def handle_connection(self, websocket: WebSocket):
         """Handle WebSocket connections between Twilio and ElevenLabs."""
@@ -19,20 +29,21 @@ class WebSocketHandler:
 
         try:
             async for message in websocket.iter_text():
-                data = json.loads(message)
+                event_type, data = parse_event(message)
                 
-                if not self.twilio_service.validate_event(data):
-                    log_error("❌", f"Evento inválido recebido: {data}")
+                if event_type == MEDIA:
+                    await self.handle_media_event(data)
                     continue
 
-                event_type = self.twilio_service.get_event_type(data)
-                
-                if event_type == 'start':
-                    await self.handle_start_event(websocket, data)
-                elif event_type == 'media':
-                    await self.handle_media_event(data)
-                elif event_type == 'stop':
-                    log_info("🛑", "Chamada finalizada")
+                handler = self._event_handlers.get(event_type)
+                if handler is None:
+                    # `connected` e `dtmf` são válidos, só não têm o que fazer aqui
+                    if event_type not in TWILIO_EVENTS:
+                        log_error("❌", f"Evento inválido recebido: {data}")
+                    continue
+
+                # Um handler que retorna True encerra a conexão
+                if await handler(websocket, data):
                     break
                 
         except WebSocketDisconnect:
@@ -48,10 +59,18 @@ class WebSocketHandler:
             self.stream_sid = self.twilio_service.process_start_event(data)
             log_info("📞", f"Stream iniciado: {self.stream_sid}")
             
+            # Adota a conversa aberta no webhook, se houver uma para esta chamada
+            prepared = None
+            if self.speculative:
+                prepared = await self.speculative.adopt(data['start'].get('callSid'))
+            self.metrics['speculative_session'] = prepared is not None
+
             # Inicializa conversação ElevenLabs
             self.conversation, self.twilio_interface = await self.elevenlabs_service.create_conversation(
                 websocket, 
-                self.stream_sid
+                self.stream_sid,
+                self.metrics,
+                conversation=prepared
             )
             
             # Inicia a sessão
@@ -66,14 +85,21 @@ class WebSocketHandler:
                 self.twilio_interface.stop()
             raise
 
-    async def handle_media_event(self, data: dict):
+    async def handle_stop_event(self, websocket: WebSocket, data: dict) -> bool:
+        """Processa evento de fim da stream."""
+        log_info("🛑", "Chamada finalizada")
+        return True
+
+    async def handle_mark_event(self, websocket: WebSocket, data: dict):
+        """Marcas de reprodução confirmadas pelo Twilio (não usadas por enquanto)."""
+
+    async def handle_media_event(self, frame: MediaFrame):
         """Processa evento de mídia."""
         try:
             if self.twilio_interface and self.conversation:
-                audio_payload = data['media']['payload']
                 await self.elevenlabs_service.process_audio_input(
                     self.twilio_interface, 
-                    audio_payload
+                    frame.payload
                 )
         except Exception as e:
             log_error("❌", f"Erro ao processar áudio: {e}")
@@ -1,21 +1,39 @@
 from fastapi import WebSocket
+from services.elevenlabs_service import ElevenLabsService
+from services.twilio_service import TwilioService
 from websocket.handlers import WebSocketHandler
+from websocket.sessions import SessionRegistry
+from utils.speculative_sessions import SpeculativeSessionStore
 from utils.logger import log_info, log_error
+from config import CONVAI_CLIENT, SPECULATIVE_SETUP, SPECULATIVE_TTL_S, SPECULATIVE_MAX_PENDING
 
 class WebSocketManager:
     def __init__(self):
-        self.handler = WebSocketHandler()
+        # Clientes HTTP compartilhados; o estado de cada chamada fica no seu handler
+        self.elevenlabs_service = ElevenLabsService()
+        self.twilio_service = TwilioService()
+        self.sessions = SessionRegistry()
+        # Conversas abertas no webhook, à espera do start da chamada
+        self.speculative = SpeculativeSessionStore(
+            self.elevenlabs_service.prepare_conversation,
+            ElevenLabsService.discard_conversation,
+            ttl_s=SPECULATIVE_TTL_S,
+            max_pending=SPECULATIVE_MAX_PENDING,
+            enabled=SPECULATIVE_SETUP and CONVAI_CLIENT != 'sdk'
+        )
 
     async def handle_connection(self, websocket: WebSocket):
         """
         Gerencia conexões WebSocket.
-        Delega o processamento para o handler.
+        Cada conexão recebe o seu próprio handler, registrado enquanto a chamada durar.
         """
+        handler = WebSocketHandler(self.elevenlabs_service, self.twilio_service, self.speculative)
+        session_id = self.sessions.register(handler)
         try:
             log_info("🔌", "Nova conexão WebSocket estabelecida")
             
             # Delega o processamento para o handler
-            await self.handler.handle_connection(websocket)
+            await handler.handle_connection(websocket)
             
         except Exception as e:
             log_error("💥", f"Erro ao gerenciar conexão WebSocket: {e}")
@@ -24,6 +42,8 @@ class WebSocketManager:
             except:
                 pass
             raise
+        finally:
+            self.sessions.unregister(session_id)
 
     async def cleanup(self):
         """
@@ -31,8 +51,7 @@ class WebSocketManager:
         Pode ser usado para limpeza adicional no futuro.
         """
         try:
-            # Por enquanto não há recursos específicos do manager para limpar
-            # Mas mantemos o método para extensibilidade futura
-            pass
+            # Conversas especulativas que nenhuma chamada chegou a adotar
+            await self.speculative.close()
         except Exception as e:
             log_error("🧹", f"Erro ao limpar recursos do WebSocket Manager: {e}")
\ No newline at end of file
@@ -0,0 +1,43 @@
+import time
+import uuid
+from utils.logger import log_info
+
+class SessionRegistry:
+    """Registro das chamadas ativas: cada conexão /media-stream tem o seu próprio handler."""
+
+    def __init__(self):
+        self._sessions = {}
+
+    def register(self, handler) -> str:
+        """Registra o handler de uma nova chamada e retorna o id da sessão."""
+        session_id = uuid.uuid4().hex
+        handler.started_at = time.monotonic()
+        self._sessions[session_id] = handler
+        log_info("➕", f"Sessão {session_id} registrada ({len(self._sessions)} chamadas ativas)")
+        return session_id
+
+    def unregister(self, session_id: str):
+        """Remove a sessão do registro quando a chamada termina."""
+        if self._sessions.pop(session_id, None) is not None:
+            log_info("➖", f"Sessão {session_id} removida ({len(self._sessions)} chamadas ativas)")
+
+    def get(self, session_id: str):
+        return self._sessions.get(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def snapshot(self) -> dict:
+        """Resumo das chamadas ativas para monitoramento."""
+        now = time.monotonic()
+        return {
+            "active_calls": len(self._sessions),
+            "sessions": {
+                session_id: {
+                    "stream_sid": handler.stream_sid,
+                    "duration_s": round(now - handler.started_at, 1),
+                    **handler.metrics,
+                }
+                for session_id, handler in self._sessions.items()
+            },
+        }
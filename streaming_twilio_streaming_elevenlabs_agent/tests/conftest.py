@@ -0,0 +1,12 @@
+"""
+Os testes importam os módulos como o app faz (`from utils.g711 import ...`),
+a partir da pasta `app/`. Rode o pytest a partir da pasta deste projeto.
+"""
+import os
+import sys
+from pathlib import Path
+
+for name in ('ELEVENLABS_API_KEY', 'ELEVENLABS_AGENT_ID', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'):
+    os.environ.setdefault(name, 'test')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'app'))
@@ -0,0 +1,74 @@
+"""Ruído de conforto: mixer contínuo entre chunks e custo do caminho de saída com e sem ruído."""
+import base64
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from utils.audio_utils import convert_elevenlabs_to_ulaw
+from utils.comfort_noise import ComfortNoiseMixer
+from utils.g711 import pcm_to_ulaw, ulaw2lin
+from utils.resampler import PolyphaseResampler
+
+CHUNK_MS = 250
+RATE = 16000
+
+def speech_like(samples: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) / RATE
+    signal = 6000 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 800, samples)
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+def legacy_convert(audio_data: bytes, sample_rate: int, resampler: PolyphaseResampler) -> str:
+    """O caminho de saída anterior: gerava e reamostrava um ruído que era jogado fora."""
+    audio = AudioSegment(data=audio_data, sample_width=2, frame_rate=sample_rate, channels=1)
+    samples = int((len(audio) / 1000.0) * 8000)
+    noise = np.random.normal(0, 0.1, samples)
+    noise_base64 = base64.b64encode(pcm_to_ulaw((noise * 32767).astype(np.int16)).tobytes()).decode('utf-8')
+    noise_pcm = ulaw2lin(base64.b64decode(noise_base64))
+    AudioSegment(data=noise_pcm, sample_width=2, frame_rate=8000, channels=1).set_frame_rate(sample_rate)
+    return base64.b64encode(pcm_to_ulaw(resampler.process(audio_data))).decode('utf-8')
+
+def test_mixer_is_continuous_across_chunks():
+    pcm = np.frombuffer(speech_like(RATE * 3), dtype=np.int16)
+    whole = ComfortNoiseMixer(level_dbfs=-50, offset=123).mix(pcm).copy()
+    chunked_mixer = ComfortNoiseMixer(level_dbfs=-50, offset=123)
+    chunked = np.concatenate([chunked_mixer.mix(pcm[start:start + 777]).copy() for start in range(0, len(pcm), 777)])
+    assert np.array_equal(whole, chunked)
+
+def test_mixer_level_and_saturation():
+    silence = np.zeros(16000, dtype=np.int16)
+    noise = ComfortNoiseMixer(level_dbfs=-50).mix(silence).astype(np.float64)
+    level_dbfs = 20 * np.log10(np.sqrt(np.mean(noise ** 2)) / 32768.0)
+    assert abs(level_dbfs + 50) < 1
+
+    loud = np.full(16000, 32767, dtype=np.int16)
+    assert ComfortNoiseMixer(level_dbfs=-10).mix(loud).max() == 32767
+
+def test_output_path_cost():
+    """Custo por chunk de 250 ms a 16 kHz: antes, sem ruído e com ruído (rode com -s para ver)."""
+    chunks = [speech_like(RATE * CHUNK_MS // 1000, seed) for seed in range(40)]
+    rounds = 5
+
+    def per_chunk_us(convert) -> tuple:
+        outputs = []
+        best = float('inf')
+        for _ in range(rounds):
+            outputs = []
+            started = time.process_time()
+            for chunk in chunks:
+                outputs.append(convert(chunk))
+            best = min(best, time.process_time() - started)
+        return best / len(chunks) * 1e6, outputs
+
+    legacy_resampler, disabled_resampler, mixed_resampler = (PolyphaseResampler(RATE, 8000) for _ in range(3))
+    mixer = ComfortNoiseMixer(level_dbfs=-50)
+    legacy_us, legacy_out = per_chunk_us(lambda chunk: legacy_convert(chunk, RATE, legacy_resampler))
+    disabled_us, disabled_out = per_chunk_us(lambda chunk: convert_elevenlabs_to_ulaw(chunk, RATE, disabled_resampler))
+    mixed_us, _ = per_chunk_us(lambda chunk: convert_elevenlabs_to_ulaw(chunk, RATE, mixed_resampler, mixer))
+
+    print(f"\npor chunk de {CHUNK_MS} ms: antes {legacy_us:.0f} µs, sem ruído {disabled_us:.0f} µs, "
+          f"com ruído {mixed_us:.0f} µs")
+    # Sem ruído, a saída é a mesma de antes e o trabalho descartado sumiu
+    assert disabled_out == legacy_out
+    assert disabled_us < legacy_us
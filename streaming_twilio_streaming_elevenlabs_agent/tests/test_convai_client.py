@@ -0,0 +1,181 @@
+"""
+Cliente ConvAI assíncrono contra o Conversation do SDK: threads e memória por chamada.
+
+Um servidor ConvAI falso roda localmente numa thread própria: responde à
+iniciação e manda 250 ms de áudio do agente a cada 250 ms. Cada chamada manda
+um frame do Twilio a cada 20 ms. Cada cliente é medido num processo novo, para
+que a memória liberada por um não entre na conta do outro. Para repetir a
+medição do commit, rode com CONVAI_BENCH_CALLS=300 e -s.
+"""
+import asyncio
+import base64
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import websockets
+
+from services.convai_client import AsyncConversation
+from services.elevenlabs_service import ElevenLabsService, NegotiatingConversation
+
+CALLS = int(os.getenv("CONVAI_BENCH_CALLS", "20"))
+SECONDS = float(os.getenv("CONVAI_BENCH_SECONDS", "2"))
+AGENT_AUDIO = base64.b64encode(bytes(8000)).decode()  # 250 ms em pcm_16000
+TWILIO_FRAME = base64.b64encode(b'\xff' * 160).decode()
+
+async def fake_convai(ws):
+    await ws.recv()
+    await ws.send(json.dumps({"type": "conversation_initiation_metadata", "conversation_initiation_metadata_event": {
+        "conversation_id": "conv_1", "agent_output_audio_format": "pcm_16000", "user_input_audio_format": "pcm_16000",
+    }}))
+
+    async def talk():
+        event_id = 0
+        while True:
+            event_id += 1
+            await ws.send(json.dumps({"type": "audio", "audio_event": {"event_id": event_id, "audio_base_64": AGENT_AUDIO}}))
+            if event_id % 20 == 0:
+                await ws.send(json.dumps({"type": "ping", "ping_event": {"event_id": event_id, "ping_ms": 10}}))
+            await asyncio.sleep(0.25)
+
+    talker = asyncio.create_task(talk())
+    try:
+        async for _ in ws:
+            pass
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        talker.cancel()
+
+@pytest.fixture(scope="module")
+def server_url():
+    """Sobe o servidor falso numa thread com loop próprio (o SDK conecta de forma síncrona)."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        async with websockets.serve(fake_convai, "127.0.0.1", 0, max_size=None, backlog=1000) as server:
+            state['url'] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            state['stop'] = loop.create_future()
+            ready.set()
+            await state['stop']
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait(5)
+    yield state['url']
+    loop.call_soon_threadsafe(state['stop'].set_result, None)
+    thread.join(5)
+
+def point_clients_at(url: str, patch=setattr):
+    """Faz os dois clientes conectarem direto no servidor falso, sem URL assinada."""
+    async def ws_url(self):
+        return url
+
+    patch(AsyncConversation, '_get_ws_url', ws_url)
+    patch(NegotiatingConversation, '_get_wss_url', lambda self: url)
+
+@pytest.fixture
+def local_agent(server_url, monkeypatch):
+    point_clients_at(server_url, monkeypatch.setattr)
+
+class TwilioSocket:
+    def __init__(self):
+        self.media = 0
+
+    async def send_text(self, message: str):
+        self.media += '"media"' in message
+
+# Executores compartilhados pelo processo todo: o padrão do loop (resolução de
+# nome na conexão) e o que abre as sessões do pool de transcodificação
+SHARED_EXECUTORS = ('asyncio_', 'transcoder-open')
+
+def call_threads() -> int:
+    """Threads vivas, sem contar os executores compartilhados."""
+    return sum(not thread.name.startswith(SHARED_EXECUTORS) for thread in threading.enumerate())
+
+def rss_kb() -> int:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS'):
+                return int(line.split()[1])
+    return 0
+
+async def run_calls(convai_client: str, calls: int, seconds: float) -> dict:
+    service = ElevenLabsService(convai_client)
+    gc.collect()
+    base_threads, base_rss = call_threads(), rss_kb()
+    sessions = []
+    for index in range(calls):
+        socket = TwilioSocket()
+        conversation, interface = await service.create_conversation(socket, f"MZ{index}", {})
+        conversation.requires_auth = False
+        await service.start_conversation(conversation, interface)
+        sessions.append((socket, conversation, interface))
+
+    async def feed(interface):
+        while True:
+            await interface.process_input(TWILIO_FRAME)
+            await asyncio.sleep(0.02)
+
+    feeders = [asyncio.create_task(feed(interface)) for _, _, interface in sessions]
+    max_lag = 0.0
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        tick = time.monotonic()
+        await asyncio.sleep(0.1)
+        max_lag = max(max_lag, time.monotonic() - tick - 0.1)
+    gc.collect()
+    result = {
+        'threads': call_threads() - base_threads,
+        'rss_kb_per_call': (rss_kb() - base_rss) / calls,
+        'max_lag_ms': max_lag * 1000,
+        'calls_with_audio': sum(socket.media > 0 for socket, _, _ in sessions),
+    }
+    for feeder in feeders:
+        feeder.cancel()
+    for _, conversation, interface in sessions:
+        await service.end_conversation(conversation, interface)
+    return result
+
+def test_async_client_plays_agent_audio(local_agent):
+    result = asyncio.run(run_calls('async', 1, 0.6))
+    assert result['calls_with_audio'] == 1
+    assert result['threads'] == 0
+
+def measure_in_subprocess(convai_client: str, url: str) -> dict:
+    app_dir = Path(__file__).resolve().parent.parent / 'app'
+    completed = subprocess.run(
+        [sys.executable, __file__, convai_client, url],
+        env={**os.environ, 'PYTHONPATH': str(app_dir)}, capture_output=True, text=True, timeout=SECONDS + CALLS + 60,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def test_threads_and_memory_per_call(server_url):
+    """Threads e RSS com CALLS chamadas simultâneas em cada cliente (rode com -s para ver)."""
+    results = {client: measure_in_subprocess(client, server_url) for client in ('async', 'sdk')}
+    print()
+    for client, result in results.items():
+        print(f"{client:>5}: {CALLS} chamadas, +{result['threads']} threads, "
+              f"+{result['rss_kb_per_call']:.0f} KB de RSS por chamada, "
+              f"lag máximo do loop {result['max_lag_ms']:.0f} ms")
+    # O cliente assíncrono não abre threads; o SDK abre ao menos duas por chamada
+    assert results['async']['threads'] == 0
+    assert results['sdk']['threads'] >= 2 * CALLS
+    assert results['async']['calls_with_audio'] == CALLS
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.CRITICAL)
+    point_clients_at(sys.argv[2])
+    measured = asyncio.run(run_calls(sys.argv[1], CALLS, SECONDS))
+    print(json.dumps(measured), flush=True)
+    os._exit(0)  # não espera as threads do SDK que ainda estão fechando
@@ -0,0 +1,65 @@
+"""Packetizer de saída: frames exatos de 20 ms, posições para o truncamento e custo por fator de agrupamento."""
+import base64
+import time
+
+import numpy as np
+
+from utils.g711 import ULAW_SILENCE
+from utils.message_encoder import twilio_encoder
+from utils.packetizer import FRAME_BYTES, FRAME_MS, UlawPacketizer
+
+def ulaw_stream(seconds: float) -> bytes:
+    return np.random.default_rng(0).integers(0, 256, size=int(8000 * seconds), dtype=np.uint8).tobytes()
+
+def packetize(ulaw: bytes, chunk: int, frames_per_message: int = 1) -> list:
+    packetizer = UlawPacketizer(frames_per_message)
+    packets = []
+    for offset in range(0, len(ulaw), chunk):
+        packets += packetizer.feed(ulaw[offset:offset + chunk])
+    return packets + packetizer.flush()
+
+def test_frames_are_exactly_20_ms_at_any_cut():
+    ulaw = ulaw_stream(1.013)
+    for chunk in (1, 100, 160, 333, 800, len(ulaw)):
+        packets = packetize(ulaw, chunk)
+        assert all(len(base64.b64decode(packet.payload)) == FRAME_BYTES for packet in packets)
+        audio = b''.join(base64.b64decode(packet.payload) for packet in packets)
+        # O último frame é completado com silêncio
+        assert audio[:len(ulaw)] == ulaw
+        assert set(audio[len(ulaw):]) == {ULAW_SILENCE}
+        assert len(audio) % FRAME_BYTES == 0
+
+def test_coalesced_packets_carry_their_positions():
+    packets = packetize(ulaw_stream(1.0), 500, frames_per_message=4)
+    assert [packet.frame_count for packet in packets] == [4] * 12 + [2]
+    assert [packet.first_frame for packet in packets] == list(range(0, 50, 4))
+    assert packets[1].start_ms == 4 * FRAME_MS
+    assert packets[-1].end_ms == 1000
+
+def test_reset_drops_the_pending_tail_but_keeps_the_count():
+    packetizer = UlawPacketizer()
+    packetizer.feed(b'\x00' * 250)
+    assert packetizer.pending_bytes == 90
+    packetizer.reset()
+    assert packetizer.flush() == []
+    assert packetizer.feed(b'\x00' * 160)[0].first_frame == 1
+
+def test_messages_and_cpu_per_coalescing_factor():
+    """Mensagens por segundo de áudio e CPU por segundo de áudio (rode com -s para ver)."""
+    seconds = 60
+    ulaw = ulaw_stream(seconds)
+    encoder = twilio_encoder('MZ00000000000000000000000000000000')
+    results = {}
+    for frames_per_message in (1, 2, 5, 10):
+        best = float('inf')
+        for _ in range(3):
+            started = time.process_time()
+            messages = [encoder.media(packet.payload) for packet in packetize(ulaw, 800, frames_per_message)]
+            best = min(best, time.process_time() - started)
+        results[frames_per_message] = (len(messages) / seconds, best / seconds * 1e6)
+
+    print()
+    for frames_per_message, (per_second, cpu_us) in results.items():
+        print(f"N={frames_per_message:>2}: {per_second:4.0f} msg/s, {cpu_us:5.0f} µs de CPU por segundo de áudio")
+    assert [round(per_second) for per_second, _ in results.values()] == [50, 25, 10, 5]
+    assert results[10][1] < results[1][1]
@@ -0,0 +1,62 @@
+"""
+Módulos copiados entre os apps: cada cópia tem que bater com a de referência.
+
+Cada app roda a partir da própria pasta `app/` e não há pacote comum, então
+alguns módulos existem em mais de um lugar. As únicas diferenças aceitas são
+as do app: o pacote de onde se importa (`utils` ou `services`) e o log
+(`utils.logger` com emoji ou `logging`). Ao mudar um módulo, mude as cópias.
+"""
+import re
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+AGENT = 'streaming_twilio_streaming_elevenlabs_agent/app/utils'
+OPENIA = 'streaming_twilio_openia_agent/app/services'
+TEXT_UTILS = 'streaming_twilio_streaming_elevenlabs_openia_text/app/utils'
+TEXT_SERVICES = 'streaming_twilio_streaming_elevenlabs_openia_text/app/services'
+
+# Módulo: referência primeiro, depois as cópias
+COPIES = {
+    'g711.py': ['g711.py', f'{AGENT}/g711.py', f'{OPENIA}/g711.py', f'{TEXT_UTILS}/g711.py'],
+    'message_encoder.py': [f'{AGENT}/message_encoder.py', f'{TEXT_UTILS}/message_encoder.py',
+                           f'{OPENIA}/message_encoder.py'],
+    'packetizer.py': [f'{AGENT}/packetizer.py', f'{TEXT_UTILS}/packetizer.py', f'{OPENIA}/packetizer.py'],
+    'realtime_pool.py': [f'{OPENIA}/realtime_pool.py', f'{TEXT_SERVICES}/realtime_pool.py'],
+    'resampler.py': [f'{AGENT}/resampler.py', f'{OPENIA}/resampler.py'],
+    'sessions.py': [f'{app}/app/websocket/sessions.py' for app in (
+        'streaming_twilio_streaming_elevenlabs_agent', 'streaming_twilio_streaming_elevenlabs_openia_text',
+        'streaming_twilio_openia_agent')],
+    'speculative_sessions.py': [f'{AGENT}/speculative_sessions.py', f'{TEXT_UTILS}/speculative_sessions.py',
+                                f'{OPENIA}/speculative_sessions.py'],
+    'twilio_events.py': [f'{AGENT}/twilio_events.py', f'{TEXT_UTILS}/twilio_events.py', f'{OPENIA}/twilio_events.py'],
+    'uplink_queue.py': [f'{OPENIA}/uplink_queue.py', f'{TEXT_UTILS}/uplink_queue.py'],
+}
+
+_LOGGING_SETUP = ('import logging', 'logger = logging.getLogger(__name__)')
+
+def canonical(path: str) -> list:
+    """Linhas do módulo sem o que muda de um app para outro (e sem linhas em branco)."""
+    lines = []
+    for line in (ROOT / path).read_text(encoding='utf-8').splitlines():
+        if line.strip() in _LOGGING_SETUP or line.startswith('from utils.logger import'):
+            continue
+        line = re.sub(r'^from (utils|services)\.', 'from app.', line)
+        line = re.sub(r'\blog_(info|error|debug)\("[^"]*", ', 'log(', line)
+        line = re.sub(r'\blogger\.(info|warning|error|debug)\(', 'log(', line)
+        if line.strip():
+            lines.append(line)
+    return lines
+
+@pytest.mark.parametrize('module', sorted(COPIES))
+def test_copies_match_the_reference(module):
+    reference, *copies = COPIES[module]
+    expected = canonical(reference)
+    for copy in copies:
+        assert canonical(copy) == expected, f"{copy} divergiu de {reference}"
+
+@pytest.mark.parametrize('module', sorted(COPIES))
+def test_every_copy_is_listed(module):
+    found = {str(path.relative_to(ROOT)) for path in ROOT.rglob(module) if '__pycache__' not in path.parts}
+    assert found == set(COPIES[module])
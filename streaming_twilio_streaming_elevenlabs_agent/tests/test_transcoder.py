@@ -0,0 +1,110 @@
+"""Pool de transcodificação: mesma saída do inline, sem vazar memória compartilhada e capacidade em chamadas."""
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from utils.transcoder import InlineTranscodeSession, TranscoderPool
+
+RATE = 48000
+CHUNK_SAMPLES = RATE // 4  # 250 ms, como os chunks do agente
+
+def speech_like(seconds: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(RATE * seconds)) / RATE
+    return np.clip(6000 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 800, len(t)), -32768, 32767).astype(np.int16)
+
+def transcode_in_chunks(session, pcm: np.ndarray) -> bytes:
+    return b''.join(session.transcode(pcm[start:start + CHUNK_SAMPLES]).tobytes()
+                    for start in range(0, len(pcm), CHUNK_SAMPLES))
+
+@pytest.fixture
+def pool():
+    pool = TranscoderPool(workers=1, inline_calls=0)
+    yield pool
+    pool.shutdown()
+
+def test_pooled_output_matches_inline(pool):
+    pcm = speech_like(2.0, 0)
+    expected = transcode_in_chunks(InlineTranscodeSession(RATE), pcm)
+    session = pool.open_session(RATE)
+    try:
+        assert not session.inline
+        assert transcode_in_chunks(session, pcm) == expected
+        # Um chunk maior que o bloco compartilhado é dividido em pedaços do bloco e volta inteiro
+        big = speech_like(3.0, 1)
+        reference = InlineTranscodeSession(RATE)
+        reference.transcode(pcm)
+        slot_samples = pool.slot_bytes // 2
+        expected_big = b''.join(reference.transcode(big[start:start + slot_samples]).tobytes()
+                                for start in range(0, len(big), slot_samples))
+        assert session.transcode(big).tobytes() == expected_big
+    finally:
+        session.close()
+
+def test_failed_open_releases_the_shared_memory(pool, monkeypatch):
+    created = []
+    real_shared_memory = shared_memory.SharedMemory
+
+    def tracking_shared_memory(*args, **kwargs):
+        shm = real_shared_memory(*args, **kwargs)
+        if kwargs.get('create'):
+            created.append(shm.name)
+        return shm
+
+    def open_times_out(worker, op, call_id, *args):
+        raise TimeoutError(f"{op} sem resposta")
+
+    pool._start()
+    monkeypatch.setattr(shared_memory, 'SharedMemory', tracking_shared_memory)
+    monkeypatch.setattr(pool, '_call', open_times_out)
+    session = pool.open_session(RATE)
+    try:
+        # Sem o pool a chamada segue inline, e o bloco criado para ela não fica para trás
+        assert session.inline
+        assert len(created) == 1
+        with pytest.raises(FileNotFoundError):
+            real_shared_memory(name=created[0])
+        assert pool._load == [0]
+    finally:
+        session.close()
+
+def sustained_calls(open_session, calls: int, seconds: float) -> float:
+    """Chamadas em tempo real sustentadas: segundos de áudio convertidos por segundo de relógio."""
+    sessions = [open_session() for _ in range(calls)]
+    pcm = speech_like(seconds, 2)
+
+    def run(session):
+        transcode_in_chunks(session, pcm)
+
+    threads = [threading.Thread(target=run, args=(session,)) for session in sessions]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for session in sessions:
+        session.close()
+    return calls * seconds / elapsed
+
+def test_capacity_inline_vs_pool():
+    """
+    Capacidade com uma thread por chamada (como o SDK): inline disputa o GIL,
+    o pool usa um processo por núcleo. Rode com -s para ver os números desta máquina.
+    """
+    cores = os.cpu_count() or 1
+    calls = 4 * cores
+    inline = sustained_calls(lambda: InlineTranscodeSession(RATE), calls, 4.0)
+    pool = TranscoderPool(workers=cores, inline_calls=0)
+    try:
+        pool.open_session(RATE).close()  # sobe os processos fora da medição
+        pooled = sustained_calls(lambda: pool.open_session(RATE), calls, 4.0)
+    finally:
+        pool.shutdown()
+    print(f"\n{cores} núcleo(s), {calls} chamadas pcm_{RATE}: inline sustenta {inline:.0f} chamadas "
+          f"em tempo real, pool com {cores} processo(s) {pooled:.0f}")
+    assert inline > calls and pooled > calls
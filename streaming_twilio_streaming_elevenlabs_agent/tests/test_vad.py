@@ -0,0 +1,120 @@
+"""
+Detector de voz contra um corpus sintético rotulado.
+
+O corpus alterna falas (vogais com harmônicos, vibrato e envelope de
+sílabas, de -28 a -18 dBFS) com trechos sem fala: silêncio digital, chiado
+branco de -60 a -30 dBFS, zumbido de rede e ruído grave. Cada frame de
+20 ms tem o rótulo do trecho de onde veio.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from utils.g711 import pcm_to_ulaw
+from utils.vad import SPEECH_STARTED, SPEECH_STOPPED, VoiceActivityDetector, frame_features
+
+RATE = 8000
+FRAME = 160
+
+def _at_level(signal: np.ndarray, dbfs: float) -> np.ndarray:
+    return signal * (32768 * 10 ** (dbfs / 20) / np.sqrt(np.mean(signal ** 2)))
+
+def _times(seconds: float) -> np.ndarray:
+    return np.arange(int(RATE * seconds)) / RATE
+
+def vowel(rng, seconds: float, dbfs: float, f0: float) -> np.ndarray:
+    t = _times(seconds)
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))) / RATE
+    harmonics = sum(
+        np.sin(k * phase) / k * (1.5 if 500 < k * f0 < 900 or 1100 < k * f0 < 1600 else 1)
+        for k in range(1, int(3400 // f0))
+    )
+    syllables = 0.55 + 0.45 * np.abs(np.sin(2 * np.pi * 2 * t + rng.uniform(0, 3)))
+    return _at_level(harmonics * syllables, dbfs)
+
+def hiss(rng, seconds: float, dbfs: float) -> np.ndarray:
+    return _at_level(rng.standard_normal(int(RATE * seconds)), dbfs)
+
+def mains_hum(rng, seconds: float, dbfs: float) -> np.ndarray:
+    t = _times(seconds)
+    return _at_level(np.sin(2 * np.pi * 60 * t) + 0.5 * np.sin(2 * np.pi * 120 * t) + 0.05 * rng.standard_normal(len(t)), dbfs)
+
+def rumble(rng, seconds: float, dbfs: float) -> np.ndarray:
+    walk = np.cumsum(rng.standard_normal(int(RATE * seconds)))
+    return _at_level(walk - np.convolve(walk, np.ones(200) / 200, 'same'), dbfs)
+
+@pytest.fixture(scope='module')
+def corpus():
+    """Frames μ-law (2D), rótulo por frame e intervalos [início, fim) das falas, em frames."""
+    rng = np.random.default_rng(7)
+    segments = [
+        (False, np.zeros(RATE)),
+        (False, hiss(rng, 1, -60)),
+        (True, vowel(rng, 1.2, -20, 120)),
+        (False, hiss(rng, 1, -45)),
+        (True, vowel(rng, 0.8, -25, 210)),
+        (False, hiss(rng, 1.5, -30)),
+        (True, vowel(rng, 1.5, -18, 100)),
+        (False, mains_hum(rng, 1, -45)),
+        (True, vowel(rng, 0.6, -28, 180)),
+        (False, rumble(rng, 1, -42)),
+        (True, vowel(rng, 2, -22, 150)),
+        (False, np.zeros(RATE)),
+    ]
+    labels, utterances, position = [], [], 0
+    for speech, signal in segments:
+        count = len(signal) // FRAME
+        labels.append(np.full(count, speech))
+        if speech:
+            utterances.append((position, position + count))
+        position += count
+
+    pcm = np.clip(np.rint(np.concatenate([signal for _, signal in segments])), -32768, 32767).astype(np.int16)
+    frames = pcm_to_ulaw(pcm)[:position * FRAME].reshape(position, FRAME)
+    return frames, np.concatenate(labels), utterances
+
+def test_frame_precision_and_recall(corpus):
+    frames, labels, _ = corpus
+    detector = VoiceActivityDetector()
+    predicted = detector.classify(*frame_features(frames))
+
+    true_positives = np.count_nonzero(predicted & labels)
+    precision = true_positives / np.count_nonzero(predicted)
+    recall = true_positives / np.count_nonzero(labels)
+    print(f"\nframes: precisão {precision:.3f}, recall {recall:.3f}")
+    assert precision >= 0.95
+    assert recall >= 0.95
+
+def test_one_start_and_stop_per_utterance(corpus):
+    frames, _, utterances = corpus
+    detector = VoiceActivityDetector()
+    events = [(index, event) for index, event in enumerate(map(detector.process, frames)) if event]
+
+    starts = [index for index, event in events if event == SPEECH_STARTED]
+    stops = [index for index, event in events if event == SPEECH_STOPPED]
+    assert len(starts) == len(stops) == len(utterances)
+    for start, stop, (begin, end) in zip(starts, stops, utterances):
+        # Começo confirmado em onset_frames; fim depois do hangover, sem esticar no ruído
+        assert begin <= start < begin + detector.onset_frames + 1
+        assert end + detector.hangover_frames - 1 <= stop < end + 2 * detector.hangover_frames
+
+def test_batch_matches_frame_by_frame(corpus):
+    frames, _, _ = corpus
+    single = VoiceActivityDetector()
+    batched = VoiceActivityDetector()
+    expected = [single.process(frame) for frame in frames]
+    got = []
+    for start in range(0, len(frames), 5):
+        got.extend(batched.process_batch(frames[start:start + 5]))
+    assert got == expected
+
+def test_cpu_per_frame(corpus):
+    frames, _, _ = corpus
+    detector = VoiceActivityDetector()
+    started = time.perf_counter()
+    for frame in frames:
+        detector.process(frame)
+    per_frame_us = (time.perf_counter() - started) / len(frames) * 1e6
+    print(f"\nCPU por frame de 20 ms: {per_frame_us:.1f} µs")
+    assert per_frame_us < 200
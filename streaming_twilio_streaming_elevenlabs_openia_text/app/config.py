@@ -12,6 +12,78 @@ SYSTEM_MESSAGE = PROMPT
 VOICE = 'alloy'
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
 
+# Formatos de saída pedidos ao ElevenLabs, em ordem de preferência.
+# ulaw_8000 já é o formato do Twilio e vai direto, sem transcodificação;
+# os demais são decodificados e convertidos para μ-law 8 kHz.
+ELEVENLABS_OUTPUT_FORMATS = ["ulaw_8000", "mp3_44100_128"]
+TELEPHONY_OUTPUT_FORMATS = {"ulaw_8000"}
+
+# Frames de 20 ms por mensagem de mídia enviada ao Twilio (1 = um frame por mensagem)
+TWILIO_FRAMES_PER_MESSAGE = int(os.getenv("TWILIO_FRAMES_PER_MESSAGE", 1))
+
+# Chamadas ao SDK do ElevenLabs rodam fora do loop: sínteses simultâneas por
+# processo e chunks guardados por síntese enquanto o envio ao Twilio não os consome
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", 8))
+TTS_QUEUE_DEPTH = int(os.getenv("TTS_QUEUE_DEPTH", 32))
+# Quanto a thread espera por vaga na fila antes de desistir (consumidor que
+# abandonou o streaming sem aclose); passado isso, a síntese é interrompida
+TTS_PUT_TIMEOUT_S = float(os.getenv("TTS_PUT_TIMEOUT_S", 30))
+
+# Síntese incremental: a resposta é cortada em frases/orações conforme o texto
+# chega e cada trecho é sintetizado sem esperar o fim da resposta. Tamanho mínimo
+# para cortar numa vírgula (primeiro trecho e demais) e máximo sem pontuação
+INCREMENTAL_TTS = os.getenv("INCREMENTAL_TTS", "true").lower() == "true"
+TTS_SEGMENT_FIRST_MIN_CHARS = int(os.getenv("TTS_SEGMENT_FIRST_MIN_CHARS", 20))
+TTS_SEGMENT_MIN_CHARS = int(os.getenv("TTS_SEGMENT_MIN_CHARS", 60))
+TTS_SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", 200))
+# Trechos da mesma resposta sintetizados ao mesmo tempo por chamada (o áudio
+# continua saindo em ordem). Deve caber no limite de requisições simultâneas do plano
+TTS_SEGMENT_CONCURRENCY = int(os.getenv("TTS_SEGMENT_CONCURRENCY", 2))
+
+# Cache do μ-law sintetizado para frases curtas repetidas: limite em memória
+# (0 desliga), diretório opcional em disco, tamanho máximo da frase e se as
+# frases entre aspas do prompt são sintetizadas na subida da aplicação
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "")
+TTS_CACHE_MAX_PHRASE_CHARS = int(os.getenv("TTS_CACHE_MAX_PHRASE_CHARS", 40))
+TTS_CACHE_WARMUP = os.getenv("TTS_CACHE_WARMUP", "true").lower() == "true"
+
+# Saudações tocadas no start do stream, renderizadas na subida com a voz das
+# respostas (separadas por "|"; uma é sorteada por chamada). Vazio desliga e
+# o /incoming-call volta a usar o <Say> do TwiML
+GREETINGS = [text for text in os.getenv(
+    "GREETINGS", "Olá! Aqui é o assistente virtual. Como posso te ajudar?"
+).split("|") if text.strip()]
+
+# Interjeições tocadas quando a resposta demora mais que FILLER_DEADLINE_MS
+# depois do fim da fala do cliente (separadas por "|"; no máximo uma por
+# turno). Saem do cache de áudio, aquecido com elas na subida: precisam caber
+# em TTS_CACHE_MAX_PHRASE_CHARS. Vazio desliga
+FILLERS = [text.strip() for text in os.getenv("FILLERS", "Ok|Certo|Hum, deixa eu ver").split("|") if text.strip()]
+FILLER_DEADLINE_MS = int(os.getenv("FILLER_DEADLINE_MS", 800))
+
+# Fila entre a leitura do Twilio e o envio à OpenAI: tamanho (frames de 20 ms),
+# política quando enche (block, drop_oldest, drop_silence) e idade máxima de um frame
+UPLINK_QUEUE_SIZE = int(os.getenv("UPLINK_QUEUE_SIZE", 50))
+UPLINK_QUEUE_POLICY = os.getenv("UPLINK_QUEUE_POLICY", "drop_silence")
+UPLINK_MAX_AGE_MS = int(os.getenv("UPLINK_MAX_AGE_MS", 1000))
+
+# Sockets Realtime pré-aquecidos: mínimo/máximo prontos (máximo 0 desliga o pool)
+# e quanto tempo um socket pode ficar parado antes de ser fechado
+REALTIME_POOL_MIN = int(os.getenv("REALTIME_POOL_MIN", 1))
+REALTIME_POOL_MAX = int(os.getenv("REALTIME_POOL_MAX", 8))
+REALTIME_POOL_IDLE_S = float(os.getenv("REALTIME_POOL_IDLE_S", 120))
+
+# Sessão especulativa: o socket Realtime é separado no webhook /incoming-call,
+# pelo CallSid, e adotado no evento start do stream
+SPECULATIVE_SETUP = os.getenv("SPECULATIVE_SETUP", "true").lower() == "true"
+SPECULATIVE_TTL_S = float(os.getenv("SPECULATIVE_TTL_S", 15))
+SPECULATIVE_MAX_PENDING = int(os.getenv("SPECULATIVE_MAX_PENDING", 50))
+
+# Confere o X-Twilio-Signature do /incoming-call. Sem ele os webhooks não são
+# autenticados e nenhuma sessão especulativa é aberta
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+
 LOG_EVENT_TYPES = [
     'error', 'response.content.done', 'rate_limits.updated',
     'response.done', 'input_audio_buffer.committed',
@@ -1,19 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from routes import call_routes
 from websocket.manager import WebSocketManager
-from config import PORT, OPENAI_API_KEY
+from services.elevenlabs_service import ElevenLabsService, audio_cache
+from utils.audio_cache import phrases_from_prompt
+from config import PORT, OPENAI_API_KEY, TTS_CACHE_WARMUP, FILLERS
+from prompt import PROMPT
 
 # Verificação da chave API
 if not OPENAI_API_KEY:
     raise ValueError('Missing the OpenAI API key. Please set it in the .env file.')
 
-app = FastAPI()
+# WebSocket manager
+ws_manager = WebSocketManager()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Aquece o pool Realtime, as saudações e o cache de áudio na subida e fecha os sockets na parada."""
+    ws_manager.realtime_pool.start()
+    ws_manager.greetings.start()
+    warmup = None
+    # As interjeições só tocam do cache: são aquecidas mesmo sem TTS_CACHE_WARMUP
+    phrases = list(FILLERS)
+    if TTS_CACHE_WARMUP:
+        phrases += [phrase for phrase in phrases_from_prompt(PROMPT, audio_cache.max_phrase_chars) if phrase not in phrases]
+    if phrases and audio_cache.enabled:
+        # Em segundo plano: a aplicação atende enquanto as frases são sintetizadas
+        warmup = asyncio.create_task(ElevenLabsService.warm_cache(phrases))
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    await ws_manager.greetings.stop()
+    await ws_manager.speculative.close()
+    await ws_manager.realtime_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
+# O webhook /incoming-call prepara a sessão pelo manager
+app.state.ws_manager = ws_manager
 
 # Rotas
 app.include_router(call_routes.router)
 
-# WebSocket manager
-ws_manager = WebSocketManager()
+@app.get("/sessions")
+async def active_sessions():
+    """Retorna o número de chamadas ativas e o estado de cada uma."""
+    return {**ws_manager.sessions.snapshot(), "realtime_pool": ws_manager.realtime_pool.snapshot(),
+            "speculative": ws_manager.speculative.snapshot(), "tts_cache": audio_cache.snapshot(),
+            "greetings": ws_manager.greetings.snapshot()}
 
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from twilio.twiml.voice_response import VoiceResponse, Connect
+from utils.speculative_sessions import call_sid_from_request, is_twilio_request
+from config import TWILIO_AUTH_TOKEN
 
 router = APIRouter()
 
@@ -12,11 +14,20 @@ async def index_page():
 @router.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(request: Request):
     """Handle incoming call and return TwiML response to connect to Media Stream."""
+    if TWILIO_AUTH_TOKEN and not await is_twilio_request(request, TWILIO_AUTH_TOKEN):
+        return Response(status_code=403)
+    # A sessão com a OpenAI começa já, enquanto o Twilio toca o TwiML
+    ws_manager = getattr(request.app.state, 'ws_manager', None)
+    if ws_manager:
+        ws_manager.speculative.prepare(await call_sid_from_request(request))
+
     response = VoiceResponse()
-    # <Say> punctuation to improve text-to-speech flow
-    response.say("Please wait while we connect your call to the A. I. voice assistant, powered by Twilio and the Open-A.I. Realtime API")
-    response.pause(length=1)
-    response.say("O.K. you can start talking!")
+    # Com saudação pronta o agente fala no start do stream; sem ela, o aviso do TwiML
+    if not (ws_manager and ws_manager.greetings.ready):
+        # <Say> punctuation to improve text-to-speech flow
+        response.say("Please wait while we connect your call to the A. I. voice assistant, powered by Twilio and the Open-A.I. Realtime API")
+        response.pause(length=1)
+        response.say("O.K. you can start talking!")
     host = request.url.hostname
     connect = Connect()
     # Configuração ajustada para melhor qualidade de áudio
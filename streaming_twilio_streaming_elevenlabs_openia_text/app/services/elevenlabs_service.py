@@ -1,84 +1,233 @@
 import asyncio
+import base64
 from elevenlabs import ElevenLabs
 from elevenlabs.client import ElevenLabs
+from elevenlabs.core.api_error import ApiError
 import os
-from config import logger, log_info, log_error, ELEVENLABS_VOICE_ID
+from config import (
+    logger, log_info, log_error, log_debug,
+    ELEVENLABS_VOICE_ID, ELEVENLABS_OUTPUT_FORMATS, TELEPHONY_OUTPUT_FORMATS,
+    TWILIO_FRAMES_PER_MESSAGE, TTS_CACHE_MAX_BYTES, TTS_CACHE_DIR, TTS_CACHE_MAX_PHRASE_CHARS
+)
+from utils.audio_cache import AudioCache
 from utils.audio_utils import convert_mp3_bytes_to_g711ulaw_base64
+from utils.mp3_stream import StreamingMp3Decoder
+from utils.packetizer import UlawPacketizer
+from utils.message_encoder import twilio_encoder
+from services.tts_client import tts_client, TTSStream
 
 # Configuração do ElevenLabs
 elevenlabs = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
 
+# Respostas HTTP que indicam formato de saída não disponível para a conta
+_FORMAT_REJECTED_STATUS = {400, 403, 422}
+
+# Modelo e ajustes de voz do streaming (fazem parte da chave do cache de áudio)
+TTS_MODEL_ID = "eleven_multilingual_v2"
+STREAM_VOICE_SETTINGS = {
+    "stability": 0.71,  # Aumentado para mais estabilidade
+    "similarity_boost": 0.75,  # Aumentado para melhor qualidade
+    "style": 0.65,
+    "use_speaker_boost": True
+}
+
+# μ-law pronto para envio das frases curtas já sintetizadas
+audio_cache = AudioCache(TTS_CACHE_MAX_BYTES, TTS_CACHE_DIR, TTS_CACHE_MAX_PHRASE_CHARS)
+
+class _DiscardSink:
+    """Destino das mensagens de mídia de uma síntese que só alimenta o cache."""
+
+    async def send_text(self, message: str):
+        pass
+
 class ElevenLabsService:
+    # Formatos recusados pela conta/plano, para não pedi-los de novo a cada resposta
+    _unsupported_formats = set()
+
+    @staticmethod
+    def output_format_preferences() -> list:
+        """Formatos de saída ainda candidatos, em ordem de preferência."""
+        return [fmt for fmt in ELEVENLABS_OUTPUT_FORMATS if fmt not in ElevenLabsService._unsupported_formats]
+
     @staticmethod
-    async def stream_audio_to_twilio(texto, websocket, stream_sid, voz_escolhida=ELEVENLABS_VOICE_ID):
-        """Stream audio directly from ElevenLabs to Twilio using real streaming"""
+    async def stream_audio_to_twilio(texto, websocket, stream_sid, voz_escolhida=ELEVENLABS_VOICE_ID,
+                                     previous_text=None) -> str:
+        """
+        Stream audio directly from ElevenLabs to Twilio using real streaming.
+
+        Args:
+            previous_text: Texto da resposta antes deste trecho, para manter a entonação
+                quando a resposta é sintetizada em partes
+
+        Returns:
+            str: Caminho de áudio usado: "cache" quando a frase já estava sintetizada,
+            "passthrough" quando o ElevenLabs já entrega μ-law 8 kHz,
+            "transcode:<formato>" quando foi preciso decodificar, ou "fallback"
+        """
+        # Com previous_text a entonação segue o texto anterior: não é o áudio da frase isolada
+        cache_key = None if previous_text else audio_cache.key(texto, voz_escolhida, TTS_MODEL_ID, STREAM_VOICE_SETTINGS)
+        if cache_key:
+            ulaw_audio = await audio_cache.get(cache_key)
+            if ulaw_audio is not None:
+                log_info("⚡", f"Áudio em cache para '{texto}'")
+                await ElevenLabsService.send_ulaw(ulaw_audio, websocket, stream_sid)
+                return "cache"
+        recording = bytearray() if cache_key else None
+        audio_path = await ElevenLabsService._synthesize(texto, websocket, stream_sid, voz_escolhida, previous_text, recording)
+        # Só o streaming completo vai para o cache (o fallback usa outros ajustes de voz)
+        if recording and audio_path != "fallback":
+            await audio_cache.put(cache_key, bytes(recording))
+        return audio_path
+
+    @staticmethod
+    async def _synthesize(texto, websocket, stream_sid, voz_escolhida, previous_text,
+                          recording: bytearray = None, fallback: bool = True) -> str:
+        """
+        Sintetiza e envia o áudio pelo streaming do ElevenLabs.
+
+        Args:
+            recording: Se dado, recebe uma cópia do μ-law enviado
+            fallback: Sem ele, um erro no streaming é relançado em vez de cair no método tradicional
+        """
         try:
             log_info("🎵", "Iniciando streaming real de áudio com ElevenLabs...")
-            
-            audio_stream = elevenlabs.text_to_speech.stream(
-                text=texto,
-                voice_id=voz_escolhida,
-                model_id="eleven_multilingual_v2",
-                voice_settings={
-                    "stability": 0.71,  # Aumentado para mais estabilidade
-                    "similarity_boost": 0.75,  # Aumentado para melhor qualidade
-                    "style": 0.65,
-                    "use_speaker_boost": True
-                },
-                optimize_streaming_latency=2,  # Reduzido para 2 (era 3)
-                output_format="mp3_44100_128"
-            )
-            
-            buffer_chunks = []
-            chunk_size = 0
-            target_chunk_size = 16384  # Aumentado o tamanho do buffer (era 8192)
-            
-            for chunk in audio_stream:
-                if isinstance(chunk, bytes):
-                    buffer_chunks.append(chunk)
-                    chunk_size += len(chunk)
-                    
-                    # Envia quando atingir o tamanho alvo ou acumular chunks suficientes
-                    if chunk_size >= target_chunk_size:
-                        combined_chunk = b''.join(buffer_chunks)
-                        audio_payload = convert_mp3_bytes_to_g711ulaw_base64(combined_chunk)
-                        
-                        await websocket.send_json({
-                            "event": "media",
-                            "streamSid": stream_sid,
-                            "media": {"payload": audio_payload}
-                        })
-                        
-                        # Adiciona um pequeno delay para sincronização
-                        await asyncio.sleep(0.02)  # 20ms de delay para suavizar a transição
-                        
-                        buffer_chunks = []
-                        chunk_size = 0
-            
-            # Envia os chunks restantes
-            if buffer_chunks:
-                combined_chunk = b''.join(buffer_chunks)
-                audio_payload = convert_mp3_bytes_to_g711ulaw_base64(combined_chunk)
-                await websocket.send_json({
-                    "event": "media",
-                    "streamSid": stream_sid,
-                    "media": {"payload": audio_payload}
-                })
-            
-            log_info("✅", "Streaming real de áudio concluído!")
+
+            for output_format in ElevenLabsService.output_format_preferences():
+                # O SDK é síncrono: o streaming é lido em uma thread e chega aqui por uma fila
+                audio_stream = tts_client.stream(
+                    lambda fmt=output_format: ElevenLabsService._open_stream(texto, voz_escolhida, fmt, previous_text)
+                )
+                try:
+                    try:
+                        # A requisição HTTP só acontece no primeiro chunk
+                        first_chunk = await anext(audio_stream, b'')
+                    except ApiError as e:
+                        if e.status_code not in _FORMAT_REJECTED_STATUS:
+                            raise
+                        log_error("⚠️", f"Formato {output_format} recusado pelo ElevenLabs ({e.status_code}), tentando o próximo")
+                        ElevenLabsService._unsupported_formats.add(output_format)
+                        continue
+
+                    if output_format in TELEPHONY_OUTPUT_FORMATS:
+                        await ElevenLabsService._relay_passthrough(first_chunk, audio_stream, websocket, stream_sid, recording)
+                        audio_path = "passthrough"
+                    else:
+                        await ElevenLabsService._relay_transcoded(first_chunk, audio_stream, websocket, stream_sid, recording)
+                        audio_path = f"transcode:{output_format}"
+                finally:
+                    await audio_stream.aclose()
+
+                log_info("✅", f"Streaming real de áudio concluído! ({audio_path})")
+                return audio_path
+
+            raise ValueError("Nenhum formato de saída aceito pelo ElevenLabs")
             
         except Exception as e:
             log_error("💥", f"Erro no streaming real de áudio: {e}")
-            await ElevenLabsService.fallback_audio_generation(texto, websocket, stream_sid, voz_escolhida)
+            if not fallback:
+                raise
+            await ElevenLabsService.fallback_audio_generation(texto, websocket, stream_sid, voz_escolhida, previous_text)
+            return "fallback"
+
+    @staticmethod
+    def _context_options(previous_text) -> dict:
+        """Contexto de entonação para o ElevenLabs (só enviado quando existe)."""
+        return {"previous_text": previous_text} if previous_text else {}
+
+    @staticmethod
+    def _open_stream(texto, voz_escolhida, output_format, previous_text=None):
+        """
+        Abre o streaming de TTS do ElevenLabs no formato pedido.
+
+        Usa a resposta crua do SDK para que o TTSStream alcance a conexão
+        HTTP e possa derrubá-la quando a fala é cancelada.
+        """
+        return elevenlabs.text_to_speech.with_raw_response.stream(
+            text=texto,
+            voice_id=voz_escolhida,
+            model_id=TTS_MODEL_ID,
+            voice_settings=STREAM_VOICE_SETTINGS,
+            optimize_streaming_latency=2,  # Reduzido para 2 (era 3)
+            output_format=output_format,
+            **ElevenLabsService._context_options(previous_text)
+        )
+
+    @staticmethod
+    async def _send_packets(packets, websocket, stream_sid):
+        """Envia ao Twilio as mensagens de mídia montadas pelo packetizer."""
+        messages = twilio_encoder(stream_sid)
+        for packet in packets:
+            await websocket.send_text(messages.media(packet.payload))
+
+    @staticmethod
+    async def send_ulaw(ulaw_audio, websocket, stream_sid):
+        """Envia ao Twilio um áudio μ-law completo, em frames de 20 ms."""
+        packetizer = UlawPacketizer(TWILIO_FRAMES_PER_MESSAGE)
+        packets = packetizer.feed(ulaw_audio) + packetizer.flush()
+        await ElevenLabsService._send_packets(packets, websocket, stream_sid)
 
     @staticmethod
-    async def fallback_audio_generation(texto, websocket, stream_sid, voz_escolhida=ELEVENLABS_VOICE_ID):
+    async def _chain_stream(first_chunk, audio_stream: TTSStream):
+        """Devolve o primeiro chunk (já lido) e depois o resto do streaming."""
+        yield first_chunk
+        async for chunk in audio_stream:
+            yield chunk
+
+    @staticmethod
+    async def _relay_passthrough(first_chunk, audio_stream: TTSStream, websocket, stream_sid, recording=None):
+        """Repassa ao Twilio o μ-law 8 kHz do ElevenLabs sem decodificar nada."""
+        packetizer = UlawPacketizer(TWILIO_FRAMES_PER_MESSAGE)
+        async for chunk in ElevenLabsService._chain_stream(first_chunk, audio_stream):
+            if isinstance(chunk, bytes) and chunk:
+                if recording is not None:
+                    recording += chunk
+                await ElevenLabsService._send_packets(packetizer.feed(chunk), websocket, stream_sid)
+        await ElevenLabsService._send_packets(packetizer.flush(), websocket, stream_sid)
+
+    @staticmethod
+    async def _relay_transcoded(first_chunk, audio_stream: TTSStream, websocket, stream_sid, recording=None):
+        """Decodifica o MP3 do ElevenLabs para μ-law 8 kHz enquanto ele chega."""
+        # Um decodificador por resposta: os chunks MP3 chegam cortados em posições
+        # arbitrárias e são decodificados frame a frame, sem um ffmpeg por chunk
+        decoder = StreamingMp3Decoder()
+        await decoder.start()
+        relay_task = asyncio.create_task(
+            ElevenLabsService._relay_decoded_audio(decoder, websocket, stream_sid, recording)
+        )
+        decoder.watch(relay_task)
+        try:
+            async for chunk in ElevenLabsService._chain_stream(first_chunk, audio_stream):
+                if isinstance(chunk, bytes):
+                    await decoder.feed(chunk)
+            await decoder.finish()
+            await relay_task
+        finally:
+            relay_task.cancel()
+            await decoder.close()
+
+        log_debug("🎚️", f"{decoder.frames_fed} frames MP3 decodificados ({decoder.bytes_decoded // 2} amostras)")
+
+    @staticmethod
+    async def _relay_decoded_audio(decoder: StreamingMp3Decoder, websocket, stream_sid, recording=None):
+        """Envia ao Twilio o áudio μ-law assim que o decodificador o produz."""
+        packetizer = UlawPacketizer(TWILIO_FRAMES_PER_MESSAGE)
+        async for ulaw_audio in decoder.frames():
+            if recording is not None:
+                recording += ulaw_audio
+            await ElevenLabsService._send_packets(packetizer.feed(ulaw_audio), websocket, stream_sid)
+        await ElevenLabsService._send_packets(packetizer.flush(), websocket, stream_sid)
+
+    @staticmethod
+    async def fallback_audio_generation(texto, websocket, stream_sid, voz_escolhida=ELEVENLABS_VOICE_ID,
+                                        previous_text=None):
         """Fallback method using traditional ElevenLabs generation"""
         try:
             log_info("🔄", "Usando método tradicional de geração de áudio...")
             
-            # Gera o áudio com ElevenLabs usando a nova API
-            audio_bytes = elevenlabs.text_to_speech.convert(
+            output_format = next(iter(ElevenLabsService.output_format_preferences()), "mp3_44100_128")
+
+            # Gera o áudio com ElevenLabs usando a nova API (chamada bloqueante, fora do loop)
+            audio_bytes = await tts_client.run(lambda: b''.join(elevenlabs.text_to_speech.convert(
                 text=texto,
                 voice_id=voz_escolhida,
                 model_id="eleven_multilingual_v2",
@@ -87,24 +236,64 @@ class ElevenLabsService:
                     "similarity_boost": 0.65,
                     "style": 0.65,
                     "use_speaker_boost": True
-                }
-            )
-
-            # Converte MP3 para G711 μ-law base64
-            audio_payload = convert_mp3_bytes_to_g711ulaw_base64(audio_bytes)
-
-            # Envia áudio para o Twilio
-            await websocket.send_json({
-                "event": "media",
-                "streamSid": stream_sid,
-                "media": {"payload": audio_payload}
-            })
+                },
+                output_format=output_format,
+                **ElevenLabsService._context_options(previous_text)
+            )))
+
+            # μ-law 8 kHz vai direto; os demais formatos são convertidos para G711 μ-law
+            if output_format in TELEPHONY_OUTPUT_FORMATS:
+                ulaw_audio = audio_bytes
+            else:
+                ulaw_audio = base64.b64decode(await tts_client.run(convert_mp3_bytes_to_g711ulaw_base64, audio_bytes))
+
+            # Envia áudio para o Twilio em frames de 20 ms
+            await ElevenLabsService.send_ulaw(ulaw_audio, websocket, stream_sid)
             
             log_info("✅", "Áudio enviado com sucesso (método tradicional)!")
             
         except Exception as e:
             log_error("💥", f"Erro no fallback de áudio: {e}")
 
+    @staticmethod
+    def cached_ulaw(texto, voz_escolhida=ELEVENLABS_VOICE_ID):
+        """μ-law já sintetizado para o texto, se estiver no cache em memória (sem sintetizar)."""
+        cache_key = audio_cache.key(texto, voz_escolhida, TTS_MODEL_ID, STREAM_VOICE_SETTINGS)
+        return audio_cache.peek(cache_key) if cache_key else None
+
+    @staticmethod
+    async def render_ulaw(texto, voz_escolhida=ELEVENLABS_VOICE_ID) -> bytes:
+        """
+        Sintetiza o texto inteiro e devolve o μ-law 8 kHz em vez de enviá-lo ao Twilio.
+
+        Usado para o áudio preparado de antemão (cache, saudações): sem o
+        fallback, um erro chega a quem chamou, que decide se tenta de novo.
+        """
+        recording = bytearray()
+        await ElevenLabsService._synthesize(texto, _DiscardSink(), None, voz_escolhida, None, recording, fallback=False)
+        return bytes(recording)
+
+    @staticmethod
+    async def warm_cache(phrases, voz_escolhida=ELEVENLABS_VOICE_ID) -> int:
+        """
+        Sintetiza de antemão as frases que ainda não estão no cache.
+
+        Returns:
+            int: Frases sintetizadas agora (as já guardadas em disco não contam)
+        """
+        rendered = 0
+        for phrase in phrases:
+            cache_key = audio_cache.key(phrase, voz_escolhida, TTS_MODEL_ID, STREAM_VOICE_SETTINGS)
+            if cache_key is None or audio_cache.contains(cache_key):
+                continue
+            try:
+                await audio_cache.put(cache_key, await ElevenLabsService.render_ulaw(phrase, voz_escolhida))
+            except Exception:
+                continue  # o erro já foi registrado em _synthesize
+            rendered += 1
+        log_info("🔥", f"Cache de áudio aquecido: {len(phrases)} frases, {rendered} sintetizadas")
+        return rendered
+
     @staticmethod
     def gerar_audio_com_elevenlabs(texto, voz_escolhida=ELEVENLABS_VOICE_ID):
         """Função legada mantida para compatibilidade (usando nova API)"""
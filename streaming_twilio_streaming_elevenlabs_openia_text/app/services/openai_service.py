@@ -1,8 +1,8 @@
-import json
 from config import (
     logger, log_info, log_debug, 
     VOICE, SYSTEM_MESSAGE
 )
+from utils import message_encoder
 
 class OpenAIService:
     @staticmethod
@@ -16,7 +16,9 @@ class OpenAIService:
                     "type": "server_vad",
                     "threshold": 0.6,  # Aumenta threshold para reduzir falsos positivos
                     "prefix_padding_ms": 300,  # Padding antes da fala
-                    "silence_duration_ms": 500  # Tempo de silêncio para detectar fim da fala
+                    "silence_duration_ms": 500,  # Tempo de silêncio para detectar fim da fala
+                    # Quem interrompe a resposta é o handler, depois do debounce (ruído curto não corta)
+                    "interrupt_response": False
                 },
                 "input_audio_format": "g711_ulaw",
                 "output_audio_format": "g711_ulaw",
@@ -27,8 +29,9 @@ class OpenAIService:
                 "model": "gpt-4o",
             }
         }
-        log_debug("📋", f"Configuração da sessão: {json.dumps(session_update)}")
-        await openai_ws.send(json.dumps(session_update))
+        session_message = message_encoder.dumps(session_update)
+        log_debug("📋", f"Configuração da sessão: {session_message}")
+        await openai_ws.send(session_message)
 
     @staticmethod
     async def send_initial_conversation_item(openai_ws):
@@ -47,26 +50,34 @@ class OpenAIService:
                 ]
             }
         }
-        await openai_ws.send(json.dumps(initial_conversation_item))
-        await openai_ws.send(json.dumps({"type": "response.create"}))
+        await openai_ws.send(message_encoder.dumps(initial_conversation_item))
+        await openai_ws.send(message_encoder.RESPONSE_CREATE)
         log_info("✅", "Mensagem inicial enviada")
 
+    @staticmethod
+    async def send_greeting_item(openai_ws, text: str):
+        """Record the greeting already played to the caller as the assistant's first turn."""
+        greeting_item = {
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}]
+            }
+        }
+        await openai_ws.send(message_encoder.dumps(greeting_item))
+
+    @staticmethod
+    async def send_response_cancel(openai_ws):
+        """Cancel the response OpenAI is still generating."""
+        await openai_ws.send(message_encoder.RESPONSE_CANCEL)
+
     @staticmethod
     async def send_truncate_event(openai_ws, item_id, elapsed_time):
         """Send truncate event to OpenAI."""
-        truncate_event = {
-            "type": "conversation.item.truncate",
-            "item_id": item_id,
-            "content_index": 0,
-            "audio_end_ms": elapsed_time
-        }
-        await openai_ws.send(json.dumps(truncate_event))
+        await openai_ws.send(message_encoder.truncate(item_id, elapsed_time))
 
     @staticmethod
     async def send_audio_append(openai_ws, audio_payload):
         """Send audio append event to OpenAI."""
-        audio_append = {
-            "type": "input_audio_buffer.append",
-            "audio": audio_payload
-        }
-        await openai_ws.send(json.dumps(audio_append))
\ No newline at end of file
+        await openai_ws.send(message_encoder.audio_append(audio_payload))
\ No newline at end of file
@@ -0,0 +1,131 @@
+import asyncio
+from config import TTS_SEGMENT_CONCURRENCY
+from services.elevenlabs_service import ElevenLabsService
+from utils.logger import log_error
+
+_END = object()
+
+class SegmentAudio:
+    """
+    Mensagens de mídia de um trecho, guardadas até chegar a vez dele.
+
+    Faz o papel do WebSocket do Twilio para `stream_audio_to_twilio`: a
+    síntese escreve aqui enquanto o ElevenLabs responde e o envio lê na
+    ordem dos trechos, sem esperar a síntese do trecho terminar.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.audio_path = None
+        self._messages = asyncio.Queue()
+
+    async def send_text(self, message: str):
+        self._messages.put_nowait(message)
+
+    def close(self):
+        self._messages.put_nowait(_END)
+
+    async def messages(self):
+        while True:
+            message = await self._messages.get()
+            if message is _END:
+                return
+            yield message
+
+class SpeechPipeline:
+    """
+    Síntese de uma resposta trecho a trecho, enquanto o LLM ainda gera o texto.
+
+    Cada trecho que entra por `say` começa a ser sintetizado assim que houver
+    vaga (até `concurrency` sínteses simultâneas por chamada, para respeitar o
+    limite de requisições do ElevenLabs). Uma task envia ao Twilio o áudio dos
+    trechos na ordem do texto: o trecho da vez sai conforme é sintetizado e os
+    seguintes ficam guardados até ele terminar.
+
+    Args:
+        websocket: WebSocket do Twilio
+        stream_sid: Stream da chamada
+        concurrency: Sínteses simultâneas (1 = uma de cada vez)
+        on_first_audio: Coroutine aguardada uma vez, antes do primeiro áudio ir ao Twilio
+        after: Task da resposta anterior, que termina de tocar antes desta começar
+    """
+
+    def __init__(self, websocket, stream_sid, concurrency: int = TTS_SEGMENT_CONCURRENCY,
+                 on_first_audio=None, after=None):
+        self.websocket = websocket
+        self.stream_sid = stream_sid
+        self.on_first_audio = on_first_audio
+        self.after = after
+        self.audio_paths = []
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._segments = asyncio.Queue()
+        self._spoken = ''
+        self._synthesis = set()
+        self._task = asyncio.create_task(self._play())
+
+    def say(self, segment: str):
+        """Enfileira um trecho da resposta e dispara a síntese dele."""
+        audio = SegmentAudio(segment)
+        # O texto anterior vai junto para a entonação não recomeçar a cada trecho
+        task = asyncio.create_task(self._synthesize(audio, self._spoken))
+        self._synthesis.add(task)
+        task.add_done_callback(self._synthesis.discard)
+        self._spoken = f"{self._spoken} {segment}" if self._spoken else segment
+        self._segments.put_nowait(audio)
+
+    async def _synthesize(self, audio: SegmentAudio, previous_text: str):
+        # O semáforo atende por ordem de chegada: o trecho da vez nunca espera um posterior
+        async with self._slots:
+            try:
+                audio.audio_path = await ElevenLabsService.stream_audio_to_twilio(
+                    audio.text, audio, self.stream_sid, previous_text=previous_text
+                )
+            except Exception as e:
+                log_error("💥", f"Erro ao sintetizar trecho da resposta: {e}")
+            finally:
+                audio.close()
+
+    async def _play(self):
+        if self.after is not None:
+            # wait (e não gather): cancelar esta resposta não cancela a anterior
+            await asyncio.wait({self.after})
+        while True:
+            audio = await self._segments.get()
+            if audio is _END:
+                return
+            async for message in audio.messages():
+                if self.on_first_audio is not None:
+                    on_first_audio, self.on_first_audio = self.on_first_audio, None
+                    await on_first_audio()
+                await self.websocket.send_text(message)
+            if audio.audio_path:
+                self.audio_paths.append(audio.audio_path)
+
+    async def finish(self) -> list:
+        """
+        Espera todos os trechos enfileirados serem enviados.
+
+        Returns:
+            list: Caminho de áudio de cada trecho (ver `stream_audio_to_twilio`)
+        """
+        self._segments.put_nowait(_END)
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            # Quem esperava foi cancelado (interrupção): as sínteses param junto
+            await self.cancel()
+            raise
+        return self.audio_paths
+
+    async def cancel(self):
+        """
+        Descarta os trechos pendentes e interrompe as sínteses em curso.
+
+        Cada síntese cancelada fecha o seu streaming do ElevenLabs (a conexão
+        HTTP cai na hora e a thread volta ao pool) e as mensagens de mídia já
+        sintetizadas mas ainda não enviadas são descartadas.
+        """
+        tasks = [self._task, *self._synthesis]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
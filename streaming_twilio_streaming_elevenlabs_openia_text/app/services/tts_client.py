@@ -0,0 +1,160 @@
+import asyncio
+import socket
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from config import TTS_MAX_WORKERS, TTS_QUEUE_DEPTH, TTS_PUT_TIMEOUT_S
+
+_END = object()
+# Intervalo em que a thread, esperando vaga na fila, confere se ainda há quem consuma
+_PUT_POLL_S = 0.25
+
+def _shutdown_connection(response):
+    """
+    Derruba o socket de uma resposta HTTP do SDK que ainda está sendo lida.
+
+    Fechar a resposta não acorda a thread parada no `recv` (e não é seguro
+    fazê-lo de outra thread); o `shutdown` do socket sim: a leitura termina
+    com erro e a thread fecha a resposta ao sair do `with`.
+    """
+    http_response = getattr(response, '_response', None)
+    if http_response is None:
+        return
+    network_stream = http_response.extensions.get('network_stream')
+    sock = network_stream.get_extra_info('socket') if network_stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+class TTSStream:
+    """
+    Iterador assíncrono sobre um gerador síncrono do SDK do ElevenLabs.
+
+    O gerador roda em uma thread do executor e entrega os chunks em uma fila
+    limitada: se quem consome atrasa, a thread espera (e deixa de ler a
+    rede) sem ocupar o loop. Erros do SDK, inclusive o ApiError da primeira
+    leitura, são relançados em quem itera.
+
+    `aclose` derruba a conexão em andamento: a thread volta ao pool na hora
+    em vez de ficar presa no iterador HTTP até o próximo chunk chegar. Sem
+    `aclose` (loop fechado, consumidor que parou de iterar), a thread desiste
+    da fila depois de `put_timeout_s` sem vaga.
+    """
+
+    def __init__(self, client: 'AsyncTTSClient', open_stream):
+        self._client = client
+        self._open_stream = open_stream
+        self._queue = asyncio.Queue(maxsize=client.queue_depth)
+        self._loop = None
+        self._worker = None
+        self._response = None
+        self._closed = False
+        self._abandoned = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._worker is None:
+            self._loop = asyncio.get_running_loop()
+            self._worker = self._loop.run_in_executor(self._client.executor, self._produce)
+        if self._abandoned and self._queue.empty():
+            # A thread desistiu com a fila cheia: o que restava já foi entregue
+            raise TimeoutError("síntese interrompida: a fila ficou cheia por tempo demais")
+        item = await self._queue.get()
+        if item is _END:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _put(self, item) -> bool:
+        """
+        Entrega um item ao loop, esperando vaga na fila (roda na thread do executor).
+
+        Returns:
+            bool: False se o streaming foi fechado ou ninguém mais consome; a thread deve parar
+        """
+        if self._closed or self._loop.is_closed():
+            return False
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        except RuntimeError:  # o loop fechou entre a conferência e o envio
+            return False
+        deadline = time.monotonic() + self._client.put_timeout_s
+        while True:
+            try:
+                future.result(timeout=_PUT_POLL_S)
+                return not self._closed
+            except FutureTimeoutError:
+                if not (self._closed or self._loop.is_closed() or time.monotonic() >= deadline):
+                    continue
+            except CancelledError:  # o loop cancelou a entrega ao encerrar
+                pass
+            self._closed = self._abandoned = True
+            try:
+                future.cancel()
+            except RuntimeError:
+                pass
+            return False
+
+    def _produce(self):
+        try:
+            with self._open_stream() as response:
+                self._response = response
+                # aclose pode ter vindo antes da resposta existir
+                if not self._closed:
+                    for chunk in response.data:
+                        if not self._put(chunk):
+                            break
+            self._put(_END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._response = None
+
+    async def aclose(self):
+        """Para a leitura: derruba a conexão, liberando a thread, e descarta a fila."""
+        self._closed = True
+        if self._worker is not None and not self._worker.done():
+            _shutdown_connection(self._response)
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+class AsyncTTSClient:
+    """
+    Ponte entre o SDK síncrono do ElevenLabs e o loop de eventos.
+
+    Leituras de rede do SDK rodam em um pool de threads limitado
+    (`max_workers` sínteses simultâneas por processo); o loop só recebe
+    os chunks prontos.
+    """
+
+    def __init__(self, max_workers: int = TTS_MAX_WORKERS, queue_depth: int = TTS_QUEUE_DEPTH,
+                 put_timeout_s: float = TTS_PUT_TIMEOUT_S):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts')
+        self.queue_depth = queue_depth
+        self.put_timeout_s = put_timeout_s
+
+    def stream(self, open_stream) -> TTSStream:
+        """
+        Itera de forma assíncrona um streaming do SDK.
+
+        Args:
+            open_stream: Função sem argumentos que abre o streaming (chamada na thread),
+                devolvendo o context manager de `with_raw_response.stream` do SDK
+        """
+        return TTSStream(self, open_stream)
+
+    async def run(self, func, *args, **kwargs):
+        """Executa uma chamada bloqueante do SDK no pool, sem travar o loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+tts_client = AsyncTTSClient()
@@ -1,38 +1,25 @@
 from fastapi import WebSocket
 from config import logger, log_debug
+from utils.message_encoder import twilio_encoder
 
 class TwilioService:
     @staticmethod
     async def send_media_event(websocket: WebSocket, stream_sid: str, audio_payload: str):
         """Send media event to Twilio."""
-        await websocket.send_json({
-            "event": "media",
-            "streamSid": stream_sid,
-            "media": {
-                "payload": audio_payload
-            }
-        })
+        await websocket.send_text(twilio_encoder(stream_sid).media(audio_payload))
 
     @staticmethod
-    async def send_mark(connection: WebSocket, stream_sid: str, mark_queue: list):
+    async def send_mark(connection: WebSocket, stream_sid: str, mark_queue: list, name: str = 'responsePart'):
         """Send mark event for synchronization."""
         if stream_sid:
-            mark_event = {
-                "event": "mark",
-                "streamSid": stream_sid,
-                "mark": {"name": "responsePart"}
-            }
-            await connection.send_json(mark_event)
-            mark_queue.append('responsePart')
+            await connection.send_text(twilio_encoder(stream_sid).mark(name))
+            mark_queue.append(name)
             log_debug("📍", "Mark enviado")
 
     @staticmethod
     async def send_clear_event(websocket: WebSocket, stream_sid: str):
         """Send clear event to Twilio."""
-        await websocket.send_json({
-            "event": "clear",
-            "streamSid": stream_sid
-        })
+        await websocket.send_text(twilio_encoder(stream_sid).clear)
 
     @staticmethod
     def process_media_timestamp(data: dict) -> int:
@@ -0,0 +1,166 @@
+"""
+Cache do áudio sintetizado para frases curtas que se repetem.
+
+O prompt pede expressões fixas ("Entendi", "Claro", "Beleza"...) e cada uma
+era sintetizada e transcodificada de novo a cada turno. O cache guarda o
+μ-law 8 kHz pronto para o Twilio, com chave no texto normalizado, na voz,
+no modelo e nos ajustes de voz: um acerto não chama o ElevenLabs.
+
+A memória é um LRU limitado em bytes. Opcionalmente as entradas também vão
+para um diretório (um arquivo por chave), que sobrevive a reinícios e serve
+de segundo nível quando a memória não tem a frase.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from utils.logger import log_error
+
+_SPACES = re.compile(r'\s+')
+# Pontuação final que não muda a fala de uma frase curta ("?" muda, fica na chave)
+_TRAILING = '.!…,;: '
+_QUOTED = re.compile(r'"([^"\n]+)"')
+
+def normalize_phrase(text: str) -> str:
+    """Texto da frase na forma usada na chave ("Entendi!" e " entendi." são a mesma frase)."""
+    text = unicodedata.normalize('NFC', text)
+    return _SPACES.sub(' ', text).strip().rstrip(_TRAILING).casefold()
+
+def phrases_from_prompt(prompt: str, max_chars: int) -> list:
+    """Frases entre aspas no prompt, sem repetição, que cabem no cache."""
+    phrases = []
+    for phrase in _QUOTED.findall(prompt):
+        phrase = phrase.strip()
+        if phrase and len(phrase) <= max_chars and phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+class AudioCache:
+    """
+    Áudio μ-law por frase, voz e ajustes de síntese.
+
+    Args:
+        max_bytes: Limite do LRU em memória (0 desliga o cache)
+        disk_dir: Diretório do nível em disco (vazio desliga)
+        max_phrase_chars: Frases maiores não são guardadas
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = '', max_phrase_chars: int = 40):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_phrase_chars = max_phrase_chars
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if self.enabled and disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, text: str, voice_id: str, model_id: str, voice_settings: dict):
+        """
+        Chave da frase para a voz e os ajustes dados.
+
+        Returns:
+            str: Chave, ou None se a frase não vai para o cache
+        """
+        if not self.enabled:
+            return None
+        phrase = normalize_phrase(text)
+        if not phrase or len(phrase) > self.max_phrase_chars:
+            return None
+        identity = json.dumps([phrase, voice_id, model_id, voice_settings], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.ulaw")
+
+    def _remember(self, key: str, ulaw: bytes) -> bool:
+        if len(ulaw) > self.max_bytes:
+            return False
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = ulaw
+        self._bytes += len(ulaw)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.stats['evictions'] += 1
+        return True
+
+    def _read(self, key: str):
+        try:
+            with open(self._path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, ulaw: bytes):
+        # Escreve num temporário e renomeia: outro processo nunca lê um arquivo pela metade
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(ulaw)
+        os.replace(temporary, path)
+
+    async def get(self, key: str):
+        """
+        Áudio guardado para a chave.
+
+        Returns:
+            bytes: μ-law 8 kHz, ou None se a frase não está no cache
+        """
+        ulaw = self._entries.get(key)
+        if ulaw is not None:
+            self._entries.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return ulaw
+        if self.disk_dir:
+            try:
+                ulaw = await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+            except OSError as e:
+                log_error("❌", f"Erro ao ler o cache de áudio em disco: {e}")
+            if ulaw:
+                self._remember(key, ulaw)
+                self.stats['disk_hits'] += 1
+                return ulaw
+        self.stats['misses'] += 1
+        return None
+
+    async def put(self, key: str, ulaw: bytes):
+        """Guarda o áudio de uma frase (memória e, se configurado, disco)."""
+        if not ulaw or not self._remember(key, ulaw):
+            return
+        self.stats['stores'] += 1
+        if self.disk_dir:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, key, ulaw)
+            except OSError as e:
+                log_error("❌", f"Erro ao gravar o cache de áudio em disco: {e}")
+
+    def peek(self, key: str):
+        """Áudio em memória para a chave, sem ir ao disco nem contar nas estatísticas."""
+        ulaw = self._entries.get(key)
+        if ulaw is not None:
+            self._entries.move_to_end(key)
+        return ulaw
+
+    def contains(self, key: str) -> bool:
+        """Se a chave está no cache, sem contar como consulta nas estatísticas."""
+        return key in self._entries or bool(self.disk_dir and os.path.exists(self._path(key)))
+
+    def snapshot(self) -> dict:
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        lookups = hits + self.stats['misses']
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            **self.stats,
+        }
@@ -0,0 +1,143 @@
+"""
+Interjeição curta para cobrir o silêncio enquanto a resposta não chega.
+
+Entre o fim da fala do cliente (`speech_stopped`) e o primeiro áudio da
+resposta há o tempo do LLM e da síntese, e a linha fica muda. Se nenhum
+áudio da resposta ficar pronto até `deadline_ms`, o agendador toca uma
+interjeição já sintetizada ("Ok", "Certo"), no máximo uma por turno e
+nunca a mesma duas vezes seguidas.
+
+A resposta nunca se mistura com a interjeição: quando o áudio real fica
+pronto, a interjeição que ainda não começou é cancelada e a que já está
+sendo enviada termina de ir antes (o Twilio toca o buffer em sequência).
+Se o cliente volta a falar, `interrupt` cancela até a interjeição em envio;
+a marca `FILLER_MARK`, enviada depois dela, diz quando o Twilio a tocou.
+
+As métricas comparam a latência real (fim da fala até o primeiro áudio da
+resposta) com a percebida (até o primeiro áudio, interjeição incluída).
+"""
+import asyncio
+import random
+import time
+
+# Nome da marca enviada depois da interjeição: volta do Twilio quando ela termina de tocar
+FILLER_MARK = 'filler'
+
+class FillerScheduler:
+    """
+    Interjeições de uma chamada.
+
+    Args:
+        phrases: Interjeições candidatas
+        lookup: Função que devolve o μ-law pronto de uma frase, ou None se ele não existe
+        deadline_ms: Silêncio tolerado depois do fim da fala antes da interjeição
+        enabled: Desligado, só as métricas de latência são registradas
+    """
+
+    def __init__(self, phrases: list, lookup, deadline_ms: int = 800, enabled: bool = True):
+        self.phrases = list(phrases)
+        self.lookup = lookup
+        self.deadline_ms = deadline_ms
+        self.enabled = enabled and bool(self.phrases)
+        self._timer = None
+        self._stopped_at = None
+        self._filler_at = None
+        self._last_phrase = None
+        self._actual_total = 0
+        self._perceived_total = 0
+        self.stats = {
+            'turns': 0,
+            'fillers': 0,
+            'unavailable': 0,
+            'last_actual_ms': None,
+            'last_perceived_ms': None,
+            'avg_actual_ms': None,
+            'avg_perceived_ms': None,
+        }
+
+    @property
+    def playing(self) -> bool:
+        """Uma interjeição está sendo enviada ao Twilio."""
+        return self._timer is not None and self._filler_at is not None and not self._timer.done()
+
+    def _pick(self):
+        phrases = [phrase for phrase in self.phrases if phrase != self._last_phrase]
+        random.shuffle(phrases)
+        for phrase in phrases:
+            ulaw = self.lookup(phrase)
+            if ulaw:
+                self._last_phrase = phrase
+                return ulaw
+        return None
+
+    def arm(self, play):
+        """
+        Fim da fala do cliente: começa a contar o prazo do turno.
+
+        Args:
+            play: Coroutine que envia um μ-law ao Twilio
+        """
+        self.disarm()
+        self._stopped_at = time.monotonic()
+        self._filler_at = None
+        if self.enabled:
+            self._timer = asyncio.create_task(self._play_after_deadline(play))
+
+    async def _play_after_deadline(self, play):
+        await asyncio.sleep(self.deadline_ms / 1000)
+        ulaw = self._pick()
+        if ulaw is None:
+            self.stats['unavailable'] += 1
+            return
+        self._filler_at = time.monotonic()
+        self.stats['fillers'] += 1
+        await play(ulaw)
+
+    async def audio_ready(self):
+        """Primeiro áudio da resposta pronto para envio: cancela a interjeição ou espera ela sair."""
+        if self._stopped_at is None:
+            return
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            if self._filler_at is None:
+                timer.cancel()
+            await asyncio.gather(timer, return_exceptions=True)
+
+        now = time.monotonic()
+        actual = round((now - self._stopped_at) * 1000)
+        perceived = round(((self._filler_at or now) - self._stopped_at) * 1000)
+        self._stopped_at = None
+        self._actual_total += actual
+        self._perceived_total += perceived
+        self.stats['turns'] += 1
+        self.stats['last_actual_ms'] = actual
+        self.stats['last_perceived_ms'] = perceived
+        self.stats['avg_actual_ms'] = round(self._actual_total / self.stats['turns'])
+        self.stats['avg_perceived_ms'] = round(self._perceived_total / self.stats['turns'])
+
+    def disarm(self):
+        """O cliente voltou a falar ou o turno acabou sem áudio: não há mais o que cobrir."""
+        if self._timer is not None and self._filler_at is None:
+            self._timer.cancel()
+        self._timer = None
+        self._stopped_at = None
+
+    async def interrupt(self) -> bool:
+        """
+        O cliente voltou a falar: encerra o turno, cancelando também a interjeição em envio.
+
+        Returns:
+            bool: Se uma interjeição estava sendo enviada
+        """
+        timer, self._timer = self._timer, None
+        self._stopped_at = None
+        if timer is None:
+            return False
+        playing = self._filler_at is not None and not timer.done()
+        timer.cancel()
+        await asyncio.gather(timer, return_exceptions=True)
+        return playing
+
+    async def close(self):
+        """Fim da chamada."""
+        await self.interrupt()
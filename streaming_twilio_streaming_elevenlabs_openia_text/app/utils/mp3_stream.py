@@ -0,0 +1,223 @@
+import asyncio
+from pydub import AudioSegment
+from utils.g711 import pcm_to_ulaw
+from utils.logger import log_debug
+
+# Tabelas do cabeçalho MPEG Layer III (kbps e Hz)
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+def parse_frame_header(header: bytes):
+    """
+    Interpreta um cabeçalho de frame MP3 (Layer III).
+
+    Args:
+        header: Pelo menos 4 bytes a partir de uma possível palavra de sincronismo
+
+    Returns:
+        tuple | None: (tamanho do frame em bytes, versão, taxa de amostragem) ou
+        None se os bytes não formarem um cabeçalho Layer III válido
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if version == 3:
+        frame_length = 144000 * _BITRATES_V1[bitrate_index] // sample_rate + padding
+    else:
+        frame_length = 72000 * _BITRATES_V2[bitrate_index] // sample_rate + padding
+    return frame_length, version, sample_rate
+
+class Mp3FrameSplitter:
+    """Recorta um fluxo MP3 em frames completos, guardando o resto entre chamadas."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._stream_params = None
+        self._id3_checked = False
+
+    def _skip_id3_tag(self) -> bool:
+        """Descarta uma tag ID3v2 inicial. Retorna False se a tag ainda não chegou inteira."""
+        if len(self._buffer) < 10:
+            return False
+        if self._buffer[:3] == b'ID3':
+            size = 0
+            for byte in self._buffer[6:10]:
+                size = (size << 7) | (byte & 0x7F)
+            total = 10 + size + (10 if self._buffer[5] & 0x10 else 0)
+            if len(self._buffer) < total:
+                return False
+            del self._buffer[:total]
+        self._id3_checked = True
+        return True
+
+    def feed(self, data: bytes) -> list:
+        """
+        Acrescenta bytes ao fluxo e retorna os frames que ficaram completos.
+
+        Args:
+            data: Bytes MP3 recebidos, cortados em qualquer posição
+
+        Returns:
+            list[bytes]: Frames MP3 completos, na ordem do fluxo
+        """
+        self._buffer += data
+        if not self._id3_checked and not self._skip_id3_tag():
+            return []
+
+        frames = []
+        position = 0
+        buffer = self._buffer
+        while True:
+            sync = buffer.find(b'\xff', position)
+            if sync < 0:
+                position = len(buffer)
+                break
+            if sync + 4 > len(buffer):
+                position = sync
+                break
+
+            header = parse_frame_header(buffer[sync:sync + 4])
+            if header is None or (self._stream_params and header[1:] != self._stream_params):
+                # Falso sincronismo: procura o próximo 0xFF
+                position = sync + 1
+                continue
+
+            frame_length = header[0]
+            if sync + frame_length > len(buffer):
+                position = sync
+                break
+
+            self._stream_params = header[1:]
+            frames.append(bytes(buffer[sync:sync + frame_length]))
+            position = sync + frame_length
+
+        del buffer[:position]
+        return frames
+
+    def flush(self) -> bytes:
+        """Retorna (e descarta) os bytes que sobraram sem formar um frame completo."""
+        remainder = bytes(self._buffer)
+        self._buffer.clear()
+        return remainder
+
+class StreamingMp3Decoder:
+    """
+    Decodificador MP3 -> μ-law 8 kHz incremental, um por resposta sintetizada.
+
+    Mantém um único processo ffmpeg aberto durante todo o fluxo e o alimenta
+    frame a frame, então o estado do decodificador (bit reservoir, filtros de
+    reamostragem) é preservado entre os chunks e não há cliques nas emendas.
+    O áudio decodificado fica disponível assim que cada frame MP3 é processado.
+
+    O stdout precisa ser lido (`frames`) enquanto o fluxo é alimentado: com a
+    task leitora registrada em `watch`, `feed` não fica esperando um pipe que
+    ninguém mais esvazia se ela falhar ou for cancelada.
+    """
+
+    def __init__(self, sample_rate: int = 8000, read_size: int = 3200):
+        self.sample_rate = sample_rate
+        self.read_size = read_size
+        self.frames_fed = 0
+        self.bytes_decoded = 0
+        self._splitter = Mp3FrameSplitter()
+        self._process = None
+        self._reader = None
+
+    async def start(self):
+        """Abre o processo ffmpeg que vai decodificar o fluxo."""
+        self._process = await asyncio.create_subprocess_exec(
+            AudioSegment.converter,
+            '-hide_banner', '-loglevel', 'error',
+            '-fflags', 'nobuffer', '-probesize', '32', '-analyzeduration', '0',
+            '-f', 'mp3', '-i', 'pipe:0',
+            '-ac', '1', '-ar', str(self.sample_rate), '-f', 's16le', 'pipe:1',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+    def watch(self, reader: asyncio.Task):
+        """Registra a task que lê o stdout (`frames`)."""
+        self._reader = reader
+
+    async def feed(self, data: bytes):
+        """Envia ao decodificador os frames MP3 que ficaram completos com `data`."""
+        frames = self._splitter.feed(data)
+        if not frames:
+            return
+        self._process.stdin.write(b''.join(frames))
+        self.frames_fed += len(frames)
+        if self._reader is None:
+            await self._process.stdin.drain()
+            return
+
+        drain = asyncio.ensure_future(self._process.stdin.drain())
+        try:
+            await asyncio.wait((drain, self._reader), return_when=asyncio.FIRST_COMPLETED)
+            if drain.done():
+                drain.result()
+                return
+        finally:
+            drain.cancel()
+        # A leitura parou antes do fim do fluxo: com o stdout cheio o ffmpeg não lê mais o stdin
+        await self.close()
+        error = None if self._reader.cancelled() else self._reader.exception()
+        raise RuntimeError("leitura do áudio decodificado interrompida") from error
+
+    async def finish(self):
+        """Sinaliza o fim do fluxo MP3; o ffmpeg entrega o áudio restante e encerra."""
+        remainder = self._splitter.flush()
+        if remainder:
+            log_debug("🧩", f"Descartando {len(remainder)} bytes MP3 incompletos no fim do fluxo")
+        if self._process.stdin and not self._process.stdin.is_closing():
+            self._process.stdin.close()
+            await self._process.stdin.wait_closed()
+
+    async def frames(self):
+        """
+        Gera o áudio decodificado em μ-law, conforme o ffmpeg produz.
+
+        Yields:
+            bytes: Amostras μ-law 8 kHz (tamanho variável)
+        """
+        carry = b''
+        while True:
+            pcm = await self._process.stdout.read(self.read_size)
+            if not pcm:
+                break
+            if carry:
+                pcm = carry + pcm
+            usable = len(pcm) & ~1
+            carry = pcm[usable:]
+            if usable:
+                self.bytes_decoded += usable
+                yield pcm_to_ulaw(pcm[:usable]).tobytes()
+
+    async def close(self):
+        """Encerra o processo ffmpeg, caso ainda esteja rodando."""
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._process and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+            # O wait só volta quando os pipes fecham: descarta o que ninguém leu do stdout
+            while await self._process.stdout.read(65536):
+                pass
+            await self._process.wait()
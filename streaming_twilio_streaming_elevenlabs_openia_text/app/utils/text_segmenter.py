@@ -0,0 +1,120 @@
+"""
+Segmentação incremental do texto da resposta para a síntese de voz.
+
+O texto chega da OpenAI em deltas de poucos caracteres. Em vez de esperar a
+resposta inteira, o segmentador devolve cada trecho assim que ele fecha:
+
+- fim de frase (`.`, `!`, `?`, `…` ou quebra de linha) sempre fecha um trecho;
+- pausa de oração (`,`, `;`, `:`, `—`) fecha um trecho se ele já tiver
+  `min_chars` caracteres. O primeiro trecho usa `first_min_chars`, menor:
+  é ele que define quando o cliente começa a ouvir;
+- sem pontuação, o trecho é cortado no último espaço ao passar de `max_chars`.
+
+A pontuação só conta quando seguida de espaço: "3.5" ou "R$ 1,50" não
+quebram, e um delta que termina em "." espera o próximo para decidir.
+"""
+
+_SENTENCE_END = frozenset('.!?…')
+_CLAUSE_END = frozenset(',;:—')
+_CLOSERS = frozenset('"\')»”')
+
+# Abreviações comuns antes de um ponto que não termina a frase
+_ABBREVIATIONS = frozenset(('sr', 'sra', 'srta', 'dr', 'dra', 'prof', 'profa', 'av', 'n', 'nº', 'tel'))
+
+class SentenceSegmenter:
+    """
+    Corta o texto de uma resposta em trechos para sintetizar enquanto ela é gerada.
+
+    Args:
+        first_min_chars: Tamanho mínimo do primeiro trecho para cortar numa pausa de oração
+        min_chars: Tamanho mínimo dos demais trechos para cortar numa pausa de oração
+        max_chars: Tamanho a partir do qual um trecho sem pontuação é cortado no último espaço
+    """
+
+    def __init__(self, first_min_chars: int = 20, min_chars: int = 60, max_chars: int = 200):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.max_chars = max(max_chars, min_chars, first_min_chars)
+        self._pending = ''
+        self._scan_from = 0
+        self.segments = 0
+
+    def _min_clause_chars(self) -> int:
+        return self.first_min_chars if self.segments == 0 else self.min_chars
+
+    def _is_abbreviation(self, end: int) -> bool:
+        """Verdadeiro se o ponto em `end` fecha uma abreviação conhecida."""
+        start = end
+        while start > 0 and self._pending[start - 1].isalnum():
+            start -= 1
+        return self._pending[start:end].lower() in _ABBREVIATIONS
+
+    def _boundary(self) -> int:
+        """Posição logo após o primeiro corte possível no texto pendente, ou -1."""
+        text = self._pending
+        for index in range(self._scan_from, len(text)):
+            char = text[index]
+            if char == '\n':
+                return index + 1
+            if char not in _SENTENCE_END and char not in _CLAUSE_END:
+                continue
+            end = index + 1
+            while end < len(text) and (text[end] in _SENTENCE_END or text[end] in _CLOSERS):
+                end += 1
+            if end >= len(text):
+                # Ainda não dá para saber o que vem depois: espera o próximo delta
+                self._scan_from = index
+                return -1
+            if not text[end].isspace():
+                continue
+            if char in _SENTENCE_END:
+                if char == '.' and end == index + 1 and self._is_abbreviation(index):
+                    continue
+                return end
+            if len(text[:end].strip()) >= self._min_clause_chars():
+                return end
+        self._scan_from = len(text)
+        return -1
+
+    def _split_long(self) -> int:
+        """Corte no último espaço antes de `max_chars`, ou -1 se o trecho ainda cabe."""
+        if len(self._pending) <= self.max_chars:
+            return -1
+        cut = self._pending.rfind(' ', 0, self.max_chars)
+        return cut + 1 if cut > 0 else self.max_chars
+
+    def _take(self, end: int) -> str:
+        segment = self._pending[:end].strip()
+        self._pending = self._pending[end:]
+        self._scan_from = 0
+        return segment
+
+    def feed(self, delta: str) -> list:
+        """
+        Acrescenta um delta de texto.
+
+        Returns:
+            list: Trechos que fecharam com este delta, em ordem
+        """
+        self._pending += delta
+        segments = []
+        while True:
+            end = self._boundary()
+            if end < 0:
+                end = self._split_long()
+            if end < 0:
+                break
+            segment = self._take(end)
+            if segment:
+                segments.append(segment)
+                self.segments += 1
+        return segments
+
+    def flush(self) -> list:
+        """Fim da resposta: devolve o que sobrou e prepara o segmentador para a próxima."""
+        segments = self.feed('')
+        rest = self._take(len(self._pending))
+        if rest:
+            segments.append(rest)
+        self.segments = 0
+        return segments
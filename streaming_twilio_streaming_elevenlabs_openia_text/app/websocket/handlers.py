@@ -3,12 +3,26 @@ import time
 import asyncio
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketDisconnect
-from config import SHOW_TIMING_MATH
+from config import (
+    SHOW_TIMING_MATH, UPLINK_QUEUE_SIZE, UPLINK_QUEUE_POLICY, UPLINK_MAX_AGE_MS,
+    INCREMENTAL_TTS, TTS_SEGMENT_FIRST_MIN_CHARS, TTS_SEGMENT_MIN_CHARS, TTS_SEGMENT_MAX_CHARS,
+    FILLERS, FILLER_DEADLINE_MS
+)
 from services.elevenlabs_service import ElevenLabsService
 from services.openai_service import OpenAIService
+from services.speech_pipeline import SpeechPipeline
 from services.twilio_service import TwilioService
+from utils.fillers import FILLER_MARK, FillerScheduler
+from utils.greetings import GREETING_MARK, Greeting
+from utils.message_encoder import twilio_encoder
+from utils.text_segmenter import SentenceSegmenter
+from utils.twilio_events import MEDIA, parse_event
+from utils.uplink_queue import UplinkFrameQueue
 from utils.logger import log_info, log_error, log_debug
 
+# Eventos com o texto da resposta: texto puro ou transcrição do áudio gerado
+TEXT_DELTA_EVENTS = frozenset(('response.text.delta', 'response.audio_transcript.delta'))
+
 class WebSocketHandler:
     def __init__(self):
         self.stream_sid = None
@@ -19,36 +33,49 @@ class WebSocketHandler:
         self.user_speaking = False
         self.last_speech_event_time = 0
         self.speech_debounce_delay = 1.0
+        self.metrics = {}
+        # Frames do Twilio a caminho da OpenAI: a leitura só enfileira, o envio é outra task
+        self.uplink = UplinkFrameQueue(UPLINK_QUEUE_SIZE, UPLINK_QUEUE_POLICY, UPLINK_MAX_AGE_MS)
+        self.metrics['uplink'] = self.uplink.stats
+        # Texto da resposta cortado em trechos conforme chega, sintetizados em ordem
+        self.segmenter = SentenceSegmenter(TTS_SEGMENT_FIRST_MIN_CHARS, TTS_SEGMENT_MIN_CHARS, TTS_SEGMENT_MAX_CHARS)
+        self.speech = None
+        # Resposta já gerada cujo áudio ainda sai (task por chamada: não trava os eventos da OpenAI)
+        self.reply_task = None
+        # Resposta em geração na OpenAI; a cancelada pela interrupção é descartada até o response.done
+        self.response_active = False
+        self.discard_reply = False
+        # Algum áudio (resposta, interjeição, saudação) foi enviado e o Twilio ainda não devolveu todas as marcas
+        self.audio_pending = False
+        # Interjeição do cache quando a resposta demora; mede a latência real e a percebida
+        self.fillers = FillerScheduler(FILLERS, ElevenLabsService.cached_ulaw, FILLER_DEADLINE_MS)
+        self.metrics['latency'] = self.fillers.stats
+        self.greeting_playing = False
+        self.stream_started_at = None
+        # Eventos raros do Twilio; `media` é tratado direto no loop de recepção
+        self._event_handlers = {
+            'start': self.handle_start_event,
+            'mark': self.handle_mark_event,
+            'stop': self.handle_stop_event,
+            'error': self.handle_error_event,
+        }
 
     async def receive_from_twilio(self, websocket: WebSocket, openai_ws):
         """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
         try:
             async for message in websocket.iter_text():
-                data = json.loads(message)
-                log_debug("📨", f"Evento recebido do Twilio: {data['event']}")
-                
-                if TwilioService.is_media_event(data) and openai_ws.open:
-                    self.latest_media_timestamp = TwilioService.process_media_timestamp(data)
-                    await OpenAIService.send_audio_append(openai_ws, data['media']['payload'])
-                    log_debug("🎤", f"Áudio recebido do Twilio (timestamp: {self.latest_media_timestamp}ms)")
-                
-                elif TwilioService.is_start_event(data):
-                    self.stream_sid = TwilioService.get_stream_sid(data)
-                    log_info("📞", f"Stream iniciado: {self.stream_sid}")
-                    self.response_start_timestamp_twilio = None
-                    self.latest_media_timestamp = 0
-                    self.last_assistant_item = None
+                event_type, data = parse_event(message)
                 
-                elif TwilioService.is_mark_event(data):
-                    if self.mark_queue:
-                        self.mark_queue.pop(0)
-                        log_debug("✅", "Mark processado")
-                
-                elif TwilioService.is_stop_event(data):
-                    log_info("🛑", "Stream parado")
-                
-                elif TwilioService.is_error_event(data):
-                    log_error("❌", f"Erro no stream Twilio: {data}")
+                if event_type == MEDIA:
+                    # Caminho quente: sem log nem dict por frame
+                    self.latest_media_timestamp = data.timestamp
+                    await self.uplink.put(data.payload, data.timestamp)
+                    continue
+
+                log_debug("📨", f"Evento recebido do Twilio: {event_type}")
+                handler = self._event_handlers.get(event_type)
+                if handler:
+                    handler(data)
         
         except WebSocketDisconnect:
             log_info("🔌", "Cliente desconectado")
@@ -56,10 +83,142 @@ class WebSocketHandler:
                 await openai_ws.close()
         except Exception as e:
             log_error("💥", f"Erro em receive_from_twilio: {e}")
+        finally:
+            self.uplink.close()
+
+    async def forward_to_openai(self, openai_ws):
+        """Send queued Twilio frames to the OpenAI Realtime API, skipping stale ones."""
+        try:
+            while True:
+                frame = await self.uplink.get()
+                if frame is None:
+                    break
+                if openai_ws.open:
+                    await OpenAIService.send_audio_append(openai_ws, frame[0])
+        except Exception as e:
+            log_error("💥", f"Erro em forward_to_openai: {e}")
+        finally:
+            self.uplink.close()
+
+    async def wait_for_start(self, websocket: WebSocket) -> str:
+        """Read Twilio events until the stream starts; return the call's CallSid."""
+        try:
+            async for message in websocket.iter_text():
+                event_type, data = parse_event(message)
+                if event_type == 'start':
+                    self.handle_start_event(data)
+                    return data['start'].get('callSid')
+        except WebSocketDisconnect:
+            log_info("🔌", "Cliente desconectado antes do início do stream")
+        return None
+
+    def handle_start_event(self, data: dict):
+        """Reset per-stream state when Twilio starts the media stream."""
+        self.stream_sid = TwilioService.get_stream_sid(data)
+        log_info("📞", f"Stream iniciado: {self.stream_sid}")
+        self.stream_started_at = time.monotonic()
+        self.response_start_timestamp_twilio = None
+        self.latest_media_timestamp = 0
+        self.last_assistant_item = None
+
+    def handle_mark_event(self, data: dict):
+        """Twilio finished playing audio up to one of our marks."""
+        if self.mark_queue:
+            if self.mark_queue.pop(0) == GREETING_MARK:
+                self.greeting_playing = False
+            log_debug("✅", "Mark processado")
+        if not self.mark_queue and not self.sending_audio():
+            self.audio_pending = False
+
+    def sending_audio(self) -> bool:
+        """Some reply or filler audio is still on its way to Twilio (its mark is not out yet)."""
+        reply_sending = self.reply_task is not None and not self.reply_task.done()
+        return self.speech is not None or reply_sending or self.fillers.playing
+
+    def handle_stop_event(self, data: dict):
+        """Twilio closed the media stream."""
+        log_info("🛑", "Stream parado")
+
+    def handle_error_event(self, data: dict):
+        """Twilio reported an error on the stream."""
+        log_error("❌", f"Erro no stream Twilio: {data}")
+
+    async def play_greeting(self, websocket: WebSocket, greeting: Greeting):
+        """Send a pre-rendered greeting to Twilio right away, followed by its mark."""
+        self.metrics['greeting'] = {
+            'duration_ms': greeting.duration_ms,
+            'start_to_audio_ms': round((time.monotonic() - self.stream_started_at) * 1000),
+            'interrupted': False,
+        }
+        self.greeting_playing = True
+        self.audio_pending = True
+        messages = twilio_encoder(self.stream_sid)
+        for payload in greeting.payloads:
+            await websocket.send_text(messages.media(payload))
+        await TwilioService.send_mark(websocket, self.stream_sid, self.mark_queue, GREETING_MARK)
+        log_info("👋", f"Saudação enviada: '{greeting.text}'")
+
+    def interrupt_greeting(self):
+        """The caller spoke over the greeting (the clear is sent with the rest of the interruption)."""
+        self.greeting_playing = False
+        self.metrics['greeting']['interrupted'] = True
+        log_info("🔄", "Cliente interrompeu a saudação")
+
+    def speak(self, websocket: WebSocket, segments: list):
+        """Queue reply segments for synthesis, starting the response's pipeline on the first one."""
+        if not segments:
+            return
+        if self.speech is None:
+            self.speech = SpeechPipeline(
+                websocket, self.stream_sid, on_first_audio=self.reply_audio_started, after=self.reply_task
+            )
+        for segment in segments:
+            log_debug("🗣️", f"Trecho para síntese: '{segment}'")
+            self.speech.say(segment)
+
+    async def reply_audio_started(self):
+        """The reply's first audio is about to go out: settle the filler and start the truncation clock."""
+        await self.fillers.audio_ready()
+        self.audio_pending = True
+        self.response_start_timestamp_twilio = self.latest_media_timestamp
+        if SHOW_TIMING_MATH:
+            log_debug("⏱️", f"Timestamp inicial definido: {self.response_start_timestamp_twilio}ms")
+
+    async def finish_reply(self, websocket: WebSocket, speech: SpeechPipeline):
+        """Wait for the reply's remaining audio to go out, then mark its end."""
+        audio_paths = await speech.finish()
+        self.metrics['tts_segments'] = len(audio_paths)
+        if audio_paths:
+            self.metrics['tts_audio_path'] = audio_paths[-1]
+        await TwilioService.send_mark(websocket, self.stream_sid, self.mark_queue)
+        log_info("✅", "Áudio da IA enviado!")
+
+    async def stop_speech(self) -> bool:
+        """Abort the reply being synthesized or played; return whether there was one."""
+        stopped = False
+        if self.speech is not None:
+            speech, self.speech = self.speech, None
+            await speech.cancel()
+            stopped = True
+        reply_task, self.reply_task = self.reply_task, None
+        if reply_task is not None and not reply_task.done():
+            reply_task.cancel()
+            await asyncio.gather(reply_task, return_exceptions=True)
+            stopped = True
+        return stopped
+
+    async def play_filler(self, websocket: WebSocket, ulaw_audio: bytes):
+        """Send a cached backchannel clip while the reply is still being produced."""
+        log_info("⏳", "Resposta demorando: tocando interjeição")
+        self.audio_pending = True
+        await ElevenLabsService.send_ulaw(ulaw_audio, websocket, self.stream_sid)
+        # A marca diz quando a interjeição acabou de tocar: até lá uma interrupção precisa do clear
+        await TwilioService.send_mark(websocket, self.stream_sid, self.mark_queue, FILLER_MARK)
 
     async def send_to_twilio(self, websocket: WebSocket, openai_ws):
         """Receive events from the OpenAI Realtime API, send audio back to Twilio using ElevenLabs Streaming."""
         buffer_texto = ""
+        text_source = None
 
         try:
             async for openai_message in openai_ws:
@@ -68,6 +227,9 @@ class WebSocketHandler:
 
                 if response['type'] == 'session.created':
                     log_info("🎭", "Sessão OpenAI criada")
+
+                elif response['type'] == 'response.created':
+                    self.response_active = True
                 
                 elif response['type'] == 'response.create':
                     if 'input' in response and 'content' in response['input']:
@@ -80,12 +242,17 @@ class WebSocketHandler:
                         self.user_speaking = True
                         self.last_speech_event_time = current_time
                         log_info("🎤", "Cliente começou a falar")
+                        await self.handle_speech_started_event(websocket, openai_ws)
+                    else:
+                        # Tosse ou ruído logo depois da fala: a resposta segue tocando
+                        log_debug("🔉", "Início de fala ignorado (debounce)")
                 
                 elif response['type'] == 'input_audio_buffer.speech_stopped':
                     if self.user_speaking:
                         self.user_speaking = False
                         self.last_speech_event_time = current_time
                         log_info("🔇", "Cliente parou de falar")
+                        self.fillers.arm(lambda ulaw_audio: self.play_filler(websocket, ulaw_audio))
                 
                 elif response['type'] == 'input_audio_buffer.committed':
                     if not self.user_speaking and (current_time - self.last_speech_event_time) < 2.0:
@@ -98,11 +265,29 @@ class WebSocketHandler:
                 elif response['type'] == 'error':
                     log_error("❌", f"Erro da API OpenAI: {response}")
 
-                if response.get('type') == 'response.text.delta':
-                    buffer_texto += response.get('delta', "")
+                if response.get('type') in TEXT_DELTA_EVENTS:
+                    if self.discard_reply:
+                        continue
+                    # Com texto e áudio nas modalidades o texto chega como transcrição: uma fonte por resposta
+                    text_source = text_source or response['type']
+                    self.last_assistant_item = response.get('item_id') or self.last_assistant_item
+                    if response['type'] == text_source:
+                        delta = response.get('delta', "")
+                        buffer_texto += delta
+                        if INCREMENTAL_TTS:
+                            self.speak(websocket, self.segmenter.feed(delta))
 
                 elif response.get('type') == 'response.done':
-                    if response.get('response', {}).get('output'):
+                    self.response_active = False
+                    if self.discard_reply:
+                        # Resposta cancelada pela interrupção: o texto que sobrou não é falado
+                        self.discard_reply = False
+                        self.segmenter.flush()
+                        buffer_texto = ""
+                        text_source = None
+                        continue
+
+                    if text_source is None and response.get('response', {}).get('output'):
                         for output_item in response['response']['output']:
                             if output_item.get('content'):
                                 for content in output_item['content']:
@@ -110,53 +295,65 @@ class WebSocketHandler:
                                         buffer_texto = content['transcript']
                                         break
                     
-                    if buffer_texto:
-                        log_info("💬", f"IA responde: '{buffer_texto}'")
-                        await ElevenLabsService.stream_audio_to_twilio(buffer_texto, websocket, self.stream_sid)
+                    if INCREMENTAL_TTS:
+                        # Sem deltas, a transcrição completa é cortada aqui mesmo
+                        pending = self.segmenter.feed(buffer_texto) if text_source is None else []
+                        self.speak(websocket, pending + self.segmenter.flush())
+                    elif buffer_texto:
+                        self.speak(websocket, [buffer_texto])
+                    text_source = None
 
-                        if self.response_start_timestamp_twilio is None:
-                            self.response_start_timestamp_twilio = self.latest_media_timestamp
-                            if SHOW_TIMING_MATH:
-                                log_debug("⏱️", f"Timestamp inicial definido: {self.response_start_timestamp_twilio}ms")
-
-                        if response.get('item_id'):
-                            self.last_assistant_item = response['item_id']
-
-                        await TwilioService.send_mark(websocket, self.stream_sid, self.mark_queue)
-                        log_info("✅", "Áudio da IA enviado!")
-                        buffer_texto = ""
-
-                elif response.get('type') == 'input_audio_buffer.speech_started':
-                    if self.last_assistant_item and self.user_speaking:
-                        log_info("🔄", f"Cliente interrompeu a IA (ID: {self.last_assistant_item})")
-                        await self.handle_speech_started_event(websocket, openai_ws)
+                    if self.speech is not None:
+                        log_info("💬", f"IA responde: '{buffer_texto}'")
+                        speech, self.speech = self.speech, None
+                        # O resto do áudio sai em segundo plano: o loop segue lendo a OpenAI (e as interrupções)
+                        self.reply_task = asyncio.create_task(self.finish_reply(websocket, speech))
+                    else:
+                        self.fillers.disarm()
+                    buffer_texto = ""
 
         except Exception as e:
             log_error("💥", f"Erro em send_to_twilio: {e}")
+        finally:
+            await self.fillers.close()
+            await self.stop_speech()
 
     async def handle_speech_started_event(self, websocket: WebSocket, openai_ws):
-        """Handle interruption when the caller's speech starts."""
-        log_info("🔄", "Processando interrupção de fala")
-        if self.mark_queue and self.response_start_timestamp_twilio is not None:
+        """Handle interruption when the caller's speech starts: stop the reply at every stage."""
+        await self.fillers.interrupt()
+        if self.response_active:
+            # O LLM ainda está gerando: para os tokens que ninguém vai ouvir
+            await OpenAIService.send_response_cancel(openai_ws)
+            self.response_active = False
+            self.discard_reply = True
+        await self.stop_speech()
+        # Nada enviado desde que as marcas voltaram: a linha já está em silêncio
+        if not self.audio_pending:
+            return
+
+        if self.greeting_playing:
+            self.interrupt_greeting()
+        log_info("🔄", f"Cliente interrompeu a IA (ID: {self.last_assistant_item})")
+        # Descarta o áudio que o Twilio ainda tem no buffer
+        await TwilioService.send_clear_event(websocket, self.stream_sid)
+        if self.last_assistant_item and self.response_start_timestamp_twilio is not None:
             elapsed_time = self.latest_media_timestamp - self.response_start_timestamp_twilio
             if SHOW_TIMING_MATH:
                 log_debug("⏱️", f"Tempo decorrido para truncamento: {elapsed_time}ms")
+                log_debug("✂️", f"Truncando item ID: {self.last_assistant_item}")
+            await OpenAIService.send_truncate_event(openai_ws, self.last_assistant_item, elapsed_time)
 
-            if self.last_assistant_item:
-                if SHOW_TIMING_MATH:
-                    log_debug("✂️", f"Truncando item ID: {self.last_assistant_item}")
-
-                await OpenAIService.send_truncate_event(openai_ws, self.last_assistant_item, elapsed_time)
-                await TwilioService.send_clear_event(websocket, self.stream_sid)
-
-                self.mark_queue.clear()
-                self.last_assistant_item = None
-                self.response_start_timestamp_twilio = None
-                log_info("🧹", "Estado limpo após interrupção")
+        self.mark_queue.clear()
+        self.audio_pending = False
+        self.greeting_playing = False
+        self.last_assistant_item = None
+        self.response_start_timestamp_twilio = None
+        log_info("🧹", "Estado limpo após interrupção")
 
     async def handle_connection(self, websocket: WebSocket, openai_ws):
         """Handle the main WebSocket communication."""
         await asyncio.gather(
             self.receive_from_twilio(websocket, openai_ws),
+            self.forward_to_openai(openai_ws),
             self.send_to_twilio(websocket, openai_ws)
         )
\ No newline at end of file
@@ -1,31 +1,83 @@
-import websockets
 from fastapi import WebSocket
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY, REALTIME_POOL_MIN, REALTIME_POOL_MAX, REALTIME_POOL_IDLE_S,
+    SPECULATIVE_SETUP, SPECULATIVE_TTL_S, SPECULATIVE_MAX_PENDING, TWILIO_AUTH_TOKEN,
+    GREETINGS, TWILIO_FRAMES_PER_MESSAGE
+)
+from services.elevenlabs_service import ElevenLabsService
 from services.openai_service import OpenAIService
+from services.realtime_pool import RealtimePool
+from utils.greetings import GreetingLibrary
+from utils.speculative_sessions import SpeculativeSessionStore
 from websocket.handlers import WebSocketHandler
+from websocket.sessions import SessionRegistry
 from utils.logger import log_info, log_error
 
 class WebSocketManager:
     def __init__(self):
-        self.handler = WebSocketHandler()
+        self.sessions = SessionRegistry()
+        self.realtime_pool = RealtimePool(
+            'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01',
+            {
+                "Authorization": f"Bearer {OPENAI_API_KEY}",
+                "OpenAI-Beta": "realtime=v1"
+            },
+            OpenAIService.initialize_session,
+            min_size=REALTIME_POOL_MIN,
+            max_size=REALTIME_POOL_MAX,
+            idle_timeout_s=REALTIME_POOL_IDLE_S,
+        )
+        # Sockets separados no /incoming-call, à espera do start do stream
+        self.speculative = SpeculativeSessionStore(
+            self.realtime_pool.acquire,
+            self._close_socket,
+            ttl_s=SPECULATIVE_TTL_S,
+            max_pending=SPECULATIVE_MAX_PENDING,
+            # Só webhooks assinados podem abrir um socket antes do stream
+            enabled=SPECULATIVE_SETUP and bool(TWILIO_AUTH_TOKEN)
+        )
+        if SPECULATIVE_SETUP and not TWILIO_AUTH_TOKEN:
+            log_info("⚠️", "TWILIO_AUTH_TOKEN não definido: sessões especulativas desligadas")
+        # Saudações com a voz do ElevenLabs, tocadas no start enquanto o socket é adotado
+        self.greetings = GreetingLibrary(GREETINGS, ElevenLabsService.render_ulaw, TWILIO_FRAMES_PER_MESSAGE)
+
+    @staticmethod
+    async def _close_socket(openai_ws):
+        await openai_ws.close()
+
+    async def _openai_socket(self, call_sid: str):
+        """Socket adotado da sessão especulativa da chamada ou, sem ela, do pool."""
+        openai_ws = await self.speculative.adopt(call_sid)
+        if openai_ws is not None and openai_ws.open:
+            return openai_ws, True
+        return await self.realtime_pool.acquire(), False
 
     async def handle_connection(self, websocket: WebSocket):
         """Handle WebSocket connections between Twilio and OpenAI with optimized streaming."""
         log_info("🔌", "Cliente conectado ao WebSocket")
+        handler = WebSocketHandler()
+        session_id = self.sessions.register(handler)
+        openai_ws = None
 
         try:
-            openai_ws = await websockets.connect(
-                'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01',
-                extra_headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "OpenAI-Beta": "realtime=v1"
-                }
-            )
-
+            # O socket é escolhido no start, quando o CallSid da chamada é conhecido
+            call_sid = await handler.wait_for_start(websocket)
+            if handler.stream_sid is None:
+                return
+            greeting = self.greetings.pick()
+            if greeting:
+                await handler.play_greeting(websocket, greeting)
+            openai_ws, handler.metrics['speculative_session'] = await self._openai_socket(call_sid)
             log_info("", "Conectado à API OpenAI Realtime")
-            await OpenAIService.initialize_session(openai_ws)
-            await self.handler.handle_connection(websocket, openai_ws)
+            if greeting:
+                # O modelo continua a conversa sabendo que já cumprimentou
+                await OpenAIService.send_greeting_item(openai_ws, greeting.text)
+            await handler.handle_connection(websocket, openai_ws)
 
         except Exception as e:
             log_error("💥", f"Erro na conexão WebSocket: {e}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            if openai_ws is not None and openai_ws.open:
+                await openai_ws.close()
+            self.sessions.unregister(session_id)
\ No newline at end of file
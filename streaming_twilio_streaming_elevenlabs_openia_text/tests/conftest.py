@@ -0,0 +1,15 @@
+"""
+Os testes importam os módulos como o app faz (`from utils.text_segmenter import ...`),
+a partir da pasta `app/`. Rode o pytest a partir da pasta deste projeto.
+"""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('ELEVENLABS_API_KEY', 'test')
+# Nada de síntese real nem cache em disco durante os testes
+os.environ['TTS_CACHE_WARMUP'] = 'false'
+os.environ['TTS_CACHE_DIR'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'app'))
@@ -0,0 +1,168 @@
+"""Cache de áudio sintetizado: chave, LRU por bytes, nível em disco e chamadas de TTS poupadas."""
+import asyncio
+import time
+
+import pytest
+
+import services.elevenlabs_service as elevenlabs_service
+from prompt import PROMPT
+from services.elevenlabs_service import ElevenLabsService
+from utils.audio_cache import AudioCache, normalize_phrase, phrases_from_prompt
+
+SETTINGS = {'stability': 0.5}
+
+def key(cache: AudioCache, text: str, voice: str = 'voz', settings: dict = SETTINGS) -> str:
+    return cache.key(text, voice, 'modelo', settings)
+
+def test_normalize_phrase():
+    assert normalize_phrase("  Entendi! ") == normalize_phrase("entendi.") == "entendi"
+    assert normalize_phrase("Pode me explicar   melhor?") == "pode me explicar melhor?"
+
+def test_key_depends_on_phrase_voice_and_settings():
+    cache = AudioCache(1024, max_phrase_chars=20)
+    assert key(cache, "Claro!") == key(cache, "claro")
+    assert key(cache, "Claro") != key(cache, "Claro", voice='outra')
+    assert key(cache, "Claro") != key(cache, "Claro", settings={'stability': 0.9})
+    assert key(cache, "Claro?") != key(cache, "Claro")
+    assert key(cache, "uma frase comprida demais para o cache") is None
+    assert AudioCache(0).key("Claro", 'voz', 'modelo', SETTINGS) is None
+
+def test_phrases_from_prompt():
+    phrases = phrases_from_prompt(PROMPT, 40)
+    assert {"Entendi", "Claro", "Beleza", "Ok", "Pode me explicar melhor?"} <= set(phrases)
+    assert len(phrases) == len(set(phrases))
+
+def test_lru_evicts_least_recently_used_by_bytes():
+    async def scenario():
+        cache = AudioCache(300)
+        a, b, c = (key(cache, text) for text in ("a", "b", "c"))
+        await cache.put(a, b'\xff' * 100)
+        await cache.put(b, b'\xff' * 100)
+        await cache.put(c, b'\xff' * 100)
+        assert await cache.get(a)  # "a" passa a ser o mais recente
+        await cache.put(key(cache, "d"), b'\xff' * 150)
+        return cache, [await cache.get(k) is not None for k in (a, b, c)]
+
+    cache, present = asyncio.run(scenario())
+    assert present == [True, False, False]
+    snapshot = cache.snapshot()
+    assert snapshot['bytes'] <= 300
+    assert snapshot['evictions'] == 2
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    async def scenario():
+        cache = AudioCache(100)
+        await cache.put(key(cache, "grande"), b'\xff' * 101)
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert cache.snapshot()['entries'] == 0
+    assert cache.stats['stores'] == 0
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    async def scenario():
+        first = AudioCache(1024, str(tmp_path))
+        await first.put(key(first, "Beleza"), b'\x01\x02\x03')
+
+        second = AudioCache(1024, str(tmp_path))
+        cache_key = key(second, "Beleza")
+        assert second.contains(cache_key)
+        from_disk = await second.get(cache_key)
+        from_memory = await second.get(cache_key)
+        return second, from_disk, from_memory
+
+    cache, from_disk, from_memory = asyncio.run(scenario())
+    assert from_disk == from_memory == b'\x01\x02\x03'
+    assert cache.stats['disk_hits'] == 1
+    assert cache.stats['memory_hits'] == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+class FakeTwilioSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+SYNTHESIS_S = 0.05
+
+def test_replayed_conversations_skip_tts_for_repeated_phrases(monkeypatch):
+    """Três conversas com as expressões fixas do prompt: só a primeira ocorrência de cada uma sintetiza."""
+    turns = [
+        "Entendi", "Vou verificar o seu pedido agora mesmo, só um instante.", "Claro",
+        "Ok", "Pode me explicar melhor?", "Beleza", "Seu pedido chega amanhã pela manhã, entre 8h e 12h.",
+    ]
+    synthesized = []
+
+    async def fake_synthesize(texto, websocket, stream_sid, voz_escolhida, previous_text, recording=None, fallback=True):
+        await asyncio.sleep(SYNTHESIS_S)
+        synthesized.append(texto)
+        ulaw = texto.encode()[:1] * 1600
+        if recording is not None:
+            recording.extend(ulaw)
+        await ElevenLabsService.send_ulaw(ulaw, websocket, stream_sid)
+        return "passthrough"
+
+    def replay(cache: AudioCache):
+        monkeypatch.setattr(elevenlabs_service, 'audio_cache', cache)
+        synthesized.clear()
+
+        async def scenario():
+            outputs = []
+            started = time.monotonic()
+            for _ in range(3):
+                for text in turns:
+                    twilio = FakeTwilioSocket()
+                    await ElevenLabsService.stream_audio_to_twilio(text, twilio, 'MZ1', 'voz')
+                    outputs.append(twilio.sent)
+            return outputs, time.monotonic() - started
+
+        outputs, elapsed = asyncio.run(scenario())
+        return outputs, len(synthesized), elapsed
+
+    monkeypatch.setattr(ElevenLabsService, '_synthesize', staticmethod(fake_synthesize))
+    uncached_outputs, uncached_calls, uncached_s = replay(AudioCache(0))
+    cache = AudioCache(1024 * 1024)
+    cached_outputs, cached_calls, cached_s = replay(cache)
+
+    print(f"\nTTS: {uncached_calls} chamadas sem cache, {cached_calls} com cache "
+          f"({uncached_s:.2f}s -> {cached_s:.2f}s), {cache.snapshot()}")
+    # O cliente ouve exatamente o mesmo áudio
+    assert cached_outputs == uncached_outputs
+    assert uncached_calls == 3 * len(turns)
+    # Frases curtas só na primeira conversa; as longas (acima de max_phrase_chars) sempre
+    long_turns = [text for text in turns if len(normalize_phrase(text)) > cache.max_phrase_chars]
+    short_turns = len(turns) - len(long_turns)
+    assert cached_calls == len(turns) + 2 * len(long_turns)
+    assert cache.snapshot()['hit_rate'] == pytest.approx(2 / 3, abs=0.001)
+    assert cache.stats['memory_hits'] == 2 * short_turns
+
+def test_segments_with_previous_text_bypass_the_cache(monkeypatch):
+    """O áudio sintetizado com contexto não é servido para a frase isolada, nem o contrário."""
+    synthesized = []
+
+    async def fake_synthesize(texto, websocket, stream_sid, voz_escolhida, previous_text, recording=None, fallback=True):
+        synthesized.append((texto, previous_text))
+        ulaw = (b'\x22' if previous_text else b'\x11') * 1600
+        if recording is not None:
+            recording.extend(ulaw)
+        await ElevenLabsService.send_ulaw(ulaw, websocket, stream_sid)
+        return "passthrough"
+
+    cache = AudioCache(1024 * 1024)
+    monkeypatch.setattr(elevenlabs_service, 'audio_cache', cache)
+    monkeypatch.setattr(ElevenLabsService, '_synthesize', staticmethod(fake_synthesize))
+
+    async def scenario():
+        paths = []
+        for previous_text in ("Vou verificar.", None, "Vou verificar.", None):
+            paths.append(await ElevenLabsService.stream_audio_to_twilio(
+                "Claro", FakeTwilioSocket(), 'MZ1', 'voz', previous_text=previous_text))
+        return paths
+
+    paths = asyncio.run(scenario())
+    # Com contexto sempre sintetiza e não grava; sem contexto grava na primeira vez e serve do cache depois
+    assert paths == ["passthrough", "passthrough", "passthrough", "cache"]
+    assert synthesized == [("Claro", "Vou verificar."), ("Claro", None), ("Claro", "Vou verificar.")]
+    assert cache.peek(cache.key("Claro", 'voz', elevenlabs_service.TTS_MODEL_ID,
+                                elevenlabs_service.STREAM_VOICE_SETTINGS)) == b'\x11' * 1600
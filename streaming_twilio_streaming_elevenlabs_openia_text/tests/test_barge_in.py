@@ -0,0 +1,184 @@
+"""
+Tempo entre o cliente voltar a falar e a linha ficar em silêncio.
+
+O Twilio falso toca o que recebe em tempo real (20 ms por frame, em fila) e
+para na hora com um `clear`; o silêncio começa quando o buffer dele acaba.
+A síntese é um streaming falso do ElevenLabs um pouco mais rápido que o
+tempo real, então o áudio se acumula no Twilio como numa chamada de verdade.
+"""
+import asyncio
+import base64
+import contextlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.elevenlabs_service as elevenlabs_service
+from config import TELEPHONY_OUTPUT_FORMATS
+from services.elevenlabs_service import ElevenLabsService
+from utils.audio_cache import AudioCache
+from websocket.handlers import WebSocketHandler
+
+REPLY = (
+    "Claro, posso te ajudar com isso. Primeiro vou verificar o seu cadastro no sistema. "
+    "Depois confirmo os dados do pedido e te passo o prazo de entrega atualizado. "
+    "Qualquer dúvida é só falar."
+)
+CHUNK = b'\x7f' * 320  # 40 ms de μ-law
+CHUNK_INTERVAL_S = 0.03
+FRAME_S = 0.02
+DEBOUNCE_S = 1.0  # speech_debounce_delay do handler
+
+class FakeElevenLabs:
+    """Streaming de TTS falso: 40 ms de áudio a cada 30 ms, por 1 chunk a cada 4 caracteres."""
+
+    def __init__(self):
+        self.open_streams = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open_stream(self, texto, voz_escolhida, output_format, previous_text=None):
+        def chunks():
+            for _ in range(max(1, len(texto) // 4)):
+                time.sleep(CHUNK_INTERVAL_S)
+                yield CHUNK
+
+        with self._lock:
+            self.open_streams += 1
+        try:
+            yield SimpleNamespace(data=chunks())
+        finally:
+            with self._lock:
+                self.open_streams -= 1
+
+class PlayingTwilioSocket:
+    def __init__(self):
+        self.play_end = 0.0
+        self.cleared_at = None
+        self.discarded_s = 0.0
+        self.media_after_clear = 0
+        self.audio_s = 0.0
+
+    async def send_text(self, message: str):
+        self._on(json.loads(message))
+
+    async def send_json(self, message: dict):
+        self._on(message)
+
+    def _on(self, event: dict):
+        now = time.monotonic()
+        if event['event'] == 'media':
+            if self.cleared_at is not None:
+                self.media_after_clear += 1
+            self.audio_s += len(base64.b64decode(event['media']['payload'])) / 8000
+            self.play_end = max(self.play_end, now) + FRAME_S
+        elif event['event'] == 'clear':
+            self.cleared_at = now
+            self.discarded_s = max(0.0, self.play_end - now)
+            self.play_end = now
+
+class ScriptedRealtimeSocket:
+    """Turno do cliente, resposta em deltas e a volta da fala no momento pedido."""
+
+    def __init__(self, barge_in: str, speaking_s: float = 1.0):
+        self.barge_in = barge_in
+        self.speaking_s = speaking_s
+        self.barged_at = None
+        self.sent = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message)['type'])
+
+    async def __aiter__(self):
+        yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+        yield json.dumps({'type': 'input_audio_buffer.speech_stopped'})
+        turn_ended_at = time.monotonic()
+        yield json.dumps({'type': 'response.created', 'response': {'id': 'resp_1'}})
+        words = REPLY.split(' ')
+        for index, word in enumerate(words):
+            yield json.dumps({'type': 'response.text.delta', 'item_id': 'item_1', 'delta': word + ' '})
+            await asyncio.sleep(0.02)
+            if self.barge_in == 'generating' and index == len(words) // 2:
+                break
+        if self.barge_in == 'speaking':
+            yield json.dumps({'type': 'response.done', 'response': {'id': 'resp_1', 'status': 'completed'}})
+            await asyncio.sleep(self.speaking_s)
+        # Fala de verdade: depois da janela de debounce do fim do turno anterior
+        await asyncio.sleep(max(0.0, turn_ended_at + DEBOUNCE_S - time.monotonic()))
+        self.barged_at = time.monotonic()
+        yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+        await asyncio.sleep(0.3)
+
+class NoiseBurstRealtimeSocket(ScriptedRealtimeSocket):
+    """Uma tosse logo depois do fim do turno, com a resposta ainda sendo gerada."""
+
+    def __init__(self):
+        super().__init__(barge_in=None)
+
+    async def __aiter__(self):
+        yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+        yield json.dumps({'type': 'input_audio_buffer.speech_stopped'})
+        yield json.dumps({'type': 'response.created', 'response': {'id': 'resp_1'}})
+        words = REPLY.split(' ')
+        for index, word in enumerate(words):
+            yield json.dumps({'type': 'response.text.delta', 'item_id': 'item_1', 'delta': word + ' '})
+            await asyncio.sleep(0.02)
+            if index == len(words) // 2:
+                yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+                await asyncio.sleep(0.15)
+                yield json.dumps({'type': 'input_audio_buffer.speech_stopped'})
+        yield json.dumps({'type': 'response.done', 'response': {'id': 'resp_1', 'status': 'completed'}})
+        # A resposta termina de tocar antes do fim da chamada
+        await asyncio.sleep(len(REPLY) // 4 * CHUNK_INTERVAL_S + 0.5)
+
+@pytest.fixture
+def fake_tts(monkeypatch):
+    tts = FakeElevenLabs()
+    monkeypatch.setattr(ElevenLabsService, '_open_stream', staticmethod(tts.open_stream))
+    monkeypatch.setattr(ElevenLabsService, 'output_format_preferences',
+                        staticmethod(lambda: [next(iter(TELEPHONY_OUTPUT_FORMATS))]))
+    monkeypatch.setattr(elevenlabs_service, 'audio_cache', AudioCache(0))
+    return tts
+
+@pytest.mark.parametrize('barge_in', ['generating', 'speaking'])
+def test_speech_to_silence(fake_tts, barge_in):
+    async def scenario():
+        handler = WebSocketHandler()
+        handler.stream_sid = 'MZ1'
+        handler.fillers.enabled = False
+        twilio, openai = PlayingTwilioSocket(), ScriptedRealtimeSocket(barge_in)
+        await handler.send_to_twilio(twilio, openai)
+        return twilio, openai
+
+    twilio, openai = asyncio.run(scenario())
+    assert twilio.cleared_at is not None
+    silence_ms = max(0.0, twilio.play_end - openai.barged_at) * 1000
+    print(f"\n{barge_in}: fala -> silêncio em {silence_ms:.1f} ms, "
+          f"{twilio.discarded_s * 1000:.0f} ms de áudio descartados do buffer do Twilio, "
+          f"OpenAI recebeu {openai.sent}")
+
+    assert silence_ms < 100
+    assert twilio.media_after_clear == 0
+    assert fake_tts.open_streams == 0
+    if barge_in == 'generating':
+        # O LLM ainda gerava: a resposta é cancelada, não só truncada
+        assert 'response.cancel' in openai.sent
+
+def test_noise_burst_does_not_cut_the_reply(fake_tts):
+    async def scenario():
+        handler = WebSocketHandler()
+        handler.stream_sid = 'MZ1'
+        handler.fillers.enabled = False
+        twilio, openai = PlayingTwilioSocket(), NoiseBurstRealtimeSocket()
+        await handler.send_to_twilio(twilio, openai)
+        return twilio, openai, handler
+
+    twilio, openai, handler = asyncio.run(scenario())
+    assert twilio.cleared_at is None
+    assert 'response.cancel' not in openai.sent
+    # A resposta inteira foi enviada: 40 ms de áudio a cada 4 caracteres de cada trecho
+    assert handler.metrics['tts_segments'] > 0
+    assert twilio.audio_s >= len(REPLY) // 4 * 0.04 * 0.9
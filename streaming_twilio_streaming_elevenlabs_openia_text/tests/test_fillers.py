@@ -0,0 +1,170 @@
+"""Interjeições: prazo, cancelamento, sem sobreposição com a resposta e métricas de latência."""
+import asyncio
+import json
+import time
+
+import pytest
+
+from utils.fillers import FILLER_MARK, FillerScheduler
+
+DEADLINE_MS = 50
+FILLER_S = 0.06
+
+class FakePlayer:
+    """Envio de interjeição ao Twilio que leva FILLER_S e anota início e fim."""
+
+    def __init__(self):
+        self.played = []
+
+    async def __call__(self, ulaw: bytes):
+        started = time.monotonic()
+        await asyncio.sleep(FILLER_S)
+        self.played.append((ulaw, started, time.monotonic()))
+
+def scheduler(phrases=('Ok', 'Certo'), **options) -> FillerScheduler:
+    return FillerScheduler(list(phrases), lambda phrase: phrase.encode(), DEADLINE_MS, **options)
+
+def test_fast_reply_plays_no_filler():
+    async def scenario():
+        fillers, player = scheduler(), FakePlayer()
+        fillers.arm(player)
+        await asyncio.sleep(DEADLINE_MS / 1000 / 2)
+        await fillers.audio_ready()
+        await asyncio.sleep(DEADLINE_MS / 1000)
+        return fillers, player
+
+    fillers, player = asyncio.run(scenario())
+    assert player.played == []
+    assert fillers.stats['fillers'] == 0
+    assert fillers.stats['turns'] == 1
+    assert fillers.stats['last_perceived_ms'] == fillers.stats['last_actual_ms']
+
+def test_slow_reply_gets_a_filler_at_the_deadline_and_waits_for_it():
+    async def scenario():
+        fillers, player = scheduler(), FakePlayer()
+        armed = time.monotonic()
+        fillers.arm(player)
+        await asyncio.sleep(DEADLINE_MS / 1000 + 0.02)
+        assert fillers.playing
+        # Resposta pronta com a interjeição no meio: espera ela terminar de sair
+        await fillers.audio_ready()
+        return fillers, player, armed, time.monotonic()
+
+    fillers, player, armed, reply_at = asyncio.run(scenario())
+    assert len(player.played) == 1
+    _, started, ended = player.played[0]
+    assert (started - armed) * 1000 == pytest.approx(DEADLINE_MS, abs=25)
+    assert reply_at >= ended
+    stats = fillers.stats
+    assert stats['fillers'] == 1
+    assert stats['last_perceived_ms'] == pytest.approx(DEADLINE_MS, abs=25)
+    assert stats['last_actual_ms'] >= stats['last_perceived_ms'] + FILLER_S * 1000 - 5
+
+def test_never_repeats_the_same_filler_twice_in_a_row():
+    async def scenario():
+        fillers, player = scheduler(), FakePlayer()
+        for _ in range(6):
+            fillers.arm(player)
+            await asyncio.sleep(DEADLINE_MS / 1000 + 0.01)
+            await fillers.audio_ready()
+        return player
+
+    played = [ulaw for ulaw, _, _ in asyncio.run(scenario()).played]
+    assert len(played) == 6
+    assert all(current != previous for previous, current in zip(played, played[1:]))
+
+def test_missing_audio_counts_as_unavailable():
+    async def scenario():
+        fillers = FillerScheduler(['Ok'], lambda phrase: None, DEADLINE_MS)
+        player = FakePlayer()
+        fillers.arm(player)
+        await asyncio.sleep(DEADLINE_MS / 1000 + 0.02)
+        await fillers.audio_ready()
+        return fillers, player
+
+    fillers, player = asyncio.run(scenario())
+    assert player.played == []
+    assert fillers.stats['unavailable'] == 1
+
+def test_disarm_and_disabled_play_nothing():
+    async def scenario():
+        player = FakePlayer()
+        disarmed = scheduler()
+        disarmed.arm(player)
+        disarmed.disarm()
+        disabled = scheduler(enabled=False)
+        disabled.arm(player)
+        await asyncio.sleep(DEADLINE_MS / 1000 + 0.02)
+        await disabled.audio_ready()
+        return disabled, player
+
+    disabled, player = asyncio.run(scenario())
+    assert player.played == []
+    # Desligado, a latência continua medida
+    assert disabled.stats['turns'] == 1
+
+def test_interrupt_cancels_a_filler_in_flight():
+    async def scenario():
+        fillers, player = scheduler(), FakePlayer()
+        fillers.arm(player)
+        await asyncio.sleep(DEADLINE_MS / 1000 + 0.01)
+        was_playing = await fillers.interrupt()
+        return fillers, player, was_playing
+
+    fillers, player, was_playing = asyncio.run(scenario())
+    assert was_playing
+    assert player.played == []
+    assert not fillers.playing
+
+class FakeTwilioSocket:
+    def __init__(self):
+        self.events = []
+
+    async def send_text(self, message: str):
+        self._record(json.loads(message))
+
+    async def send_json(self, message: dict):
+        self._record(message)
+
+    def _record(self, event: dict):
+        name = event['event'] if event['event'] != 'mark' else f"mark:{event['mark']['name']}"
+        if not self.events or self.events[-1] != name:
+            self.events.append(name)
+
+class FakeRealtimeSocket:
+    """Cliente para de falar, a resposta demora e ele volta a falar por cima da interjeição."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message)['type'])
+
+    async def __aiter__(self):
+        yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+        yield json.dumps({'type': 'input_audio_buffer.speech_stopped'})
+        await asyncio.sleep(DEADLINE_MS / 1000 + 0.03)
+        yield json.dumps({'type': 'input_audio_buffer.speech_started'})
+
+def test_barge_in_clears_a_buffered_filler():
+    import services.elevenlabs_service as elevenlabs_service
+    from websocket.handlers import WebSocketHandler
+
+    async def scenario():
+        cache = elevenlabs_service.audio_cache
+        key = cache.key('Ok', elevenlabs_service.ELEVENLABS_VOICE_ID,
+                        elevenlabs_service.TTS_MODEL_ID, elevenlabs_service.STREAM_VOICE_SETTINGS)
+        await cache.put(key, b'\x11' * 4000)
+        handler = WebSocketHandler()
+        handler.stream_sid = 'MZ1'
+        handler.fillers.deadline_ms = DEADLINE_MS
+        # A volta da fala vem logo depois da interjeição: fora da janela de debounce, encurtada junto com o prazo
+        handler.speech_debounce_delay = DEADLINE_MS / 1000
+        twilio = FakeTwilioSocket()
+        await handler.send_to_twilio(twilio, FakeRealtimeSocket())
+        return handler, twilio
+
+    handler, twilio = asyncio.run(scenario())
+    assert handler.metrics['latency']['fillers'] == 1
+    # A interjeição foi inteira para o buffer do Twilio; a volta da fala a descarta
+    assert twilio.events == ['media', f'mark:{FILLER_MARK}', 'clear']
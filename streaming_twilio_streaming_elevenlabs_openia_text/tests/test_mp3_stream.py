@@ -0,0 +1,131 @@
+"""Decodificador MP3 incremental: recorte em frames e benchmark contra um ffmpeg por lote de 16 KB."""
+import asyncio
+import base64
+import resource
+import shutil
+import subprocess
+import time
+
+import pytest
+from pydub import AudioSegment
+from pydub.utils import get_prober_name
+
+from utils.audio_utils import convert_mp3_bytes_to_g711ulaw_base64
+from utils.mp3_stream import Mp3FrameSplitter, StreamingMp3Decoder, parse_frame_header
+
+# Como o ElevenLabs entrega mp3_44100_128: pedaços de 1 KB, 4x mais rápido que o tempo real
+PIECE_BYTES = 1024
+PIECE_INTERVAL_S = PIECE_BYTES / (128000 / 8) / 4
+LEGACY_BATCH_BYTES = 16384
+
+needs_ffmpeg = pytest.mark.skipif(
+    not (shutil.which(AudioSegment.converter) and shutil.which(get_prober_name())),
+    reason="ffmpeg/ffprobe não instalados"
+)
+
+def mpeg1_frame(padding: int = 0) -> bytes:
+    """Um frame MPEG-1 Layer III 128 kbps 44,1 kHz com conteúdo qualquer."""
+    header = bytes([0xFF, 0xFB, 0x90 | (padding << 1), 0x64])
+    length = parse_frame_header(header)[0]
+    return header + bytes((index * 7) % 251 for index in range(length - 4))
+
+def test_parse_frame_header():
+    assert parse_frame_header(bytes([0xFF, 0xFB, 0x90, 0x64])) == (417, 3, 44100)
+    assert parse_frame_header(bytes([0xFF, 0xFB, 0x92, 0x64])) == (418, 3, 44100)
+    assert parse_frame_header(b'ID3\x04') is None
+    assert parse_frame_header(bytes([0xFF, 0xFB, 0xF0, 0x64])) is None  # bitrate inválido
+
+def test_splitter_yields_the_same_frames_at_any_cut():
+    id3 = b'ID3\x04\x00\x00\x00\x00\x00\x05' + b'12345'
+    frames = [mpeg1_frame(index % 2) for index in range(40)]
+    stream = id3 + b''.join(frames)
+    for piece in (1, 7, 100, 1000, len(stream)):
+        splitter = Mp3FrameSplitter()
+        out = []
+        for offset in range(0, len(stream), piece):
+            out += splitter.feed(stream[offset:offset + piece])
+        assert out == frames
+        assert splitter.flush() == b''
+
+def synthesize_mp3(seconds: float) -> bytes:
+    return subprocess.run(
+        [AudioSegment.converter, '-hide_banner', '-loglevel', 'error', '-f', 'lavfi',
+         '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+         '-b:a', '128k', '-f', 'mp3', 'pipe:1'],
+        check=True, capture_output=True,
+    ).stdout
+
+def cpu_seconds() -> float:
+    """CPU deste processo mais a dos filhos já encerrados (ffmpeg)."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+async def arriving(mp3: bytes):
+    for offset in range(0, len(mp3), PIECE_BYTES):
+        await asyncio.sleep(PIECE_INTERVAL_S)
+        yield mp3[offset:offset + PIECE_BYTES]
+
+async def streaming_decode(mp3: bytes):
+    started = time.perf_counter()
+    first_audio = None
+    audio = bytearray()
+    decoder = StreamingMp3Decoder()
+    await decoder.start()
+
+    async def relay():
+        nonlocal first_audio
+        async for ulaw in decoder.frames():
+            first_audio = first_audio or time.perf_counter() - started
+            audio.extend(ulaw)
+
+    reader = asyncio.create_task(relay())
+    decoder.watch(reader)
+    try:
+        async for piece in arriving(mp3):
+            await decoder.feed(piece)
+        await decoder.finish()
+        await reader
+    finally:
+        await decoder.close()
+    return first_audio, bytes(audio)
+
+async def legacy_decode(mp3: bytes):
+    """O caminho anterior: junta 16 KB e decodifica cada lote com um ffmpeg novo."""
+    started = time.perf_counter()
+    first_audio = None
+    audio = bytearray()
+    batch = bytearray()
+
+    def flush():
+        nonlocal first_audio
+        audio.extend(base64.b64decode(convert_mp3_bytes_to_g711ulaw_base64(bytes(batch))))
+        first_audio = first_audio or time.perf_counter() - started
+        batch.clear()
+
+    async for piece in arriving(mp3):
+        batch += piece
+        if len(batch) >= LEGACY_BATCH_BYTES:
+            flush()
+    if batch:
+        flush()
+    return first_audio, bytes(audio)
+
+@needs_ffmpeg
+def test_streaming_decoder_beats_per_batch_decoding():
+    """Tempo até o primeiro áudio e CPU por resposta de 3 s (rode com -s para ver)."""
+    mp3 = synthesize_mp3(3.0)
+    results = {}
+    for name, decode in (('streaming', streaming_decode), ('por lote', legacy_decode)):
+        cpu = cpu_seconds()
+        first_audio, audio = asyncio.run(decode(mp3))
+        results[name] = (first_audio * 1000, (cpu_seconds() - cpu) * 1000, len(audio))
+
+    print()
+    for name, (ttfa_ms, cpu_ms, samples) in results.items():
+        print(f"{name:>9}: primeiro áudio em {ttfa_ms:6.1f} ms, CPU {cpu_ms:6.1f} ms, {samples} amostras")
+    streaming, legacy = results['streaming'], results['por lote']
+    # O lote de 16 KB só fecha depois de ~250 ms de download; o streaming sai no primeiro frame
+    assert streaming[0] < legacy[0] / 2
+    assert streaming[1] < legacy[1]
+    # Todo o áudio sai (3 s a 8 kHz, a menos do atraso do codificador)
+    assert abs(streaming[2] - 24000) < 800
@@ -0,0 +1,86 @@
+"""Webhook /incoming-call: só pedidos assinados pelo Twilio abrem sessão, e no máximo `max_pending` à espera."""
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from twilio.request_validator import RequestValidator
+
+from routes import call_routes
+from utils.speculative_sessions import SpeculativeSessionStore
+
+AUTH_TOKEN = 'segredo-da-conta'
+URL = 'https://exemplo.ngrok.app/incoming-call'
+FORM = {'CallSid': 'CA123', 'From': '+5511999999999', 'CallerName': ''}
+
+def sign(url: str, params: dict) -> str:
+    return RequestValidator(AUTH_TOKEN).compute_signature(url, params)
+
+def client_with_store(monkeypatch, store) -> TestClient:
+    monkeypatch.setattr(call_routes, 'TWILIO_AUTH_TOKEN', AUTH_TOKEN)
+    app = FastAPI()
+    app.include_router(call_routes.router)
+    app.state.ws_manager = SimpleNamespace(speculative=store, greetings=SimpleNamespace(ready=True))
+    # Atrás do ngrok o app recebe http; o Twilio assinou a URL https
+    return TestClient(app, base_url='http://exemplo.ngrok.app', headers={'X-Forwarded-Proto': 'https'})
+
+class RecordingStore:
+    def __init__(self):
+        self.prepared = []
+
+    def prepare(self, call_sid):
+        self.prepared.append(call_sid)
+
+def test_signed_webhook_prepares_the_session(monkeypatch):
+    store = RecordingStore()
+    client = client_with_store(monkeypatch, store)
+    response = client.post('/incoming-call', data=FORM, headers={'X-Twilio-Signature': sign(URL, FORM)})
+    assert response.status_code == 200
+    assert '<Stream' in response.text
+    assert store.prepared == ['CA123']
+
+def test_signed_get_webhook(monkeypatch):
+    store = RecordingStore()
+    client = client_with_store(monkeypatch, store)
+    query = '?CallSid=CA456&From=%2B5511999999999'
+    response = client.get('/incoming-call' + query, headers={'X-Twilio-Signature': sign(URL + query, {})})
+    assert response.status_code == 200
+    assert store.prepared == ['CA456']
+
+def test_unsigned_or_forged_webhook_is_refused(monkeypatch):
+    store = RecordingStore()
+    client = client_with_store(monkeypatch, store)
+    assert client.post('/incoming-call', data=FORM).status_code == 403
+    forged = dict(FORM, CallSid='CA999')
+    response = client.post('/incoming-call', data=forged, headers={'X-Twilio-Signature': sign(URL, FORM)})
+    assert response.status_code == 403
+    assert store.prepared == []
+
+def test_pending_sessions_are_capped():
+    opened = []
+
+    async def prepare():
+        opened.append(object())
+        return opened[-1]
+
+    async def discard(session):
+        pass
+
+    async def scenario():
+        store = SpeculativeSessionStore(prepare, discard, ttl_s=60, max_pending=3)
+        for index in range(10):
+            store.prepare(f'CA{index}')
+        await asyncio.sleep(0)
+        # Adotar uma libera a vaga para o próximo webhook
+        assert await store.adopt('CA0') is opened[0]
+        store.prepare('CA10')
+        await asyncio.sleep(0)
+        snapshot = store.snapshot()
+        await store.close()
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot['pending'] == 3
+    assert snapshot['prepared'] == 4
+    assert snapshot['refused'] == 7
+    assert len(opened) == 4
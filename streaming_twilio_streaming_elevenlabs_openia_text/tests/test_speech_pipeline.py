@@ -0,0 +1,134 @@
+"""
+Síntese dos trechos em paralelo: ordem do áudio, contexto de entonação e tempo de reprodução.
+
+O ElevenLabs falso leva TTFB_S até o primeiro byte e entrega 20 ms de μ-law por
+caractere a SPEED vezes o tempo real. O Twilio falso toca o que recebe em tempo
+real, em fila, e conta o silêncio entre os trechos.
+"""
+import asyncio
+import base64
+import contextlib
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.elevenlabs_service as elevenlabs_service
+from config import TELEPHONY_OUTPUT_FORMATS
+from services.elevenlabs_service import ElevenLabsService
+from services.speech_pipeline import SpeechPipeline
+from utils.audio_cache import AudioCache
+
+SEGMENTS = [
+    "Entendi. O procedimento tem três etapas bem simples.",
+    "Primeiro, um técnico visita para avaliar o equipamento.",
+    "Depois, enviamos o orçamento por mensagem para você.",
+    "Com a sua aprovação, agendamos o reparo no melhor horário.",
+]
+TTFB_S = 0.3
+SPEED = 0.9
+BYTES_PER_CHAR = 160  # 20 ms de μ-law por caractere
+CHUNK_BYTES = 1600  # 200 ms
+
+class FakeElevenLabs:
+    def __init__(self, delays: dict = None):
+        self.delays = delays or {}
+        self.requests = []
+
+    @contextlib.contextmanager
+    def open_stream(self, texto, voz_escolhida, output_format, previous_text=None):
+        self.requests.append((texto, previous_text))
+
+        def chunks():
+            time.sleep(self.delays.get(texto, TTFB_S))
+            total = len(texto) * BYTES_PER_CHAR
+            for offset in range(0, total, CHUNK_BYTES):
+                size = min(CHUNK_BYTES, total - offset)
+                time.sleep(size / 8000 / SPEED)
+                yield bytes([SEGMENTS.index(texto) if texto in SEGMENTS else 0x7f]) * size
+
+        yield SimpleNamespace(data=chunks())
+
+class PlayingTwilioSocket:
+    """Toca cada mídia em seguida da anterior, ou na hora em que chega se a linha já estava muda."""
+
+    def __init__(self):
+        self.first_audio = None
+        self.play_end = None
+        self.gaps_s = 0.0
+        self.payloads = []
+
+    async def send_text(self, message: str):
+        event = json.loads(message)
+        if event['event'] != 'media':
+            return
+        now = time.monotonic()
+        audio = base64.b64decode(event['media']['payload'])
+        self.payloads.append(audio)
+        if self.play_end is None:
+            self.first_audio = self.play_end = now
+        elif now > self.play_end:
+            self.gaps_s += now - self.play_end
+            self.play_end = now
+        self.play_end += len(audio) / 8000
+
+def use_fake_tts(monkeypatch, tts: FakeElevenLabs):
+    monkeypatch.setattr(ElevenLabsService, '_open_stream', staticmethod(tts.open_stream))
+    monkeypatch.setattr(ElevenLabsService, 'output_format_preferences',
+                        staticmethod(lambda: [next(iter(TELEPHONY_OUTPUT_FORMATS))]))
+    monkeypatch.setattr(elevenlabs_service, 'audio_cache', AudioCache(0))
+
+async def speak(concurrency: int) -> tuple:
+    twilio = PlayingTwilioSocket()
+    started = time.monotonic()
+    pipeline = SpeechPipeline(twilio, 'MZ1', concurrency)
+    for segment in SEGMENTS:
+        pipeline.say(segment)
+    audio_paths = await pipeline.finish()
+    return twilio, started, audio_paths
+
+def test_audio_plays_in_text_order_with_previous_text(monkeypatch):
+    # Os últimos trechos terminam primeiro
+    tts = FakeElevenLabs({segment: 0.05 * (len(SEGMENTS) - index) for index, segment in enumerate(SEGMENTS)})
+    use_fake_tts(monkeypatch, tts)
+    twilio, _, audio_paths = asyncio.run(speak(len(SEGMENTS)))
+
+    assert audio_paths == ['passthrough'] * len(SEGMENTS)
+    order = [audio[0] for audio in twilio.payloads]
+    assert order == sorted(order) and set(order) == set(range(len(SEGMENTS)))
+    assert sorted(tts.requests, key=lambda request: SEGMENTS.index(request[0])) == [
+        (segment, ' '.join(SEGMENTS[:index])) for index, segment in enumerate(SEGMENTS)
+    ]
+
+def test_cancel_stops_the_synthesis_in_flight(monkeypatch):
+    use_fake_tts(monkeypatch, FakeElevenLabs())
+
+    async def scenario():
+        twilio = PlayingTwilioSocket()
+        pipeline = SpeechPipeline(twilio, 'MZ1', 2)
+        for segment in SEGMENTS:
+            pipeline.say(segment)
+        await asyncio.sleep(TTFB_S + 0.3)
+        await pipeline.cancel()
+        sent = len(twilio.payloads)
+        await asyncio.sleep(0.3)
+        return sent, len(twilio.payloads)
+
+    sent, sent_later = asyncio.run(scenario())
+    assert 0 < sent == sent_later
+
+@pytest.mark.parametrize('concurrency', [1, 2])
+def test_playout_time_and_gaps(monkeypatch, concurrency):
+    """Fim da reprodução e silêncio entre trechos com TTS a 0,9x o tempo real (rode com -s para ver)."""
+    use_fake_tts(monkeypatch, FakeElevenLabs())
+    twilio, started, _ = asyncio.run(speak(concurrency))
+    audio_s = sum(len(segment) for segment in SEGMENTS) * BYTES_PER_CHAR / 8000
+    print(f"\nconcorrência {concurrency}: {audio_s:.1f} s de áudio, primeiro áudio em "
+          f"{(twilio.first_audio - started) * 1000:.0f} ms, reprodução termina em "
+          f"{twilio.play_end - started:.2f} s, {twilio.gaps_s * 1000:.0f} ms de silêncio entre trechos")
+    if concurrency == 1:
+        # Em série, cada trecho espera o TTFB do seguinte e a síntese mais lenta que o tempo real
+        assert twilio.gaps_s > (len(SEGMENTS) - 1) * TTFB_S
+    else:
+        assert twilio.gaps_s < TTFB_S
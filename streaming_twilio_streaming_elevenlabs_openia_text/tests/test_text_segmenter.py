@@ -0,0 +1,106 @@
+"""Segmentação incremental do texto da resposta e envio dos trechos em ordem."""
+import asyncio
+import time
+
+import pytest
+
+from services.elevenlabs_service import ElevenLabsService
+from services.speech_pipeline import SpeechPipeline
+from utils.text_segmenter import SentenceSegmenter
+
+REPLY = (
+    "Claro, posso te ajudar com isso. O Sr. Silva atende de segunda a sexta, "
+    "das 8h às 18h, e a consulta custa R$ 150,50. O endereço é Av. Paulista, "
+    "1.500, sala 3.5. Quer que eu agende um horário para você?"
+)
+
+def segment_whole(text: str, **options) -> list:
+    segmenter = SentenceSegmenter(**options)
+    return segmenter.feed(text) + segmenter.flush()
+
+def segment_by_char(text: str, **options) -> list:
+    segmenter = SentenceSegmenter(**options)
+    segments = []
+    for char in text:
+        segments.extend(segmenter.feed(char))
+    return segments + segmenter.flush()
+
+def test_splits_sentences_and_keeps_numbers_and_abbreviations():
+    assert segment_whole(REPLY) == [
+        "Claro, posso te ajudar com isso.",
+        # Depois do primeiro, uma vírgula só corta com min_chars (60) acumulados
+        "O Sr. Silva atende de segunda a sexta, das 8h às 18h, e a consulta custa R$ 150,50.",
+        "O endereço é Av. Paulista, 1.500, sala 3.5.",
+        "Quer que eu agende um horário para você?",
+    ]
+
+@pytest.mark.parametrize('chunk', [1, 2, 3, 7])
+def test_deltas_give_the_same_segments_as_the_whole_text(chunk):
+    segmenter = SentenceSegmenter()
+    segments = []
+    for start in range(0, len(REPLY), chunk):
+        segments.extend(segmenter.feed(REPLY[start:start + chunk]))
+    assert segments + segmenter.flush() == segment_whole(REPLY)
+
+def test_first_segment_cuts_at_a_short_clause():
+    segments = segment_by_char("Olha, eu verifiquei aqui, e o seu pedido já saiu para entrega hoje cedo.")
+    assert segments[0] == "Olha, eu verifiquei aqui,"
+
+def test_segment_is_emitted_as_soon_as_it_closes():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("Tudo certo") == []
+    assert segmenter.feed(".") == []  # pode ser "3.5": espera o próximo caractere
+    assert segmenter.feed(" E") == ["Tudo certo."]
+
+def test_long_text_without_punctuation_is_cut_at_a_space():
+    text = ' '.join(['palavra'] * 60)
+    segments = segment_by_char(text, min_chars=20, max_chars=50)
+    assert all(len(segment) <= 50 for segment in segments)
+    assert ' '.join(segments) == text
+
+def test_flush_resets_for_the_next_reply():
+    segmenter = SentenceSegmenter()
+    segmenter.feed("Primeira resposta, sem ponto final")
+    assert segmenter.flush() == ["Primeira resposta, sem ponto final"]
+    assert segmenter.segments == 0
+    assert segmenter.feed("Oi, tudo bem com você hoje? ") == ["Oi, tudo bem com você hoje?"]
+
+class FakeTwilioSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message: str):
+        self.sent.append((time.monotonic(), message))
+
+def test_pipeline_plays_segments_in_order_while_synthesizing_ahead(monkeypatch):
+    """O segundo trecho sintetiza mais rápido que o primeiro, mas só toca depois dele."""
+    synthesis_started = {}
+    durations = {'um': 0.15, 'dois': 0.02, 'três': 0.05}
+
+    async def fake_stream(texto, websocket, stream_sid, previous_text=None, **kwargs):
+        synthesis_started[texto] = time.monotonic()
+        for part in range(3):
+            await asyncio.sleep(durations[texto] / 3)
+            await websocket.send_text(f"{texto}-{part}")
+        return 'passthrough'
+
+    monkeypatch.setattr(ElevenLabsService, 'stream_audio_to_twilio', staticmethod(fake_stream))
+
+    async def scenario():
+        twilio = FakeTwilioSocket()
+        pipeline = SpeechPipeline(twilio, 'MZ1', concurrency=2)
+        started = time.monotonic()
+        for text in durations:
+            pipeline.say(text)
+        paths = await pipeline.finish()
+        return twilio, paths, started
+
+    twilio, paths, started = asyncio.run(scenario())
+    assert [message for _, message in twilio.sent] == [
+        f"{text}-{part}" for text in durations for part in range(3)
+    ]
+    assert paths == ['passthrough'] * 3
+    # Com duas sínteses por vez, o segundo trecho começa junto com o primeiro
+    assert synthesis_started['dois'] - started < 0.01
+    # E o primeiro áudio sai antes de o primeiro trecho terminar de sintetizar
+    assert twilio.sent[0][0] - started < durations['um']
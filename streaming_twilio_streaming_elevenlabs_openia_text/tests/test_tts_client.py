@@ -0,0 +1,153 @@
+"""TTSStream: o loop segue responsivo durante a síntese e o aclose, e a thread nunca fica presa na fila."""
+import asyncio
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from services.tts_client import AsyncTTSClient
+
+CHUNK = b'\xff' * 800
+TICK_S = 0.005
+
+class LagProbe:
+    """Tarefa que acorda a cada 5 ms e guarda o maior atraso do loop."""
+
+    def __init__(self):
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK_S)
+            self.max_lag_ms = max(self.max_lag_ms, (time.perf_counter() - started - TICK_S) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> float:
+        await asyncio.sleep(2 * TICK_S)  # deixa o tick atrasado ser medido
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return self.max_lag_ms
+
+def blocking_stream(chunks: int, delay_s: float, finished: threading.Event = None):
+    """Como o `with_raw_response.stream` do SDK: leituras de rede bloqueantes na thread."""
+    @contextmanager
+    def open_stream():
+        def data():
+            try:
+                for _ in range(chunks):
+                    time.sleep(delay_s)
+                    yield CHUNK
+            finally:
+                if finished:
+                    finished.set()
+        yield SimpleNamespace(data=data())
+    return open_stream
+
+def socket_stream(reader: socket.socket, finished: threading.Event):
+    """Resposta cuja leitura fica parada num recv, como o httpx esperando o próximo chunk."""
+    @contextmanager
+    def open_stream():
+        def data():
+            try:
+                yield CHUNK
+                while chunk := reader.recv(4096):
+                    yield chunk
+            finally:
+                finished.set()
+        network_stream = SimpleNamespace(get_extra_info=lambda name: reader if name == 'socket' else None)
+        yield SimpleNamespace(data=data(), _response=SimpleNamespace(extensions={'network_stream': network_stream}))
+    return open_stream
+
+@pytest.fixture
+def client():
+    client = AsyncTTSClient(max_workers=2, queue_depth=4, put_timeout_s=0.5)
+    yield client
+    client.shutdown()
+
+def test_loop_stays_responsive_while_synthesizing(client):
+    async def scenario(iterate):
+        probe = LagProbe()
+        probe.start()
+        await asyncio.sleep(0)  # a sonda já está esperando o primeiro tick
+        received = await iterate()
+        return received, await probe.stop()
+
+    async def through_client():
+        return [chunk async for chunk in client.stream(blocking_stream(25, 0.02))]
+
+    async def inline():
+        # O SDK síncrono lido direto no loop, como antes do AsyncTTSClient
+        with blocking_stream(25, 0.02)() as response:
+            return list(response.data)
+
+    received, lag_ms = asyncio.run(scenario(through_client))
+    _, inline_lag_ms = asyncio.run(scenario(inline))
+    print(f"\natraso máximo do loop durante a síntese: {lag_ms:.1f} ms (SDK lido no loop: {inline_lag_ms:.1f} ms)")
+    assert len(received) == 25
+    assert lag_ms < 15
+    assert inline_lag_ms > 400
+
+def test_aclose_releases_the_thread_without_blocking_the_loop(client):
+    reader, writer = socket.socketpair()
+    finished = threading.Event()
+
+    async def scenario():
+        stream = client.stream(socket_stream(reader, finished))
+        assert await stream.__anext__() == CHUNK
+        await asyncio.sleep(0.05)  # a thread está parada no recv
+        probe = LagProbe()
+        probe.start()
+        started = time.perf_counter()
+        await stream.aclose()
+        aclose_ms = (time.perf_counter() - started) * 1000
+        released = await asyncio.to_thread(finished.wait, 1)
+        return aclose_ms, released, await probe.stop()
+
+    try:
+        aclose_ms, released, lag_ms = asyncio.run(scenario())
+    finally:
+        reader.close()
+        writer.close()
+    print(f"\naclose: {aclose_ms:.2f} ms, atraso máximo do loop: {lag_ms:.1f} ms")
+    assert released
+    assert aclose_ms < 5
+    assert lag_ms < 15
+
+def test_abandoned_stream_gives_up_on_the_full_queue(client):
+    finished = threading.Event()
+
+    async def scenario():
+        stream = client.stream(blocking_stream(100, 0, finished))
+        assert await stream.__anext__() == CHUNK
+        # Quem consumia parou de iterar sem chamar aclose
+        released = await asyncio.to_thread(finished.wait, 2)
+        leftovers = []
+        with pytest.raises(TimeoutError):
+            async for chunk in stream:
+                leftovers.append(chunk)
+        return released, leftovers
+
+    released, leftovers = asyncio.run(scenario())
+    assert released
+    # O que já estava na fila ainda é entregue antes do erro
+    assert 1 <= len(leftovers) <= client.queue_depth + 1
+
+def test_closed_loop_releases_the_thread(client):
+    finished = threading.Event()
+
+    async def scenario():
+        stream = client.stream(blocking_stream(100, 0.01, finished))
+        await stream.__anext__()
+        # asyncio.run termina e fecha o loop com a thread ainda produzindo
+
+    started = time.perf_counter()
+    asyncio.run(scenario())
+    assert finished.wait(2)
+    assert time.perf_counter() - started < 2